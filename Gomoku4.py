@@ -2,82 +2,258 @@
 #/usr/local/bin/python3
 # Set the path to your python3 above
 
-from gtp_connection import GtpConnection,move_to_coord,coord_to_point
-from board_util import GoBoardUtil,EMPTY, BLACK, WHITE
+from gtp_connection import GtpConnection
+from board_util import GoBoardUtil,EMPTY, BLACK, WHITE, MAXSIZE
 from simple_board import SimpleGoBoard
-import numpy as np
-import copy
+from playout_rng import PlayoutRNG
+from node_store import NodeStore
+from lazy_import import lazy_module
+np = lazy_module("numpy")
+import argparse
+import functools
+import time
 
 class SimulationPlayer(object):
+    # class attributes, so GTP name and version need no engine instance
+    name = "GomokuAssignment4"
+    version = 2.0
+
     def __init__(self):
         self.numSimulations = None
-        self.name = "GomokuAssignment4"
-        self.version = 2.0
-        self.preAction = None
         self.moves = None
-        self.avg_rewards = None
-        self.count = None
+        self.children = None
+        self.tree = NodeStore()
         self.c = 2
         self.time = 1
         self.bestMove = None
+        # 0 plays every simulation to the end of the game,
+        # None picks a cutoff from the board size
+        self.playout_cutoff = None
+        # if > 0, stop each search after this many simulations
+        self.playout_limit = 0
+        self.rng = PlayoutRNG()
+        # called with search_info() every report_interval seconds
+        self.progress = None
+        self.report_interval = 0.5
+        self.last_info = None
+        # counters for the engine_stats GTP command
+        self.total_simulations = 0
+        self.last_simulations = 0
+        self.copy_time = 0.0
+        self.playout_time = 0.0
+        self.stop_reason = None
+        # profiler.SpanTracer while profiling, None otherwise
+        self.tracer = None
+        # playout_cluster.PlayoutCluster or shared_search.SharedSearch
+        # sharing searches with other processes, used by searches with
+        # a deadline
+        self.cluster = None
+        # pattern_policy.PatternPolicy drawing the playout moves,
+        # None for uniform random playouts
+        self.patterns = None
 
-    def name(self):
-        return "Simulation Player ({0} sim.)".format(self.numSimulations)
+    def set_seed(self, seed):
+        """ Reseed the random stream used for selection and playouts """
+        self.rng = PlayoutRNG(seed)
 
-    def genmove(self,moves,state,color):
+    def genmove(self,moves,state,color,deadline=None):
+        """
+        Choose one of the candidate points in moves for color.
+        Works on board points only; GTP names are handled by the caller.
+        Searches until time.time() reaches deadline or playout_limit
+        simulations are done. Without either, numSimulations
+        simulations are run.
+        """
         assert not state.endOfGame()
         moveNr = len(moves)
         self.numSimulations = moveNr*100
+        self.last_simulations = 0
         if moveNr == 1:
+            self.stop_reason = "single_move"
             return moves[0]
 
         #agent init
         self.moves = moves
-        self.count = dict(zip(moves,[0]*moveNr))
-        self.avg_rewards = dict(zip(moves,[0]*moveNr))
-
-        #agent start
-        self.preAction = self._choose_action()
-        self.count[self.preAction] +=1
-        self.time += 1
-        coord = move_to_coord(self.preAction,state.size)
-        point = coord_to_point(coord[0],coord[1],state.size)
-        copy_board = copy.deepcopy(state)
-        copy_board.play_move_gomoku(point,color)
-        reward = copy_board.mysimulate(color)
-        self.avg_rewards[self.preAction]+=((reward-self.avg_rewards[self.preAction])/self.count[self.preAction])
-        
-
-        highest_reward = max(self.avg_rewards.values())
-        for move in self.avg_rewards:
-            if self.avg_rewards[move] == highest_reward:
-                self.bestMove = move
+        self.color = color
+        points = moves
+        root = self.tree.root
+        self.children = np.array([self.tree.child(root, point)
+                                  for point in points])
+        best = 0
+        self.bestMove = moves[best]
+        cutoff = self.cutoff_for(state.size)
+        if self.patterns is not None:
+            # copies of the board inherit the pattern codes
+            state.track_patterns(self.patterns)
+        elif state.patterns is not None:
+            # left over from a search with patterns, and a cost to
+            # every move and copy of the board
+            state.untrack_patterns()
 
         #agent step
-        while 1:
-            self.preAction = self._choose_action()
-            self.count[self.preAction] +=1
+        simulations = 0
+        copy_time = 0.0
+        playout_time = 0.0
+        start = time.time()
+        next_report = start + self.report_interval
+        tracer = self.tracer
+        budget = self.playout_limit or \
+                 (self.numSimulations if deadline is None else None)
+        cluster = self.cluster if deadline is not None else None
+        remote = 0
+        if cluster is not None:
+            cluster.start_search(state, color, points, cutoff, deadline,
+                                 self.rng.randrange(1 << 30))
+        while (budget is None or simulations < budget) and \
+              (deadline is None or time.time() < deadline):
+            simulations += 1
+            # look at the clock for live analysis only every 64 simulations
+            if self.progress is not None and simulations & 63 == 0:
+                now = time.time()
+                if now >= next_report:
+                    self.progress(self.search_info(now - start, simulations))
+                    next_report = now + self.report_interval
+            if cluster is not None and simulations & 63 == 0:
+                merged = self._merge_remote(cluster.poll())
+                if merged:
+                    remote += merged
+                    best = self._best_action()
+                    self.bestMove = moves[best]
+            if tracer is not None:
+                tracer.begin("selection")
+            action = self._choose_action()
             self.time += 1
-            coord = move_to_coord(self.preAction,state.size)
-            point = coord_to_point(coord[0],coord[1],state.size)
-            copy_board = copy.deepcopy(state)
-            copy_board.play_move_gomoku(point,color)
-            reward = copy_board.mysimulate(color)
-            self.avg_rewards[self.preAction]+=((reward-self.avg_rewards[self.preAction])/self.count[self.preAction])
+            if tracer is not None:
+                tracer.begin("board_copy")
+            t0 = time.perf_counter()
+            copy_board = state.copy()
+            copy_board.play_move_gomoku(points[action],color)
+            t1 = time.perf_counter()
+            if tracer is not None:
+                tracer.end()
+                tracer.begin("playout")
+            reward = self._playout(copy_board,color,cutoff)
+            t2 = time.perf_counter()
+            if tracer is not None:
+                tracer.end()
+            copy_time += t1 - t0
+            playout_time += t2 - t1
+            node = self.children[action]
+            self.tree.update(node, reward)
             #update self.bestMove
-            if self.avg_rewards[self.preAction] > self.avg_rewards[self.bestMove]:
-                self.bestMove = self.preAction
+            if self.tree.mean(node) > self.tree.mean(self.children[best]) \
+               or self.tree.visits[self.children[best]] == 0:
+                best = action
+                self.bestMove = moves[best]
+            if tracer is not None:
+                tracer.end()
 
+        self.stop_reason = "budget" if simulations == budget else "deadline"
+        if cluster is not None:
+            remote += self._merge_remote(cluster.finish())
+            if remote:
+                self.bestMove = moves[self._best_action()]
+        simulations += remote
+        self.last_simulations = simulations
+        self.total_simulations += simulations
+        self.copy_time += copy_time
+        self.playout_time += playout_time
+        self.last_info = self.search_info(time.time() - start, simulations)
         return self.bestMove
 
+    def _merge_remote(self, results):
+        """
+        Add the root statistics of finished remote batches to the
+        children of the root. Returns the number of simulations added.
+        A candidate listed twice has one child and is counted once.
+        """
+        nodes, first = np.unique(self.children, return_index=True)
+        count = 0
+        for visits, value_sum in results:
+            visits = np.asarray(visits)[first]
+            self.tree.add_stats(nodes, visits,
+                                np.asarray(value_sum)[first])
+            count += int(np.sum(visits))
+        self.time += count
+        return count
+
+    def _best_action(self):
+        """ Index of the child with the best mean among the visited ones """
+        visits = self.tree.visits[self.children]
+        means = self.tree.value_sum[self.children] / np.maximum(visits, 1)
+        means[visits == 0] = -np.inf
+        return int(np.argmax(means))
+
+    def search_info(self, elapsed, simulations):
+        """
+        Snapshot of the current search: per-move visits and win rates
+        sorted by visits, best move, principal variation and speed.
+        """
+        visits = self.tree.visits[self.children]
+        means = self.tree.value_sum[self.children] / np.maximum(visits, 1)
+        order = np.argsort(-visits, kind="stable")
+        stats = [(self.moves[i], int(visits[i]), (means[i] + 1) / 2)
+                 for i in order]
+        return {
+            "elapsed": elapsed,
+            "simulations": simulations,
+            "pps": simulations / elapsed if elapsed > 0 else 0.0,
+            "moves": stats,
+            "best": self.bestMove,
+            "pv": [self.bestMove],
+            "color": self.color,
+        }
+
+    def advance(self, point):
+        """
+        A move was played on the board: keep the subtree below it
+        and recycle the rest of the search tree.
+        """
+        self.tree.advance(point)
+
+    def reset_tree(self):
+        """ Forget all search statistics, e.g. for a new game """
+        self.tree.reset()
+        self.time = 1
+
+    def set_node_budget(self, capacity):
+        self.tree = NodeStore(capacity)
+
+    def cutoff_for(self, size):
+        """
+        Playout cutoff on a board of given size. Small boards are played
+        out to the end; on large boards the playout length, and with it
+        the cost of a simulation, grows with the side instead of the area.
+        """
+        if self.playout_cutoff is not None:
+            return self.playout_cutoff
+        return 0 if size <= 9 else 2 * size
+
+    def _playout(self, board, color, cutoff):
+        """
+        Run one simulation on board and return the reward for color.
+        With a playout cutoff the simulation is truncated and scored
+        by the static evaluator.
+        """
+        if self.patterns is not None:
+            return self.patterns.simulate(board, color, cutoff, self.rng)
+        if cutoff:
+            return board.cutoff_simulate(color, cutoff, self.rng)
+        return board.mysimulate(color, self.rng)
+
     def _choose_action(self):
-        if 0 not in self.count.values():
-            temp = dict(zip(self.moves,[self.avg_rewards[i]+np.sqrt(np.log(self.time)/self.count[i])*self.c for i in self.moves]))
-            greedy_actions = [x for x in temp if temp[x] == max(temp.values())]
-        else:
-            greedy_actions = [i for i in self.moves if self.count[i] == 0]
+        """
+        UCB1 over the children of the root. Returns an index into
+        self.children, unvisited children first, ties broken at random.
+        """
+        visits = self.tree.visits[self.children]
+        greedy_actions = np.flatnonzero(visits == 0)
+        if len(greedy_actions) == 0:
+            ucb = self.tree.value_sum[self.children] / visits + \
+                  np.sqrt(np.log(self.time) / visits) * self.c
+            greedy_actions = np.flatnonzero(ucb == ucb.max())
 
-        return greedy_actions[np.random.randint(0,len(greedy_actions))]
+        return greedy_actions[self.rng.randrange(len(greedy_actions))]
 
     def mygenmove(self, moves,state,color):
         assert not state.endOfGame()
@@ -92,13 +268,10 @@ class SimulationPlayer(object):
 
     def simulate(self, state, move, color):
         stats = [0] * 3
-        #convert the last move to the index point
-        coord = move_to_coord(move,state.size)
-        point = coord_to_point(coord[0],coord[1],state.size)
-        state.play_move_gomoku(point,color)
+        state.play_move_gomoku(move,color)
         moveNr = state.moveNumber()
         for _ in range(self.numSimulations):
-            winner, _ = state.simulate()
+            winner, _ = state.simulate(self.rng)
             stats[winner] += 1
             state.resetToMoveNumber(moveNr)
         assert sum(stats) == self.numSimulations
@@ -109,13 +282,78 @@ class SimulationPlayer(object):
             eval = 1 - eval
         return eval
     
-def run():
+def run(argv=None):
     """
     start the gtp connection and wait for commands.
+    With --serve, host many GTP games on a socket instead of stdin/stdout.
     """
-    board = SimpleGoBoard(7)
-    con = GtpConnection(SimulationPlayer(), board)
+    parser = argparse.ArgumentParser(description="Gomoku GTP engine")
+    parser.add_argument("--size", type=int, default=7,
+                        help="initial board size, 7 to {}; 15 and 19 are "
+                             "the competition sizes".format(MAXSIZE))
+    parser.add_argument("--serve", metavar="ADDRESS",
+                        help="serve GTP sessions on tcp:HOST:PORT or unix:PATH")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="search processes in server mode")
+    parser.add_argument("--profile", metavar="PREFIX",
+                        help="profile the whole game, write PREFIX.trace.json "
+                             "and PREFIX.folded on quit")
+    parser.add_argument("--record", metavar="PATH",
+                        help="log every GTP command with its timestamp and "
+                             "response to PATH, see gtp_replay.py")
+    parser.add_argument("--playout-workers", metavar="ADDRESS",
+                        help="share searches with remote workers connecting "
+                             "to ADDRESS, see playout_cluster.py")
+    parser.add_argument("--shared-workers", type=int, metavar="N",
+                        help="share searches with N local processes "
+                             "through shared memory, see shared_search.py")
+    parser.add_argument("--proven-cache", metavar="PATH",
+                        help="keep proven results in the SQLite database "
+                             "PATH across runs, see proven_store.py")
+    parser.add_argument("--patterns", metavar="FILE",
+                        help="draw playout moves by the pattern table in "
+                             "FILE, see fit_patterns.py")
+    args = parser.parse_args(argv)
+    if not 7 <= args.size <= MAXSIZE:
+        parser.error("--size must be between 7 and {}".format(MAXSIZE))
+    if args.playout_workers and args.shared_workers is not None:
+        parser.error("--playout-workers and --shared-workers cannot be "
+                     "used together")
+    if args.shared_workers is not None and args.shared_workers < 1:
+        parser.error("--shared-workers must be at least 1")
+    if args.serve:
+        import gtp_server
+        gtp_server.serve(SimulationPlayer,
+                         functools.partial(SimpleGoBoard, args.size),
+                         args.serve, args.workers,
+                         proven_path=args.proven_cache)
+        return
+    # engine and board are created by the first command that needs
+    # them, so the controller's handshake is answered right away
+    con = GtpConnection.deferred(SimulationPlayer, SimpleGoBoard, args.size)
+    if args.profile:
+        con.start_profile("game", args.profile)
+    if args.record:
+        con.start_recording(args.record)
+    if args.playout_workers:
+        from playout_cluster import PlayoutCluster
+        try:
+            cluster = PlayoutCluster(args.playout_workers)
+        except (OSError, ValueError) as e:
+            parser.error("--playout-workers: {}".format(e))
+        con.set_engine_attribute("cluster", cluster)
+    elif args.shared_workers is not None:
+        from shared_search import SharedSearch
+        con.set_engine_attribute("cluster", SharedSearch(args.shared_workers))
+    if args.proven_cache:
+        from proven_store import ProvenResultStore
+        con.proven = ProvenResultStore(args.proven_cache)
+    if args.patterns:
+        from pattern_policy import PatternPolicy
+        con.set_engine_attribute("patterns", PatternPolicy.load(args.patterns))
     con.start_connection()
+    con.stop_profile()
+    con.stop_recording()
 
 if __name__=='__main__':
     run()
@@ -0,0 +1,308 @@
+"""
+analyze_archive.py
+Engine evaluations for every position of an archive of SGF games.
+
+SGF files (plain or .gz, a file may hold a collection of games) are
+read in blocks and split into games one at a time; only the main line
+of a game is used. Every position before a move is sent to a pool of
+worker processes, which replay it on a SimpleGoBoard, run policy_moves
+and a search with a fixed number of simulations. Results are written
+as JSON lines in archive order. At most a fixed number of positions is
+in flight, so memory does not grow with the archive.
+
+The output doubles as a checkpoint: with --resume the positions
+already in it are skipped and the run continues where it stopped.
+
+Usage:
+    python analyze_archive.py games/ more.sgf --output analysis.jsonl \\
+        --playouts 500 --parallel 4 [--resume]
+"""
+import argparse
+import gzip
+import io
+import json
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from board_util import BLACK, WHITE, MAXSIZE, coord_to_point
+from gtp_connection import point_tables
+
+_SPECIAL = re.compile(r'[()\[\]\\]')
+_TOKEN = re.compile(r'\(|\)|;|([A-Za-z]+)\s*((?:\[(?:\\.|[^\]\\])*\]\s*)+)',
+                    re.S)
+_VALUE = re.compile(r'\[((?:\\.|[^\]\\])*)\]', re.S)
+
+def iter_sgf_texts(stream, block_size=1 << 16):
+    """
+    Yield the text of each game tree of an SGF collection read from
+    stream, holding only the current game in memory.
+    """
+    depth = 0
+    in_value = False
+    skip_at = -1
+    pieces = []
+    while True:
+        block = stream.read(block_size)
+        if not block:
+            break
+        start = 0
+        for match in _SPECIAL.finditer(block):
+            i = match.start()
+            if i == skip_at:
+                continue
+            char = block[i]
+            if in_value:
+                if char == '\\':
+                    skip_at = i + 1
+                elif char == ']':
+                    in_value = False
+            elif char == '[':
+                in_value = True
+            elif char == '(':
+                if depth == 0:
+                    start = i
+                    pieces = []
+                depth += 1
+            elif char == ')' and depth > 0:
+                depth -= 1
+                if depth == 0:
+                    pieces.append(block[start:i + 1])
+                    yield "".join(pieces)
+                    pieces = []
+        if depth > 0:
+            pieces.append(block[start:])
+        # an escape at the end of the block escapes the first character
+        # of the next one
+        skip_at = 0 if skip_at == len(block) else -1
+
+def parse_game(text):
+    """
+    Main line of one SGF game as (size, [(color, (row, col))]).
+    Raises ValueError for games that cannot be replayed.
+    """
+    size = 15
+    moves = []
+    # the main line is complete at the first closing parenthesis
+    for match in _TOKEN.finditer(text):
+        if match.group(0) == ')':
+            break
+        name = match.group(1)
+        if not name:
+            continue
+        values = _VALUE.findall(match.group(2))
+        name = name.upper()
+        if name == "SZ":
+            size = int(values[0].split(":")[0])
+            if not 7 <= size <= MAXSIZE:
+                raise ValueError("board size {} not in 7..{}".format(
+                    size, MAXSIZE))
+        elif name in ("AB", "AW", "AE"):
+            raise ValueError("setup stones are not supported")
+        elif name in ("B", "W"):
+            value = values[0].strip().lower()
+            if value in ("", "tt"):
+                continue
+            if len(value) != 2:
+                raise ValueError("bad move {}".format(value))
+            col = ord(value[0]) - ord('a') + 1
+            row = size - (ord(value[1]) - ord('a'))
+            if not (1 <= row <= size and 1 <= col <= size):
+                raise ValueError("move {} off the board".format(value))
+            moves.append((BLACK if name == "B" else WHITE, (row, col)))
+    return size, moves
+
+def archive_files(paths):
+    """ SGF files of the given files and directories, in sorted order """
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.endswith((".sgf", ".sgf.gz")):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+def _open(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    return open(path, encoding="utf-8", errors="replace")
+
+def iter_items(paths):
+    """
+    Work items of the archive in order: one per position before a
+    move, or one per game that could not be read.
+    """
+    for path in archive_files(paths):
+        with _open(path) as stream:
+            for game, text in enumerate(iter_sgf_texts(stream)):
+                item = {"source": path, "game": game}
+                try:
+                    size, moves = parse_game(text)
+                    points = [(color, coord_to_point(row, col, size))
+                              for color, (row, col) in moves]
+                except ValueError as e:
+                    yield dict(item, error=str(e))
+                    continue
+                for number in range(len(points)):
+                    yield dict(item, size=size, move=number,
+                               moves=points[:number], played=points[number])
+
+_connection = None
+
+def _worker_init(playouts):
+    global _connection
+    import Gomoku4
+    from gtp_connection import GtpConnection
+    from simple_board import SimpleGoBoard
+    _connection = GtpConnection(Gomoku4.SimulationPlayer(), SimpleGoBoard(7),
+                                outfile=io.StringIO())
+    _connection.proven_cache_cmd(["off"])
+    _connection.decision_cache_cmd(["off"])
+    _connection.go_engine.playout_limit = playouts
+
+def analyze_position(item, seed):
+    """ Analysis of one work item as a dict, run on a worker """
+    result = {"source": item["source"], "game": item["game"]}
+    if "error" in item:
+        result["error"] = item["error"]
+        return result
+    connection = _connection
+    engine = connection.go_engine
+    size = item["size"]
+    connection.reset(size)
+    board = connection.board
+    point_to_move = point_tables(size)[0]
+    for color, point in item["moves"]:
+        board.play_move_gomoku(point, color)
+    color, played = item["played"]
+    board.current_player = color
+    result.update(move=item["move"], to_play="b" if color == BLACK else "w",
+                  played=point_to_move[played])
+    game_end, winner = board.check_game_end_gomoku()
+    if game_end or board.get_color(played) != 0:
+        result["error"] = "game already over" if game_end else \
+                          "move on an occupied point"
+        return result
+    move_type, pending = connection.policy_moves()
+    candidates = sorted(set(pending))
+    result["policy"] = move_type.strip(" ,")
+    result["candidates"] = [point_to_move[point] for point in candidates]
+    if len(candidates) == 1 or move_type == "Win ":
+        result.update(best=point_to_move[pending[0]], simulations=0)
+        return result
+    engine.set_seed(seed)
+    engine.reset_tree()
+    best = engine.genmove(candidates, board, color)
+    info = engine.last_info
+    result["best"] = point_to_move[best]
+    result["simulations"] = info["simulations"]
+    result["win_rate"] = next(round(float(rate), 4)
+                              for point, visits, rate in info["moves"]
+                              if point == best)
+    result["top"] = [[point_to_move[point], visits, round(float(rate), 4)]
+                     for point, visits, rate in info["moves"][:5]]
+    return result
+
+def completed_items(output):
+    """
+    Number of complete lines in output. A partial last line, left by
+    an interrupted run, is cut off.
+    """
+    if not os.path.exists(output):
+        return 0
+    count = 0
+    good = 0
+    with open(output, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                json.loads(line)
+            except ValueError:
+                break
+            count += 1
+            good = f.tell()
+    with open(output, "r+b") as f:
+        f.truncate(good)
+    return count
+
+def analyze_archive(paths, output, playouts, parallel, resume=False,
+                    window=None, log=sys.stderr):
+    """ Analyze every position of the archive into output """
+    done = completed_items(output) if resume else 0
+    if not resume and os.path.exists(output) and os.path.getsize(output):
+        raise ValueError("{} exists, use --resume to continue it"
+                         .format(output))
+    window = window or 4 * parallel
+    items = enumerate(iter_items(paths))
+    finished = {}
+    next_out = done
+    written = 0
+    reported = done // 100
+    with open(output, "a") as out, \
+         ProcessPoolExecutor(max_workers=parallel, initializer=_worker_init,
+                             initargs=(playouts,)) as executor:
+        pending = {}
+        exhausted = False
+        while not exhausted or pending:
+            while not exhausted and len(pending) + len(finished) < window:
+                try:
+                    seq, item = next(items)
+                except StopIteration:
+                    exhausted = True
+                    break
+                if seq < done:
+                    continue
+                pending[executor.submit(analyze_position, item, seq)] = \
+                    (seq, item)
+            if not pending:
+                break
+            ready, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in ready:
+                seq, item = pending.pop(future)
+                try:
+                    finished[seq] = future.result()
+                except Exception as e:
+                    # one broken item must not end the run
+                    finished[seq] = {"source": item["source"],
+                                     "game": item["game"],
+                                     "error": "{}: {}".format(
+                                         type(e).__name__, e)}
+            while next_out in finished:
+                result = finished.pop(next_out)
+                result["seq"] = next_out
+                out.write(json.dumps(result) + "\n")
+                next_out += 1
+                written += 1
+            out.flush()
+            if next_out // 100 > reported:
+                reported = next_out // 100
+                log.write("{} positions\n".format(next_out))
+                log.flush()
+    return done, written
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="analyze an SGF archive")
+    parser.add_argument("archive", nargs="+",
+                        help="SGF files or directories of them")
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--playouts", type=int, default=500,
+                        help="simulations per position")
+    parser.add_argument("--parallel", type=int, default=os.cpu_count())
+    parser.add_argument("--resume", action="store_true",
+                        help="continue an interrupted run into --output")
+    args = parser.parse_args(argv)
+    try:
+        skipped, written = analyze_archive(args.archive, args.output,
+                                           args.playouts, args.parallel,
+                                           args.resume)
+    except ValueError as e:
+        parser.error(str(e))
+    print("{} positions analyzed, {} done before".format(written, skipped))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,5 @@
+"""
+benchmarks
+Performance measurements for the Gomoku engine.
+Run the modules from the repository root, e.g. python -m benchmarks.playouts
+"""
@@ -0,0 +1,111 @@
+"""
+pattern_playouts.py
+Uniform random against pattern biased playouts: playouts per second,
+cost per playout move, and how well the playout results predict the
+outcome of held-out self-play games.
+
+Positions are drawn from a self-play data set (selfplay_data.py) that
+was not used to fit the table. From each, both policies run the same
+number of playouts for the player to move, truncated at the cutoff of
+the engine unless --cutoff is given. The mean reward predicts the winner when its sign matches the
+game result; the squared error is taken against the result as +1 or
+-1.
+
+Usage: python -m benchmarks.pattern_playouts TABLE --data DIR
+           [--positions N] [--playouts N] [--cutoff N] [--seed S]
+"""
+import argparse
+import random
+import time
+
+from board_util import BLACK, WHITE
+from Gomoku4 import SimulationPlayer
+from pattern_policy import PatternPolicy
+from playout_rng import PlayoutRNG
+from selfplay_data import ShardDataset
+from simple_board import SimpleGoBoard
+
+def load_positions(directory, count, seed):
+    """ (board, to_play, winner) of count positions of a data set """
+    dataset = ShardDataset(directory)
+    indices = sorted(random.Random(seed).sample(range(len(dataset)),
+                                                min(count, len(dataset))))
+    records = dataset.records(indices)
+    grids = dataset.stones(records)
+    positions = []
+    for grid, record in zip(grids, records):
+        board = SimpleGoBoard(dataset.size)
+        for row in range(dataset.size):
+            for col in range(dataset.size):
+                if grid[row, col] in (BLACK, WHITE):
+                    board.play_move_gomoku(board.pt(row + 1, col + 1),
+                                           int(grid[row, col]))
+        board.current_player = int(record["to_play"])
+        positions.append((board, int(record["to_play"]),
+                          int(record["winner"])))
+    return positions
+
+def run_policy(simulate, positions, playouts, cutoff):
+    """ Seconds, moves, and mean reward per position of a policy """
+    seconds = 0.0
+    moves = 0
+    means = []
+    for board, to_play, _ in positions:
+        total = 0.0
+        for _ in range(playouts):
+            copy = board.copy()
+            start = time.perf_counter()
+            total += simulate(copy, to_play, cutoff)
+            seconds += time.perf_counter() - start
+            moves += copy.moveNumber() - board.moveNumber()
+        means.append(total / playouts)
+    return seconds, moves, means
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="pattern playouts")
+    parser.add_argument("table", help="pattern table, see fit_patterns.py")
+    parser.add_argument("--data", required=True,
+                        help="held-out self-play data set")
+    parser.add_argument("--positions", type=int, default=200)
+    parser.add_argument("--playouts", type=int, default=20,
+                        help="playouts per position and policy")
+    parser.add_argument("--cutoff", type=int, default=None,
+                        help="playout cutoff, 0 plays to the end; "
+                             "default the engine's")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    patterns = PatternPolicy.load(args.table)
+    positions = load_positions(args.data, args.positions, args.seed)
+    cutoff = args.cutoff
+    if cutoff is None:
+        cutoff = SimulationPlayer().cutoff_for(positions[0][0].size)
+    rng = PlayoutRNG(args.seed)
+    policies = [
+        ("uniform", lambda board, color, cutoff:
+            board.cutoff_simulate(color, cutoff, rng) if cutoff else
+            board.mysimulate(color, rng)),
+        ("patterns", lambda board, color, cutoff:
+            patterns.simulate(board, color, cutoff, rng)),
+    ]
+    for board, _, _ in positions:
+        board.track_patterns(patterns)
+    print("{} positions, {} playouts each, cutoff {}".format(
+        len(positions), args.playouts, cutoff))
+    print("{:>10} {:>8} {:>10} {:>12} {:>10} {:>8}".format(
+        "policy", "pps", "length", "us per move", "predicted", "error"))
+    for name, simulate in policies:
+        seconds, moves, means = run_policy(simulate, positions,
+                                           args.playouts, cutoff)
+        count = len(positions) * args.playouts
+        outcomes = [1 if winner == to_play else -1
+                    for _, to_play, winner in positions]
+        predicted = sum(1 for mean, outcome in zip(means, outcomes)
+                        if mean * outcome > 0) / len(positions)
+        error = sum((mean - outcome) ** 2 for mean, outcome
+                    in zip(means, outcomes)) / len(positions)
+        print("{:>10} {:8.0f} {:10.1f} {:12.1f} {:10.1%} {:8.3f}".format(
+            name, count / seconds, moves / count,
+            1e6 * seconds / max(moves, 1), predicted, error))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+playouts.py
+Compare full random rollouts with truncated playouts scored by the
+static evaluator: average playout length, playouts per second and
+how often the truncated estimate agrees with the full rollout result.
+
+Usage: python -m benchmarks.playouts [size] [cutoff] [num_playouts]
+"""
+import random
+import sys
+import time
+
+from board_util import BLACK, WHITE, GoBoardUtil
+from simple_board import SimpleGoBoard
+
+def random_position(size, num_stones, seed):
+    """ Play num_stones random moves that do not end the game """
+    rng = random.Random(seed)
+    board = SimpleGoBoard(size)
+    for _ in range(num_stones):
+        moves = board.legalMoves()
+        point = moves[rng.randrange(len(moves))]
+        board.play_move_gomoku(point, board.current_player)
+        if board.endOfGame():
+            board.undoMove()
+    return board
+
+def run_full(board, color, n):
+    lengths = 0
+    rewards = []
+    start = time.time()
+    for _ in range(n):
+        b = board.copy()
+        moveNr = b.moveNumber()
+        rewards.append(b.mysimulate(color))
+        lengths += b.moveNumber() - moveNr
+    return time.time() - start, lengths / n, sum(rewards) / n
+
+def run_cutoff(board, color, n, cutoff):
+    lengths = 0
+    rewards = []
+    start = time.time()
+    for _ in range(n):
+        b = board.copy()
+        moveNr = b.moveNumber()
+        rewards.append(b.cutoff_simulate(color, cutoff))
+        lengths += b.moveNumber() - moveNr
+    return time.time() - start, lengths / n, sum(rewards) / n
+
+def main(argv):
+    size = int(argv[1]) if len(argv) > 1 else 7
+    cutoff = int(argv[2]) if len(argv) > 2 else 6
+    n = int(argv[3]) if len(argv) > 3 else 200
+    print("size {} cutoff {} playouts {}".format(size, cutoff, n))
+    print("{:>6} {:>10} {:>10} {:>10} {:>10} {:>10} {:>10}".format(
+        "stones", "full pps", "full len", "full val",
+        "cut pps", "cut len", "cut val"))
+    for stones in (2, size, 2 * size, size * size // 2):
+        board = random_position(size, stones, seed=stones)
+        color = GoBoardUtil.opponent(board.current_player)
+        t_full, len_full, val_full = run_full(board, color, n)
+        t_cut, len_cut, val_cut = run_cutoff(board, color, n, cutoff)
+        print("{:>6} {:>10.0f} {:>10.1f} {:>10.2f} {:>10.0f} {:>10.1f} {:>10.2f}"
+              .format(stones, n / t_full, len_full, val_full,
+                      n / t_cut, len_cut, val_cut))
+
+if __name__ == '__main__':
+    main(sys.argv)
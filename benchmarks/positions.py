@@ -0,0 +1,49 @@
+"""
+positions.py
+Curated benchmark positions, given as move sequences in GTP notation
+starting with Black. None of them is finished: no five on the board
+and every position can still be won by somebody.
+"""
+from gtp_connection import point_tables
+from simple_board import SimpleGoBoard
+
+POSITIONS = {
+    "7x7-opening": (7, ["D4", "C3"]),
+    "7x7-tactical": (7, ["D4", "A1", "C4", "A2", "E4"]),
+    "7x7-middlegame": (7, ["D4", "C3", "C4", "E4", "B4", "A4", "D5", "D3",
+                           "E5", "F5", "C5"]),
+    "7x7-nearfull": (7, ["G3", "C2", "G4", "C7", "D1", "F1", "E6", "B2", "B5",
+                         "E7", "E1", "G6", "E3", "C1", "E2", "D6", "C6", "D2",
+                         "B3", "G1", "D5", "E4", "B1", "A6", "G2", "A4", "D7",
+                         "F7", "A7", "A2", "G7", "E5", "F2", "D4", "A1",
+                         "C5"]),
+    "15x15-opening": (15, ["H8", "J9"]),
+    "15x15-tactical": (15, ["H8", "G7", "J8", "H7", "K8", "J7", "G9", "F6",
+                            "E5", "L8", "F10"]),
+    "15x15-nearfull": (15, [
+        "J4", "C1", "A10", "M13", "L1", "N3", "F5", "F1", "C2", "F15", "C13",
+        "M3", "H13", "N7", "K5", "D3", "G7", "M9", "D14", "O7", "G6", "K8",
+        "C6", "M7", "H5", "A5", "D8", "E7", "J5", "D7", "G15", "F11", "L9",
+        "N5", "L12", "J10", "O9", "E11", "K2", "O10", "O12", "N8", "H10",
+        "D13", "L7", "N15", "O14", "P10", "N9", "F2", "P11", "G1", "C5", "A4",
+        "B13", "M4", "A15", "H1", "K7", "G13", "H12", "F4", "E3", "K3", "L10",
+        "D2", "N2", "G12", "L14", "H8", "C11", "N13", "N6", "L5", "P14", "A14",
+        "C10", "A3", "B7", "D9", "E9", "E5", "J9", "M11", "C14", "F10", "F13",
+        "O2", "J8", "J14", "N4", "C4", "H15", "D12", "A12", "E1", "L8", "J3",
+        "D5", "M1", "A8", "B15", "P1", "O15", "P4", "H3", "F14", "B9", "G10",
+        "P8", "K15", "F9", "N1", "K9", "B2", "C9", "M15", "J2", "H11", "G5",
+        "C15", "K14", "O11", "A9", "O13", "H14", "A6", "L13", "L2", "M12",
+        "B1", "G2", "F7", "E14", "F8", "D10", "P7", "H2", "G14", "P6", "P13",
+        "B11", "C7", "A13", "K1", "B10", "D1", "O8", "M10", "J13"]),
+}
+
+def load(name):
+    """ Return a SimpleGoBoard with the moves of position name played """
+    size, moves = POSITIONS[name]
+    board = SimpleGoBoard(size)
+    move_to_point = point_tables(size)[1]
+    for move in moves:
+        board.play_move_gomoku(move_to_point[move.lower()],
+                               board.current_player)
+    assert not board.endOfGame()
+    return board
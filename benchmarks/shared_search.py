@@ -0,0 +1,100 @@
+"""
+shared_search.py
+Synchronization overhead of the shared memory search per genmove.
+
+For each worker count the engine plays a few timed genmoves on a 15x15
+middlegame position and reports the simulations of all processes, the
+engine's time writing the position and reading the statistics rows,
+and the workers' time publishing them. For comparison, the cost of
+pickling the position and a statistics dict for every worker at the
+same rate, as a pipe or queue based design would, is measured in the
+engine process.
+
+Usage: python -m benchmarks.shared_search [--workers 0 1 2 4] [--seconds S]
+"""
+import argparse
+import io
+import pickle
+import statistics
+import time
+
+from benchmarks.positions import POSITIONS
+from Gomoku4 import SimulationPlayer
+from gtp_connection import GtpConnection
+from simple_board import SimpleGoBoard
+
+def make_connection(name, workers):
+    size, moves = POSITIONS[name]
+    connection = GtpConnection.deferred(SimulationPlayer, SimpleGoBoard, size,
+                                        outfile=io.StringIO())
+    connection.proven_cache_cmd(["off"])
+    connection.decision_cache_cmd(["off"])
+    if workers:
+        connection.shared_workers_cmd([str(workers)])
+    for number, move in enumerate(moves):
+        connection.play_cmd(["b" if number % 2 == 0 else "w", move])
+    return connection
+
+def pickle_cost(board, candidates, workers, messages):
+    """
+    Seconds to pickle and unpickle the position and a statistics dict
+    messages times for each of workers
+    """
+    stats = dict((point, (100, 12.5)) for point in candidates)
+    start = time.perf_counter()
+    for _ in range(messages):
+        for _ in range(workers):
+            pickle.loads(pickle.dumps(board.copy()))
+            pickle.loads(pickle.dumps(stats))
+    return time.perf_counter() - start
+
+def measure(name, workers, seconds, repeat):
+    connection = make_connection(name, workers)
+    # let the workers start up before the clock runs
+    time.sleep(1.0 if workers else 0.0)
+    connection.timelimit = seconds
+    board = connection.board
+    color = "b" if board.current_player == 1 else "w"
+    rows = []
+    for _ in range(repeat):
+        connection.genmove_cmd([color])
+        stats = connection.engine_stats()
+        rows.append(stats)
+        board.undoMove()
+        connection.go_engine.reset_tree()
+    engine = connection.go_engine
+    result = {
+        "simulations": statistics.median(row["last_simulations"]
+                                         for row in rows),
+    }
+    if workers:
+        result["sync_ms"] = statistics.median(row["shared_sync_ms"]
+                                              for row in rows)
+        result["publish_ms"] = statistics.median(row["shared_publish_ms"]
+                                                 for row in rows)
+        publishes = statistics.median(row["shared_publishes"] for row in rows)
+        result["pickle_ms"] = 1000 * pickle_cost(
+            board, engine.moves, 1, int(publishes))
+    connection.stop_playout_workers()
+    return result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="shared memory search")
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 1, 2])
+    parser.add_argument("--seconds", type=float, default=1.0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--position", default="15x15-tactical",
+                        choices=sorted(POSITIONS))
+    args = parser.parse_args(argv)
+    print("{:>8} {:>12} {:>10} {:>11} {:>10}".format(
+        "workers", "simulations", "sync ms", "publish ms", "pickle ms"))
+    for workers in args.workers:
+        result = measure(args.position, workers, args.seconds, args.repeat)
+        print("{:8d} {:12.0f} {:>10} {:>11} {:>10}".format(
+            workers, result["simulations"],
+            "{:.3f}".format(result["sync_ms"]) if workers else "-",
+            "{:.3f}".format(result["publish_ms"]) if workers else "-",
+            "{:.3f}".format(result["pickle_ms"]) if workers else "-"))
+
+if __name__ == '__main__':
+    main()
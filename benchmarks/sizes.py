@@ -0,0 +1,93 @@
+"""
+sizes.py
+genmove cost at each supported board size: latency at a fixed number
+of simulations, simulations per second at a fixed time per move, and
+the number of candidate moves searched, all in the same early
+middlegame shape around the center.
+
+Usage: python -m benchmarks.sizes [--playouts N] [--seconds S]
+"""
+import argparse
+import io
+import statistics
+import time
+
+from Gomoku4 import SimulationPlayer
+from gtp_connection import GtpConnection
+from simple_board import SimpleGoBoard
+
+SIZES = (7, 9, 15, 19)
+
+# (row, column) offsets from the center, played alternately from Black.
+# In the quiet shape no two stones of a color share a line, so all
+# points near the stones are searched; the tactical one has open threes.
+SHAPES = {
+    "quiet": [(0, 0), (1, 1), (-2, 1), (2, -1)],
+    "tactical": [(0, 0), (1, 1), (0, 1), (-1, 0), (1, -1), (2, 0), (-1, 2),
+                 (0, -2)],
+}
+
+def make_connection(size, shape, seed=1):
+    board = SimpleGoBoard(size)
+    connection = GtpConnection(SimulationPlayer(), board,
+                               outfile=io.StringIO())
+    connection.proven_cache_cmd(["off"])
+    connection.decision_cache_cmd(["off"])
+    connection.random_seed_cmd([str(seed)])
+    center = (size + 1) // 2
+    for drow, dcol in SHAPES[shape]:
+        board.play_move_gomoku(board.pt(center + drow, center + dcol),
+                               board.current_player)
+    assert not board.endOfGame()
+    return connection
+
+def timed_genmove(connection):
+    """ Run one genmove, take it back, return its wall time """
+    board = connection.board
+    color = "b" if board.current_player == 1 else "w"
+    start = time.perf_counter()
+    connection.genmove_cmd([color])
+    elapsed = time.perf_counter() - start
+    board.undoMove()
+    connection.go_engine.reset_tree()
+    return elapsed
+
+def measure(size, shape, playouts, seconds, repeat=3):
+    connection = make_connection(size, shape)
+    engine = connection.go_engine
+    move_type, candidates = connection.policy_moves()
+    engine.playout_limit = playouts
+    latency = statistics.median(timed_genmove(connection)
+                                for _ in range(repeat))
+    engine.playout_limit = 0
+    connection.timelimit = seconds
+    elapsed = timed_genmove(connection)
+    return {
+        "size": size,
+        "shape": shape,
+        "category": move_type.strip(),
+        "candidates": len(candidates),
+        "cutoff": engine.cutoff_for(size),
+        "latency_ms": 1000 * latency,
+        "sims_per_sec": engine.last_simulations / elapsed,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="genmove cost per board size")
+    parser.add_argument("--playouts", type=int, default=1000,
+                        help="simulations per genmove for the latency")
+    parser.add_argument("--seconds", type=float, default=1.0,
+                        help="time per genmove for the throughput")
+    args = parser.parse_args(argv)
+    print("{:>5} {:>9} {:>10} {:>11} {:>7} {:>14} {:>12}".format(
+        "size", "shape", "category", "candidates", "cutoff", "genmove ms",
+        "sims/s"))
+    for shape in sorted(SHAPES):
+        for size in SIZES:
+            row = measure(size, shape, args.playouts, args.seconds)
+            print("{size:>5} {shape:>9} {category:>10} {candidates:>11} "
+                  "{cutoff:>7} {latency_ms:>14.1f} {sims_per_sec:>12.0f}"
+                  .format(**row))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+startup.py
+Cold-start latency of the GTP engine, as seen by a tournament manager
+that starts a fresh Gomoku4.py process for every game.
+
+Measured from process start: the protocol_version and name responses,
+which must not wait for NumPy, the engine or the board, and the first
+genmove, which creates them. Every run uses a fresh table cache
+directory for the first start ("cold", tables are built and stored)
+and the same one afterwards ("warm", tables are loaded from disk).
+A bare interpreter answering one line is the reference; the handshake
+overhead over it is checked against BUDGET_MS.
+
+Usage: python -m benchmarks.startup [--repeat N] [--size N] [--budget MS]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# milliseconds the protocol_version response may take beyond a bare
+# interpreter start
+BUDGET_MS = 40.0
+
+ENGINE = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), "Gomoku4.py")
+
+BARE = "import sys; sys.stdin.readline(); print('= 2\\n', flush=True); " \
+       "sys.stdin.read()"
+
+def read_response(stream):
+    """ Read one GTP response, up to its empty line """
+    lines = []
+    while True:
+        line = stream.readline()
+        if not line:
+            raise RuntimeError("engine exited: {}".format("".join(lines)))
+        if line.strip() == "" and lines:
+            return "".join(lines)
+        if line.strip():
+            lines.append(line)
+
+def start_session(argv, commands, env=None):
+    """
+    Start argv, send commands one at a time and return the time of
+    each response in milliseconds since the process was started.
+    """
+    start = time.perf_counter()
+    process = subprocess.Popen(argv, stdin=subprocess.PIPE,
+                               stdout=subprocess.PIPE, text=True, env=env)
+    times = []
+    try:
+        for command in commands:
+            process.stdin.write(command + "\n")
+            process.stdin.flush()
+            read_response(process.stdout)
+            times.append(1000 * (time.perf_counter() - start))
+        process.stdin.write("quit\n")
+        process.stdin.flush()
+    finally:
+        process.communicate()
+    return times
+
+def measure(repeat, size, playouts):
+    commands = ["protocol_version", "name", "boardsize {}".format(size),
+                "playout_limit {}".format(playouts), "genmove b"]
+    bare = []
+    cold = []
+    warm = []
+    for _ in range(repeat):
+        bare.append(start_session([sys.executable, "-c", BARE],
+                                  ["protocol_version"])[0])
+        with tempfile.TemporaryDirectory() as cache:
+            env = dict(os.environ, GOMOKU_CACHE_DIR=cache)
+            argv = [sys.executable, ENGINE]
+            cold.append(start_session(argv, commands, env))
+            warm.append(start_session(argv, commands, env))
+    median = lambda values: round(statistics.median(values), 1)
+    result = {"bare_interpreter_ms": median(bare)}
+    for label, runs in (("cold", cold), ("warm", warm)):
+        result[label + "/protocol_version_ms"] = median(t[0] for t in runs)
+        result[label + "/name_ms"] = median(t[1] for t in runs)
+        result[label + "/first_genmove_ms"] = median(t[-1] for t in runs)
+    result["handshake_overhead_ms"] = round(
+        result["warm/protocol_version_ms"] - result["bare_interpreter_ms"], 1)
+    return result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="engine startup latency")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--size", type=int, default=15)
+    parser.add_argument("--playouts", type=int, default=50,
+                        help="simulations of the first genmove")
+    parser.add_argument("--budget", type=float, default=BUDGET_MS,
+                        help="allowed handshake overhead in milliseconds")
+    args = parser.parse_args(argv)
+    result = measure(args.repeat, args.size, args.playouts)
+    for name, value in result.items():
+        print("{:32s} {:8.1f}".format(name, value))
+    if result["handshake_overhead_ms"] > args.budget:
+        print("over budget: {:.1f} ms > {:.1f} ms".format(
+            result["handshake_overhead_ms"], args.budget))
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,234 @@
+"""
+suite.py
+Benchmark suite over the curated positions in positions.py.
+
+For every position it measures playouts per second of mysimulate and
+the latency of policy_moves, check_game_end_gomoku and genmove at a
+fixed playout budget, plus the peak Python memory of a genmove. The
+suite runs --runs times and reports the median of every metric with
+its spread, (max - min) / median over the runs. The report is
+written as JSON and compared against a stored baseline made with the
+same --quick setting; the run fails if any metric is worse than the
+baseline by more than the tolerance, or by more than the spreads of
+the baseline and the run together if those are larger, so that the
+noise of a machine is not reported as a regression.
+
+Usage: python -m benchmarks.suite [--quick] [--runs 3] [--tolerance 0.25]
+                                  [--output report.json] [--update-baseline]
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from benchmarks.positions import POSITIONS, load
+from Gomoku4 import SimulationPlayer
+from gtp_connection import GtpConnection
+from simple_board import SimpleGoBoard
+import threats
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        "baseline.json")
+
+def make_connection(name):
+    """
+    A GTP connection set up the way a client would: position name is
+    entered move by move with play commands.
+    """
+    size, moves = POSITIONS[name]
+    connection = GtpConnection(SimulationPlayer(), SimpleGoBoard(size),
+                               outfile=io.StringIO())
+    connection.proven_cache_cmd(["off"])
+    connection.decision_cache_cmd(["off"])
+    connection.random_seed_cmd(["1"])
+    for i, move in enumerate(moves):
+        connection.play_cmd(["b" if i % 2 == 0 else "w", move])
+    output = connection.outfile.getvalue()
+    assert "?" not in output, output
+    connection.outfile = io.StringIO()
+    return connection
+
+def timed(function, repeat):
+    """ Median wall time of repeat calls of function, in seconds """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+def bench_playouts(board, count):
+    color = board.current_player
+    start = time.perf_counter()
+    for _ in range(count):
+        board.copy().mysimulate(color)
+    return count / (time.perf_counter() - start)
+
+def bench_genmove(connection, budget, repeat):
+    """ Median latency of genmove with a fixed simulation budget """
+    board = connection.board
+    color = "b" if board.current_player == 1 else "w"
+    connection.go_engine.playout_limit = budget
+    connection.timelimit = 3600
+    def genmove():
+        connection.genmove_cmd([color])
+        board.undoMove()
+        connection.go_engine.reset_tree()
+    return timed(genmove, repeat)
+
+def bench_memory(connection, budget):
+    """ Peak traced Python memory of one genmove, in KiB """
+    board = connection.board
+    color = "b" if board.current_player == 1 else "w"
+    connection.go_engine.playout_limit = budget
+    tracemalloc.start()
+    connection.genmove_cmd([color])
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    board.undoMove()
+    connection.go_engine.reset_tree()
+    return peak / 1024.0
+
+def run_suite(quick=False, names=None):
+    """
+    Run the benchmarks and return the metrics as
+    {name: {"value": v, "unit": u, "better": "higher" or "lower"}}
+    """
+    scale = 1 if quick else 4
+    metrics = {}
+    def add(name, value, unit, better):
+        metrics[name] = {"value": round(value, 6), "unit": unit,
+                         "better": better}
+    for name in names or sorted(POSITIONS):
+        board = load(name)
+        connection = make_connection(name)
+        add(name + "/playouts_per_sec",
+            bench_playouts(board, 50 * scale), "1/s", "higher")
+        add(name + "/policy_moves_ms",
+            1000 * timed(connection.policy_moves, 5 * scale), "ms", "lower")
+        add(name + "/check_game_end_us",
+            1e6 * timed(board.check_game_end_gomoku, 200 * scale), "us",
+            "lower")
+        add(name + "/genmove_ms",
+            1000 * bench_genmove(connection, 100 * scale, 3), "ms", "lower")
+        add(name + "/genmove_peak_kib",
+            bench_memory(connection, 100 * scale), "KiB", "lower")
+    grids = np.stack([load(name).stones_grid() for name in sorted(POSITIONS)
+                      if POSITIONS[name][0] == 15])
+    grids = np.repeat(grids, 100 * scale // len(grids), axis=0)
+    add("batch/threat_boards_per_sec",
+        len(grids) / timed(lambda: threats.threat_flags(grids), 3), "1/s",
+        "higher")
+    add("process/max_rss_mib",
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, "MiB",
+        "lower")
+    return metrics
+
+def run_repeated(runs, quick=False, names=None):
+    """
+    run_suite runs times; the median of every metric, with its spread
+    (max - min) / median over the runs
+    """
+    results = [run_suite(quick, names) for _ in range(runs)]
+    metrics = {}
+    for name, metric in results[0].items():
+        values = [result[name]["value"] for result in results]
+        median = statistics.median(values)
+        spread = (max(values) - min(values)) / median if median else 0.0
+        metrics[name] = dict(metric, value=round(median, 6),
+                             spread=round(spread, 4))
+    return metrics
+
+def compare(metrics, baseline, tolerance):
+    """
+    Return a list of (name, value, baseline value) for every metric
+    that is worse than the baseline by more than tolerance, or than
+    the spreads of both together if that is larger.
+    """
+    regressions = []
+    for name, metric in sorted(metrics.items()):
+        if name not in baseline:
+            continue
+        reference = baseline[name]["value"]
+        value = metric["value"]
+        allowed = max(tolerance, metric.get("spread", 0.0) +
+                      baseline[name].get("spread", 0.0))
+        if metric["better"] == "higher":
+            worse = value < reference * (1 - allowed)
+        else:
+            worse = value > reference * (1 + allowed)
+        if worse:
+            regressions.append((name, value, reference))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gomoku benchmark suite")
+    parser.add_argument("--quick", action="store_true",
+                        help="smaller sample sizes")
+    parser.add_argument("--runs", type=int, default=3,
+                        help="runs of the suite, metrics are their medians")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed relative slowdown against the baseline")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--output", default=None,
+                        help="write the report here as JSON")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="store this run as the new baseline")
+    parser.add_argument("--positions", nargs="*", default=None)
+    args = parser.parse_args(argv)
+    if args.runs < 1:
+        parser.error("--runs must be at least 1")
+    baseline = None
+    if os.path.exists(args.baseline) and not args.update_baseline:
+        with open(args.baseline) as f:
+            stored = json.load(f)
+        if stored.get("quick", False) != args.quick:
+            # quick runs have other sample sizes, so other medians
+            print("baseline {} was made {} --quick; run the suite the same "
+                  "way or store a new baseline".format(
+                      args.baseline, "with" if stored.get("quick") else
+                      "without"))
+            return 2
+        baseline = stored["metrics"]
+
+    metrics = run_repeated(args.runs, args.quick, args.positions)
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "quick": args.quick,
+        "runs": args.runs,
+        "metrics": metrics,
+    }
+    regressions = []
+    if baseline is not None:
+        regressions = compare(metrics, baseline, args.tolerance)
+        report["baseline"] = args.baseline
+        report["regressions"] = [{"metric": name, "value": value,
+                                  "baseline": reference}
+                                 for name, value, reference in regressions]
+    for name, metric in sorted(metrics.items()):
+        print("{:45} {:>14.3f} {:4} +-{:.0%}".format(
+            name, metric["value"], metric["unit"], metric["spread"] / 2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print("baseline written to {}".format(args.baseline))
+        return 0
+    for name, value, reference in regressions:
+        print("REGRESSION {}: {:.3f} vs baseline {:.3f}".format(
+            name, value, reference))
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,7 +3,8 @@ board_util.py
 Utility functions for Go board.
 """
 
-import numpy as np
+from lazy_import import lazy_module
+np = lazy_module("numpy")
 
 """
 Encoding of colors on and off a Go board.
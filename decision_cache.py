@@ -0,0 +1,81 @@
+"""
+decision_cache.py
+In-process cache of genmove decisions shared between games.
+
+Decisions are keyed by board size, canonical Zobrist hash and color to
+move, like the results of proven_store, and store the chosen move in
+the canonical orientation together with the effort of the search that
+chose it: its simulations, the visits of the move and its win rate.
+A lookup only returns a decision whose search ran at least
+min_simulations simulations, so a position met again in a later game
+is answered at once when it was searched well enough before, and
+searched again otherwise. The cache holds at most capacity decisions
+and drops the least recently used one when it is full.
+"""
+from collections import OrderedDict
+
+class Decision(object):
+    __slots__ = ("move", "simulations", "visits", "win_rate")
+
+    def __init__(self, move, simulations, visits, win_rate):
+        # move in the canonical orientation, see zobrist.to_canonical
+        self.move = move
+        self.simulations = simulations
+        self.visits = visits
+        self.win_rate = win_rate
+
+class DecisionCache(object):
+
+    def __init__(self, capacity=4096, min_simulations=1000):
+        """
+        Arguments
+        ---------
+        capacity: int
+            most decisions held.
+        min_simulations: int
+            simulations a stored search needs for a lookup to use it.
+        """
+        if capacity < 0:
+            raise ValueError("negative capacity {}".format(capacity))
+        self.capacity = capacity
+        self.min_simulations = min_simulations
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, size, hash_value, to_move):
+        """
+        Return the stored Decision if its search meets min_simulations,
+        None otherwise.
+        """
+        key = (size, hash_value, to_move)
+        decision = self._entries.get(key)
+        if decision is None or decision.simulations < self.min_simulations:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return decision
+
+    def put(self, size, hash_value, to_move, decision):
+        """
+        Store a decision, unless one from a longer search is stored
+        for the position already.
+        """
+        key = (size, hash_value, to_move)
+        stored = self._entries.get(key)
+        if stored is not None and stored.simulations > decision.simulations:
+            self._entries.move_to_end(key)
+            return
+        self._entries[key] = decision
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
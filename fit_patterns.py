@@ -0,0 +1,202 @@
+"""
+fit_patterns.py
+Fit the line pattern table of pattern_policy to the moves of games.
+
+Positions come from self-play data sets (selfplay_data.py) and SGF
+archives (read as in analyze_archive.py). The model is the one of the
+playouts: the move played is drawn from the empty points with
+probability proportional to the sum of exp(theta[code]) over the four
+line patterns of the point. A code and its mirror image share one
+parameter. theta is fitted by maximum likelihood with a Gaussian
+prior, by full-batch gradient ascent with Adam, and exported as
+factors relative to the empty line. theta is divided by a
+temperature first: the best move predictor makes playouts too much
+alike, and a flatter table played better in test matches.
+
+The urgent threshold of the table is chosen so that on average about
+--urgent-points points of a training position have an urgent code
+for either color; see pattern_policy for how playouts use it.
+
+Usage:
+    python fit_patterns.py --selfplay data/ --sgf games/ \\
+        --output patterns.npz [--iterations 300] [--l2 0.001]
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from board_util import EMPTY
+from pattern_policy import PatternPolicy, NUM_CODES, code_maps, \
+    line_pattern_codes
+
+def selfplay_positions(directory):
+    """ (size, grids, to_play, moves) of a self-play data set """
+    from selfplay_data import ShardDataset
+    dataset = ShardDataset(directory)
+    records = dataset.records(np.arange(len(dataset)))
+    return (dataset.size, dataset.stones(records), records["to_play"],
+            records["move"].astype(np.int64))
+
+def sgf_positions(paths):
+    """ (size, grids, to_play, moves) of SGF archives, one per size """
+    from analyze_archive import iter_items
+    by_size = {}
+    for item in iter_items(paths):
+        if "error" in item:
+            continue
+        size = item["size"]
+        NS = size + 1
+        grid = np.zeros((size, size), dtype=np.int8)
+        for color, point in item["moves"]:
+            grid[point // NS - 1, point % NS - 1] = color
+        color, point = item["played"]
+        by_size.setdefault(size, []).append(
+            (grid, color, (point // NS - 1) * size + point % NS - 1))
+    for size, positions in sorted(by_size.items()):
+        grids, colors, moves = zip(*positions)
+        yield size, np.stack(grids), np.array(colors), np.array(moves)
+
+def build_samples(sources, chunk=1024):
+    """
+    Empty points of all positions as (codes, segment, target): the
+    pattern codes (P, 4) of each point from the view of the player to
+    move, the position index of each point and whether it was played.
+    Positions whose move is not on an empty point are skipped.
+    """
+    codes = []
+    segments = []
+    targets = []
+    count = 0
+    for size, grids, to_play, moves in sources:
+        for start in range(0, len(grids), chunk):
+            part = grids[start:start + chunk]
+            colors = to_play[start:start + chunk]
+            played = moves[start:start + chunk]
+            flat = part.reshape(len(part), -1)
+            valid = flat[np.arange(len(part)), played] == EMPTY
+            part, colors, played, flat = part[valid], colors[valid], \
+                played[valid], flat[valid]
+            if not len(part):
+                continue
+            point_codes = line_pattern_codes(part, colors).reshape(
+                len(part), size * size, 4)
+            board, point = np.nonzero(flat == EMPTY)
+            codes.append(point_codes[board, point])
+            segments.append(board + count)
+            targets.append(point == played[board])
+            count += len(part)
+    if not count:
+        raise ValueError("no positions")
+    return np.concatenate(codes), np.concatenate(segments), \
+        np.concatenate(targets), count
+
+def fit(codes, segments, targets, count, iterations, l2, rate=0.05,
+        log=sys.stderr):
+    """
+    Fit theta for the canonical codes seen. Returns (canonical codes,
+    theta, log-likelihood per position).
+    """
+    _, mirror = code_maps()
+    canonical = np.minimum(codes, mirror[codes])
+    seen, index = np.unique(canonical, return_inverse=True)
+    index = index.reshape(codes.shape)
+    theta = np.zeros(len(seen))
+    moment = np.zeros(len(seen))
+    square = np.zeros(len(seen))
+    target_count = np.bincount(index[targets].ravel(), minlength=len(seen))
+    loglik = 0.0
+    for step in range(1, iterations + 1):
+        factors = np.exp(theta)
+        weights = factors[index].sum(axis=1)
+        totals = np.bincount(segments, weights, minlength=count)
+        loglik = (np.log(weights[targets]).sum() - np.log(totals).sum()) / \
+                 count
+        share = factors[index] / weights[:, None]
+        expected = np.bincount(index.ravel(),
+                               (share / totals[segments][:, None] *
+                                weights[:, None]).ravel(),
+                               minlength=len(seen))
+        observed = np.bincount(index[targets].ravel(),
+                               share[targets].ravel(), minlength=len(seen))
+        gradient = (observed - expected) / count - l2 * theta
+        moment = 0.9 * moment + 0.1 * gradient
+        square = 0.999 * square + 0.001 * gradient ** 2
+        theta += rate * (moment / (1 - 0.9 ** step)) / \
+                 (np.sqrt(square / (1 - 0.999 ** step)) + 1e-8)
+        if step % 50 == 0 or step == iterations:
+            log.write("iteration {} log-likelihood {:.4f}, {} codes seen "
+                      "in the moves\n".format(step, loglik,
+                                              int((target_count > 0).sum())))
+            log.flush()
+    return seen, theta, loglik
+
+def export(seen, theta, codes, count, urgent_points, temperature):
+    """
+    Factors of all codes, relative to the empty line and flattened by
+    temperature, and the urgent threshold for the training points
+    """
+    swap, mirror = code_maps()
+    all_codes = np.arange(NUM_CODES)
+    canonical = np.minimum(all_codes, mirror[all_codes])
+    position = np.searchsorted(seen, canonical)
+    position[position == len(seen)] = 0
+    known = seen[position] == canonical
+    full = np.where(known, theta[position], 0.0)
+    factors = np.exp((full - full[0]) / temperature)
+    strongest = np.maximum(factors[codes], factors[swap[codes]]).max(axis=1)
+    rank = min(len(strongest), max(1, int(urgent_points * count)))
+    threshold = max(1.0, float(np.partition(strongest, -rank)[-rank]))
+    return factors, threshold
+
+def accuracy(factors, codes, segments, targets, count):
+    """ Fraction of positions whose move has the highest weight """
+    weights = factors[codes].sum(axis=1)
+    starts = np.flatnonzero(np.r_[True, segments[1:] != segments[:-1]])
+    best = np.maximum.reduceat(weights, starts)
+    return float((weights[targets] >= best[segments[targets]]).sum()) / count
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="fit playout patterns")
+    parser.add_argument("--selfplay", nargs="*", default=[],
+                        help="self-play data set directories")
+    parser.add_argument("--sgf", nargs="*", default=[],
+                        help="SGF files or directories")
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--iterations", type=int, default=300)
+    parser.add_argument("--l2", type=float, default=0.001,
+                        help="weight of the Gaussian prior on theta")
+    parser.add_argument("--temperature", type=float, default=2.0,
+                        help="divides theta, above 1 for more varied "
+                             "playouts")
+    parser.add_argument("--urgent-points", type=float, default=8.0,
+                        help="urgent points per position on average")
+    args = parser.parse_args(argv)
+    if not args.selfplay and not args.sgf:
+        parser.error("give --selfplay or --sgf data")
+    start = time.time()
+    sources = [selfplay_positions(d) for d in args.selfplay]
+    if args.sgf:
+        sources.extend(sgf_positions(args.sgf))
+    codes, segments, targets, count = build_samples(sources)
+    print("{} positions, {} points, read in {:.1f}s".format(
+        count, len(codes), time.time() - start))
+    seen, theta, loglik = fit(codes, segments, targets, count,
+                              args.iterations, args.l2)
+    factors, threshold = export(seen, theta, codes, count,
+                                args.urgent_points, args.temperature)
+    top = accuracy(factors, codes, segments, targets, count)
+    uniform = -np.log(np.bincount(segments, minlength=count)).mean()
+    policy = PatternPolicy(factors, threshold, {
+        "positions": count, "log_likelihood": loglik,
+        "accuracy": top, "temperature": args.temperature})
+    policy.save(args.output)
+    print("log-likelihood {:.4f} per position (uniform {:.4f}), move "
+          "predicted {:.1%}, threshold {:.2f}".format(loglik, uniform, top,
+                                                      threshold))
+    print("wrote {} in {:.1f}s".format(args.output, time.time() - start))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
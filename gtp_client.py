@@ -0,0 +1,68 @@
+"""
+gtp_client.py
+Minimal GTP client for the socket server in gtp_server.py.
+
+Usage: python gtp_client.py ADDRESS < commands.gtp
+Sends each command line from stdin and prints the responses.
+"""
+import socket
+import sys
+
+from gtp_server import parse_address
+
+class GtpClient(object):
+
+    def __init__(self, address, timeout=None):
+        kind, host, port = parse_address(address)
+        if kind == "unix":
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.settimeout(timeout)
+            self.sock.connect(host)
+        else:
+            self.sock = socket.create_connection((host, port), timeout)
+        self.stream = self.sock.makefile("rwb")
+
+    def send(self, command):
+        """
+        Send one command and return (success, response text).
+        """
+        self.stream.write((command.strip() + "\n").encode("utf-8"))
+        self.stream.flush()
+        lines = []
+        while True:
+            line = self.stream.readline()
+            if not line:
+                raise ConnectionError("server closed the connection")
+            line = line.decode("utf-8").rstrip("\r\n")
+            if line == "" and lines:
+                break
+            if line or lines:
+                lines.append(line)
+        response = "\n".join(lines)
+        return response[0] == "=", response[1:].strip()
+
+    def close(self):
+        self.stream.close()
+        self.sock.close()
+
+def main(argv):
+    if len(argv) != 2:
+        sys.stderr.write(__doc__)
+        return 2
+    client = GtpClient(argv[1])
+    try:
+        for line in sys.stdin:
+            if not line.strip() or line.startswith("#"):
+                continue
+            success, response = client.send(line)
+            sys.stdout.write("{} {}\n\n".format("=" if success else "?",
+                                               response))
+            sys.stdout.flush()
+            if line.split()[0] == "quit":
+                break
+    finally:
+        client.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -6,17 +6,32 @@ Parts of this code were originally based on the gtp module
 in the Deep-Go project by Isaac Henrion and Amos Storkey 
 at the University of Edinburgh.
 """
-import traceback
+import io
+import os
+import select
 from sys import stdin, stdout, stderr
 from board_util import GoBoardUtil, BLACK, WHITE, EMPTY, BORDER, PASS, \
                        MAXSIZE, coord_to_point
-import numpy as np
+from lazy_import import lazy_module
+np = lazy_module("numpy")
+json = lazy_module("json")
+traceback = lazy_module("traceback")
 import re
-import signal
+import time
+import size_tables
+import threats
+import zobrist
+from time_manager import TimeManager, INSTANT
+from proven_store import ProvenResultStore, WIN, LOSS
+from decision_cache import DecisionCache, Decision
+
+# policy categories whose moves make fours, where prove_win can find a
+# forced win
+PROVABLE = ("OpenFour ", "DoubleDeadFour")
 
 class GtpConnection():
 
-    def __init__(self, go_engine, board, debug_mode = False):
+    def __init__(self, go_engine, board, debug_mode = False, outfile = None):
         """
         Manage a GTP connection for a Go-playing engine
 
@@ -26,10 +41,21 @@ class GtpConnection():
             a program that can reply to a set of GTP commandsbelow
         board: 
             Represents the current board state.
+        outfile:
+            stream the responses are written to, stdout by default.
+        See deferred() for a connection that creates the engine and the
+        board on first use.
         """
         self._debug_mode = debug_mode
-        self.go_engine = go_engine
-        self.board = board
+        self.outfile = outfile or stdout
+        self._go_engine = go_engine
+        self._board = board
+        # factories and board size of a deferred connection
+        self.engine_factory = None
+        self.board_factory = None
+        self.deferred_size = None
+        # engine attributes set before a deferred engine was created
+        self.engine_settings = {}
         self.policy_type = "rule_based"
         #signal.signal(signal.SIGALRM, self.handler)
         self.commands = {
@@ -54,12 +80,62 @@ class GtpConnection():
             "gogui-rules_final_result": self.gogui_rules_final_result_cmd,
             "gogui-analyze_commands": self.gogui_analyze_cmd,
             "timelimit": self.timelimit_cmd,
+            "time_settings": self.time_settings_cmd,
+            "time_left": self.time_left_cmd,
             "policy_moves": self.policy_moves_cmd,
             "policy": self.policy_cmd,
-            "count":self.count_color_cmd
+            "count":self.count_color_cmd,
+            "playout_cutoff": self.playout_cutoff_cmd,
+            "random_seed": self.random_seed_cmd,
+            "node_budget": self.node_budget_cmd,
+            "playout_workers": self.playout_workers_cmd,
+            "shared_workers": self.shared_workers_cmd,
+            "playout_patterns": self.playout_patterns_cmd,
+            "proven_cache": self.proven_cache_cmd,
+            "decision_cache": self.decision_cache_cmd,
+            "decision_cache_threshold": self.decision_cache_threshold_cmd,
+            "live_analysis": self.live_analysis_cmd,
+            "analyze_interval": self.analyze_interval_cmd,
+            "search_analysis": self.search_analysis_cmd,
+            "search_analysis_text": self.search_analysis_text_cmd,
+            "engine_stats": self.engine_stats_cmd,
+            "engine_stats_json": self.engine_stats_json_cmd,
+            "profile_start": self.profile_start_cmd,
+            "profile_stop": self.profile_stop_cmd,
+            "playout_limit": self.playout_limit_cmd
         }
         self.timelimit = 60
+        self.time_manager = TimeManager()
+        # quiet moves are empty points this close to a stone
+        self.candidate_distance = 2
         self.open = False
+        # commands after which a client may wait; output is flushed first
+        self.long_running = set(["genmove"])
+        # counters for engine_stats
+        self.num_commands = 0
+        self.num_genmoves = 0
+        self.genmove_time = 0.0
+        self.policy_calls = 0
+        self.policy_time = 0.0
+        self.stop_reason = None
+        self.stats_json = False
+        # responses of board queries by command name, as
+        # (board, board version, response), see cached_response
+        self.response_cache = {}
+        self.response_cache_hits = 0
+        # profiling: tracer, "move" or "game", output prefix
+        self.tracer = None
+        self.profile_scope = None
+        self.profile_prefix = None
+        # session_log.SessionRecorder while recording, None otherwise
+        self.recorder = None
+        # proven_store.ProvenResultStore, None unless asked for with
+        # proven_cache PATH
+        self.proven = None
+        # decisions of earlier searches, kept across games, and the
+        # simulations a stored search needs to be used
+        self.decision_threshold = DecisionCache().min_simulations
+        self.decisions = DecisionCache(min_simulations=self.decision_threshold)
         # used for argument checking
         # values: (required number of arguments, 
         #          error message on argnum failure)
@@ -69,45 +145,195 @@ class GtpConnection():
             "known_command": (1, 'Usage: known_command CMD_NAME'),
             "genmove": (1, 'Usage: genmove {w,b}'),
             "play": (2, 'Usage: play {b,w} MOVE'),
-            "legal_moves": (1, 'Usage: legal_moves {w,b}')
+            "legal_moves": (1, 'Usage: legal_moves {w,b}'),
+            "playout_cutoff": (1, 'Usage: playout_cutoff {INT,auto}'),
+            "random_seed": (1, 'Usage: random_seed INT'),
+            "node_budget": (1, 'Usage: node_budget INT'),
+            "playout_workers": (1, 'Usage: playout_workers {ADDRESS,off}'),
+            "shared_workers": (1, 'Usage: shared_workers {INT,off}'),
+            "playout_patterns": (1, 'Usage: playout_patterns {FILE,off}'),
+            "proven_cache": (1, 'Usage: proven_cache {PATH,off}'),
+            "decision_cache": (1, 'Usage: decision_cache {INT,off}'),
+            "decision_cache_threshold": (1, 'Usage: decision_cache_threshold INT'),
+            "live_analysis": (1, 'Usage: live_analysis {gfx,text,off}'),
+            "analyze_interval": (1, 'Usage: analyze_interval FLOAT'),
+            "engine_stats_json": (1, 'Usage: engine_stats_json {on,off}'),
+            "profile_start": (2, 'Usage: profile_start {move,game} PREFIX'),
+            "playout_limit": (1, 'Usage: playout_limit INT'),
+            "time_settings": (3, 'Usage: time_settings MAIN BYO_YOMI STONES'),
+            "time_left": (3, 'Usage: time_left {w,b} SECONDS STONES')
         }
-        self.all_points = GoBoardUtil.generate_legal_moves_gomoku(self.board)
-        moves = self.legalMoves()
-        self.move_to_point=dict(zip(moves,self.all_points))
-        self.point_to_move=dict(zip(self.all_points,moves))
-    
+        if board is not None:
+            self.point_to_move, self.move_to_point = point_tables(board.size)
+
+    @classmethod
+    def deferred(cls, engine_factory, board_factory, size, **kwargs):
+        """
+        Connection whose engine and board are only created when a
+        command needs them: engine_factory() at the first command that
+        uses the engine, normally genmove, board_factory(size) at the
+        first command that looks at the board. Until then commands such
+        as protocol_version, name, boardsize and time_settings are
+        answered without importing NumPy. The name and version of the
+        engine are read from engine_factory, usually the engine class.
+        """
+        connection = cls(None, None, **kwargs)
+        connection.engine_factory = engine_factory
+        connection.board_factory = board_factory
+        connection.reset(size)
+        return connection
+
+    @property
+    def go_engine(self):
+        if self._go_engine is None:
+            self._go_engine = self.engine_factory()
+            for name, value in self.engine_settings.items():
+                setattr(self._go_engine, name, value)
+            self.engine_settings = {}
+        return self._go_engine
+
+    @go_engine.setter
+    def go_engine(self, go_engine):
+        self._go_engine = go_engine
+
+    @property
+    def board(self):
+        if self._board is None:
+            self._board = self.board_factory(self.deferred_size)
+        return self._board
+
+    @board.setter
+    def board(self, board):
+        self._board = board
+
+    def board_size(self):
+        """ Size of the board, without creating a deferred board """
+        if self._board is None:
+            return self.deferred_size
+        return self._board.size
+
+    def engine_attribute(self, name):
+        """ Attribute of the engine, read from its factory while deferred """
+        if self._go_engine is None:
+            return self.engine_settings.get(
+                name, getattr(self.engine_factory, name, None))
+        return getattr(self._go_engine, name)
+
+    def set_engine_attribute(self, name, value):
+        """ Set an engine attribute, kept until a deferred engine exists """
+        if self._go_engine is None:
+            self.engine_settings[name] = value
+        else:
+            setattr(self._go_engine, name, value)
+
     def write(self, data):
-        stdout.write(data) 
+        self.outfile.write(data)
+        if self.recorder is not None:
+            self.recorder.output.append(data)
 
     def flush(self):
-        stdout.flush()
+        self.outfile.flush()
+        if self.recorder is not None:
+            self.recorder.flush()
+
+    def start_recording(self, path):
+        """
+        Log every following command with its timestamp, response and
+        latency to path, for replay with gtp_replay.py
+        """
+        from session_log import SessionRecorder
+        self.stop_recording()
+        self.recorder = SessionRecorder(path, {
+            "engine": self.engine_attribute("name"),
+            "version": self.engine_attribute("version"),
+            "size": self.board_size(),
+        })
+
+    def stop_recording(self):
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
 
     def start_connection(self):
         """
         Start a GTP connection. 
         This function continuously monitors standard input for commands.
+        Input is read in blocks and pipelined commands are executed back
+        to back. Responses are flushed when no more input is waiting,
+        and before any long running command.
         """
-        line = stdin.readline()
-        while line:
-            self.get_cmd(line)
+        try:
+            fd = stdin.fileno()
+        except (AttributeError, io.UnsupportedOperation):
+            fd = None
+        if fd is None:
             line = stdin.readline()
+            while line:
+                self.get_cmd(line)
+                self.flush()
+                line = stdin.readline()
+            return
+        pending = b''
+        while True:
+            data = os.read(fd, 65536)
+            if not data:
+                break
+            lines = (pending + data).split(b'\n')
+            pending = lines.pop()
+            for line in lines:
+                self.run_line(line)
+            if not select.select([fd], [], [], 0)[0]:
+                self.flush()
+        if pending:
+            self.run_line(pending)
+        self.flush()
 
-    def get_cmd(self, command):
+    def run_line(self, line):
+        """ Execute one raw input line from the buffered reader """
+        command = line.decode('utf-8', 'replace')
+        parsed = self.parse_cmd(command)
+        if parsed is not None and parsed[0] in self.long_running:
+            self.flush()
+        self.get_cmd(command + '\n')
+
+    def parse_cmd(self, command):
         """
-        Parse command string and execute it
+        Split a command line into (command_name, args).
+        Returns None for empty lines and comments.
         """
         if len(command.strip(' \r\t')) == 0:
-            return
+            return None
         if command[0] == '#':
-            return
+            return None
         # Strip leading numbers from regression tests
         if command[0].isdigit():
             command = re.sub("^\d+", "", command).lstrip()
 
         elements = command.split()
         if not elements:
+            return None
+        return elements[0], elements[1:]
+
+    def get_cmd(self, command):
+        """
+        Parse command string and execute it
+        """
+        parsed = self.parse_cmd(command)
+        if parsed is None:
             return
-        command_name = elements[0]; args = elements[1:]
+        if self.recorder is not None:
+            self.recorder.begin(command)
+            try:
+                self.execute(*parsed)
+            finally:
+                if self.recorder is not None:
+                    self.recorder.end()
+            return
+        self.execute(*parsed)
+
+    def execute(self, command_name, args):
+        """ Check the arguments of a parsed command and run it """
+        self.num_commands += 1
         if self.has_arg_error(command_name, len(args)):
             return
         if command_name in self.commands:
@@ -121,7 +347,6 @@ class GtpConnection():
         else:
             self.debug_msg("Unknown command: {}\n".format(command_name))
             self.error('Unknown command')
-            stdout.flush()
 
     def has_arg_error(self, cmd, argnum):
         """
@@ -140,28 +365,52 @@ class GtpConnection():
             stderr.flush()
 
     def error(self, error_msg):
-        """ Send error msg to stdout """
-        stdout.write('? {}\n\n'.format(error_msg))
-        stdout.flush()
+        """
+        Send error msg to the output stream.
+        Flushing is left to the command loop.
+        """
+        self.write('? {}\n\n'.format(error_msg))
 
     def respond(self, response=''):
-        """ Send response to stdout """
-        stdout.write('= {}\n\n'.format(response))
-        stdout.flush()
+        """
+        Send response to the output stream.
+        Flushing is left to the command loop.
+        """
+        self.write('= {}\n\n'.format(response))
 
     def reset(self, size):
         """
         Reset the board to empty board of given size
         """
-        self.board.reset(size)
-        points = GoBoardUtil.generate_legal_moves_gomoku(self.board)
-        moves = self.legalMoves()
-        self.move_to_point=dict(zip(moves,points))
-        self.point_to_move=dict(zip(points,moves))
+        if self._board is None:
+            self.deferred_size = size
+        else:
+            self._board.reset(size)
+        self.response_cache.clear()
+        self.point_to_move, self.move_to_point = point_tables(size)
+        if self._go_engine is not None:
+            self._go_engine.reset_tree()
         self.open = False
 
     def board2d(self):
         return str(GoBoardUtil.get_twoD_board(self.board))
+
+    def cached_response(self, name, build):
+        """
+        Response of the board query name, from build() or, if the board
+        is unchanged since it was last built, from the cache. The board
+        version counts every play, undo and reset, so moves by play and
+        genmove and a new game all invalidate the cached responses.
+        """
+        board = self.board
+        entry = self.response_cache.get(name)
+        if entry is not None and entry[0] is board and \
+           entry[1] == board.version:
+            self.response_cache_hits += 1
+            return entry[2]
+        response = build()
+        self.response_cache[name] = (board, board.version, response)
+        return response
         
     def protocol_version_cmd(self, args):
         """ Return the GTP protocol version being used (always 2) """
@@ -170,19 +419,25 @@ class GtpConnection():
     def quit_cmd(self, args):
         """ Quit game and exit the GTP interface """
         self.respond()
+        self.flush()
+        self.stop_profile()
+        self.stop_recording()
+        self.stop_playout_workers()
+        if self.proven:
+            self.proven.close()
         exit()
 
     def name_cmd(self, args):
         """ Return the name of the Go engine """
-        self.respond(self.go_engine.name)
+        self.respond(self.engine_attribute("name"))
 
     def version_cmd(self, args):
         """ Return the version of the  Go engine """
-        self.respond(self.go_engine.version)
+        self.respond(self.engine_attribute("version"))
 
     def clear_board_cmd(self, args):
         """ clear the board """
-        self.reset(self.board.size)
+        self.reset(self.board_size())
         self.respond()
 
     def boardsize_cmd(self, args):
@@ -193,13 +448,14 @@ class GtpConnection():
         self.respond()
 
     def showboard_cmd(self, args):
-        self.respond('\n' + self.board2d())
+        self.respond(self.cached_response(
+            "showboard", lambda: '\n' + self.board2d()))
 
     def komi_cmd(self, args):
         """
         Set the engine's komi to args[0]
         """
-        self.go_engine.komi = float(args[0])
+        self.set_engine_attribute("komi", float(args[0]))
         self.respond()
 
     def known_command_cmd(self, args):
@@ -222,12 +478,7 @@ class GtpConnection():
         board_color = args[0].lower()
         color = color_to_int(board_color)
         moves = GoBoardUtil.generate_legal_moves(self.board, color)
-        gtp_moves = []
-        for move in moves:
-            coords = point_to_coord(move, self.board.size)
-            gtp_moves.append(format_point(coords))
-        sorted_moves = ' '.join(sorted(gtp_moves))
-        self.respond(sorted_moves)
+        self.respond(self.format_moves(moves))
 
     def play_cmd(self, args):
         """
@@ -245,17 +496,19 @@ class GtpConnection():
                 self.board.current_player = GoBoardUtil.opponent(color)
                 self.respond()
                 return
-            coord = move_to_coord(args[1], self.board.size)
-            if coord:
-                move = coord_to_point(coord[0],coord[1], self.board.size)
-            else:
+            move = self.move_to_point.get(args[1].lower())
+            if move is None:
+                # reports the wrong coordinate as a ValueError
+                coord = move_to_coord(args[1], self.board.size)
                 self.error("Error executing move {} converted from {}"
-                           .format(move, args[1]))
+                           .format(coord, args[1]))
                 return
             if not self.board.play_move_gomoku(move, color):
                 self.respond("illegal move: \"{}\" occupied".format(board_move))
                 return
             else:
+                if self._go_engine is not None:
+                    self._go_engine.advance(move)
                 self.debug_msg("Move: {}\nBoard:\n{}\n".
                                 format(board_move, self.board2d()))
             self.respond()
@@ -275,60 +528,52 @@ class GtpConnection():
         board_color = args[0].lower()
         color = color_to_int(board_color)
         moves = GoBoardUtil.generate_legal_moves(self.board, color)
-        gtp_moves = []
-        for move in moves:
-            coords = point_to_coord(move, self.board.size)
-            gtp_moves.append(format_point(coords))
-        sorted_moves = ' '.join(sorted(gtp_moves))
-        self.respond(sorted_moves)
+        self.respond(self.format_moves(moves))
 
     def gogui_rules_legal_moves_cmd(self, args):
+        self.respond(self.cached_response("gogui-rules_legal_moves",
+                                          self.gogui_legal_moves))
+
+    def gogui_legal_moves(self):
         game_end,_ = self.board.check_game_end_gomoku()
         if game_end:
-            self.respond()
-            return
+            return ''
         moves = GoBoardUtil.generate_legal_moves_gomoku(self.board)
-        gtp_moves = []
-        for move in moves:
-            coords = point_to_coord(move, self.board.size)
-            gtp_moves.append(format_point(coords))
-        sorted_moves = ' '.join(sorted(gtp_moves))
-        self.respond(sorted_moves)
+        return self.format_moves(moves)
     
     def gogui_rules_side_to_move_cmd(self, args):
         color = "black" if self.board.current_player == BLACK else "white"
         self.respond(color)
     
     def gogui_rules_board_cmd(self, args):
+        self.respond(self.cached_response("gogui-rules_board",
+                                          self.gogui_board))
+
+    def gogui_board(self):
+        """ Rows of X, O and . from the top row down """
         size = self.board.size
-        str = ''
-        for row in range(size-1, -1, -1):
-            start = self.board.row_start(row + 1)
-            for i in range(size):
-                point = self.board.board[start + i]
-                if point == BLACK:
-                    str += 'X'
-                elif point == WHITE:
-                    str += 'O'
-                elif point == EMPTY:
-                    str += '.'
-                else:
-                    assert False
-            str += '\n'
-        self.respond(str)
+        symbols = {BLACK: 'X', WHITE: 'O', EMPTY: '.'}
+        rows = []
+        for row in range(size, 0, -1):
+            start = self.board.row_start(row)
+            rows.append(''.join(symbols[point] for point in
+                                self.board.board[start:start + size].tolist()))
+        return ''.join(row + '\n' for row in rows)
     
     def gogui_rules_final_result_cmd(self, args):
+        self.respond(self.cached_response("gogui-rules_final_result",
+                                          self.gogui_final_result))
+
+    def gogui_final_result(self):
         game_end, winner = self.board.check_game_end_gomoku()
         moves = self.board.get_empty_points()
         board_full = (len(moves) == 0)
-        if board_full and not game_end:
-            self.respond("draw")
-            return
+        # nobody can make five any more, the game is already drawn
+        if (board_full or self.board.is_dead_position()) and not game_end:
+            return "draw"
         if game_end:
-            color = "black" if winner == BLACK else "white"
-            self.respond(color)
-        else:
-            self.respond("unknown")
+            return "black" if winner == BLACK else "white"
+        return "unknown"
 
     def gogui_analyze_cmd(self, args):
         self.respond("pstring/Legal Moves For ToPlay/gogui-rules_legal_moves\n"
@@ -337,41 +582,530 @@ class GtpConnection():
                      "pstring/Board Size/gogui-rules_board_size\n"
                      "pstring/Rules GameID/gogui-rules_game_id\n"
                      "pstring/Show Board/gogui-rules_board\n"
+                     "gfx/Search Visits/search_analysis\n"
+                     "string/Search Info/search_analysis_text\n"
+                     "none/Live Search Graphics/live_analysis gfx\n"
+                     "none/Live Search Text/live_analysis text\n"
+                     "none/Live Search Off/live_analysis off\n"
+                     "none/Analysis Interval/analyze_interval %s\n"
                      )
 
+    def live_analysis_cmd(self, args):
+        """
+        Stream search state to stderr while the engine thinks:
+        gfx writes gogui live graphics, text one info line per update.
+        """
+        mode = args[0]
+        if mode == "gfx":
+            self.go_engine.progress = self.write_live_gfx
+        elif mode == "text":
+            self.go_engine.progress = self.write_live_text
+        elif mode == "off":
+            self.go_engine.progress = None
+        else:
+            self.error('Usage: live_analysis {gfx,text,off}')
+            return
+        self.respond()
+
+    def analyze_interval_cmd(self, args):
+        """ Seconds between two live analysis updates """
+        try:
+            interval = float(args[0])
+        except ValueError:
+            interval = 0.0
+        if not 0 < interval < float("inf"):
+            self.error("interval must be a positive number of seconds")
+            return
+        self.set_engine_attribute("report_interval", interval)
+        self.respond()
+
+    def analysis_gfx(self, info):
+        """
+        gogui gfx commands for a search snapshot: a heat map of the
+        visit counts, the visits as labels and the principal variation.
+        """
+        moves = info["moves"]
+        max_visits = max([visits for _, visits, _ in moves] or [0]) or 1
+        influence = ' '.join("{} {:.2f}".format(self.point_to_move[point],
+                                                visits / max_visits)
+                             for point, visits, _ in moves)
+        labels = ' '.join("{} {}".format(self.point_to_move[point], visits)
+                          for point, visits, _ in moves)
+        colors = ["b", "w"] if info["color"] == BLACK else ["w", "b"]
+        pv = ' '.join("{} {}".format(colors[i % 2], self.point_to_move[point])
+                      for i, point in enumerate(info["pv"]))
+        return ("INFLUENCE {}\nLABEL {}\nVAR {}\nTEXT {}".format(
+                influence, labels, pv, self.analysis_summary(info)))
+
+    def analysis_summary(self, info):
+        best = info["best"]
+        winrate = 0.0
+        for point, _, rate in info["moves"]:
+            if point == best:
+                winrate = rate
+        return ("elapsed={:.2f} playouts={} pps={:.0f} best={} winrate={:.3f}"
+                " pv={}".format(info["elapsed"], info["simulations"],
+                                info["pps"], self.point_to_move[best], winrate,
+                                ' '.join(self.point_to_move[point]
+                                         for point in info["pv"])))
+
+    def write_live_gfx(self, info):
+        stderr.write("gogui-gfx:\n{}\n\n".format(self.analysis_gfx(info)))
+        stderr.flush()
+
+    def write_live_text(self, info):
+        moves = ' '.join("{}:{}:{:.3f}".format(self.point_to_move[point],
+                                               visits, rate)
+                         for point, visits, rate in info["moves"])
+        stderr.write("info {} moves={}\n".format(self.analysis_summary(info),
+                                                  moves))
+        stderr.flush()
+
+    def search_analysis_cmd(self, args):
+        """ Visit heat map of the last search as gogui graphics """
+        info = self.go_engine.last_info
+        self.respond(self.analysis_gfx(info) if info else '')
+
+    def search_analysis_text_cmd(self, args):
+        """ Per-move visits and win rates of the last search """
+        info = self.go_engine.last_info
+        if not info:
+            self.respond('')
+            return
+        lines = [self.analysis_summary(info)]
+        for point, visits, rate in info["moves"]:
+            lines.append("{} visits={} winrate={:.3f}".format(
+                self.point_to_move[point], visits, rate))
+        self.respond('\n'.join(lines))
+
     #####Assignment 3 starts here##############################
     def legalMoves(self):
-        moves = GoBoardUtil.generate_legal_moves_gomoku(self.board)
-        gtp_moves = []
-        for move in moves:
-            coords = point_to_coord(move, self.board.size)
-            gtp_moves.append(format_point(coords))
+        """ Empty points of the board. Engine moves are board points. """
+        return GoBoardUtil.generate_legal_moves_gomoku(self.board)
 
-        return gtp_moves
+    def format_moves(self, points):
+        """ Sorted GTP names of points, separated by spaces """
+        return ' '.join(sorted([self.point_to_move[point] for point in points]))
 
     def policy_cmd(self,args):
         self.policy_type = args[0]
         self.respond("")
 
     def timelimit_cmd(self, args):
-        self.timelimit = int(args[0])
+        try:
+            timelimit = float(args[0])
+        except ValueError:
+            timelimit = 0.0
+        if not 0 < timelimit < float("inf"):
+            self.error("timelimit must be a positive number of seconds")
+            return
+        self.timelimit = timelimit
         self.respond('')
 
-    def count_color(self,color):
-        count = 0
-        empty_points = self.all_points
-        for point in empty_points:
-            if self.board.get_color(point) == color:
-                count += 1
+    def time_settings_cmd(self, args):
+        """
+        Set the game clock: main time and byo-yomi time in seconds,
+        and the number of stones per byo-yomi period.
+        timelimit still caps every move.
+        """
+        try:
+            main_time, byo_yomi_time = float(args[0]), float(args[1])
+            stones = int(args[2])
+        except ValueError:
+            self.error('Usage: time_settings MAIN BYO_YOMI STONES')
+            return
+        self.time_manager.set_time_settings(main_time, byo_yomi_time, stones)
+        self.respond('')
 
-        return count
+    def time_left_cmd(self, args):
+        """ Time and byo-yomi stones left for color args[0] """
+        color = args[0].lower()
+        if color not in ('b', 'w'):
+            self.error('Usage: time_left {w,b} SECONDS STONES')
+            return
+        try:
+            seconds, stones = float(args[1]), int(args[2])
+        except ValueError:
+            self.error('Usage: time_left {w,b} SECONDS STONES')
+            return
+        self.time_manager.set_time_left(color_to_int(color), seconds, stones)
+        self.respond('')
+
+    def playout_limit_cmd(self, args):
+        """
+        Stop each search after args[0] simulations, 0 for no limit.
+        The time limit still applies.
+        """
+        try:
+            limit = int(args[0])
+        except ValueError:
+            limit = -1
+        if limit < 0:
+            self.error("limit must be a non-negative integer")
+            return
+        self.set_engine_attribute("playout_limit", limit)
+        self.search_settings_changed()
+        self.respond('')
+
+    def playout_cutoff_cmd(self, args):
+        """
+        Truncate simulations after args[0] moves and score them with the
+        static evaluator. 0 plays simulations to the end of the game,
+        auto picks the cutoff from the board size.
+        """
+        if args[0] == "auto":
+            cutoff = None
+        else:
+            try:
+                cutoff = int(args[0])
+            except ValueError:
+                cutoff = -1
+            if cutoff < 0:
+                self.error("cutoff must be auto or a non-negative integer")
+                return
+        self.set_engine_attribute("playout_cutoff", cutoff)
+        self.search_settings_changed()
+        self.respond('')
+
+    def random_seed_cmd(self, args):
+        """
+        Seed the engine's random stream with args[0] for reproducible runs
+        """
+        try:
+            seed = int(args[0])
+        except ValueError:
+            seed = -1
+        if seed < 0:
+            # SeedSequence takes non-negative integers only
+            self.error("seed must be a non-negative integer")
+            return
+        self.go_engine.set_seed(seed)
+        self.respond('')
+
+    def node_budget_cmd(self, args):
+        """
+        Limit the search tree to args[0] nodes. Drops the current tree.
+        The budget must hold the root and a child for every point of
+        the board.
+        """
+        minimum = 1 + self.board_size() ** 2
+        try:
+            capacity = int(args[0])
+        except ValueError:
+            capacity = 0
+        if capacity < minimum:
+            self.error("node budget must be an integer of at least {}"
+                       .format(minimum))
+            return
+        self.go_engine.set_node_budget(capacity)
+        self.respond('')
+
+    def playout_workers_cmd(self, args):
+        """
+        Listen for remote playout workers on args[0], tcp:HOST:PORT or
+        unix:PATH, and share searches with them; "off" stops. Responds
+        with the address listened on. See playout_cluster.py.
+        """
+        self.stop_playout_workers()
+        if args[0] == "off":
+            self.respond()
+            return
+        from playout_cluster import PlayoutCluster
+        try:
+            cluster = PlayoutCluster(args[0])
+        except (OSError, ValueError) as e:
+            self.error("cannot listen on {}: {}".format(args[0], e))
+            return
+        self.set_engine_attribute("cluster", cluster)
+        self.respond(cluster.address)
+
+    def shared_workers_cmd(self, args):
+        """
+        Share searches with args[0] local worker processes through
+        shared memory; "off" or 0 stops. See shared_search.py.
+        """
+        if args[0] in ("off", "0"):
+            self.stop_playout_workers()
+            self.respond()
+            return
+        try:
+            workers = int(args[0])
+        except ValueError:
+            workers = 0
+        if workers < 1:
+            self.error("worker count must be a positive integer")
+            return
+        self.stop_playout_workers()
+        from shared_search import SharedSearch
+        self.set_engine_attribute("cluster", SharedSearch(workers))
+        self.respond()
+
+    def playout_patterns_cmd(self, args):
+        """
+        Draw playout moves by the pattern table in file args[0], see
+        fit_patterns.py; "off" goes back to uniform random playouts.
+        """
+        if args[0] == "off":
+            self.set_engine_attribute("patterns", None)
+            if self._board is not None:
+                self._board.untrack_patterns()
+            self.search_settings_changed()
+            self.respond()
+            return
+        from pattern_policy import PatternPolicy
+        try:
+            patterns = PatternPolicy.load(args[0])
+        except (OSError, ValueError, KeyError) as e:
+            self.error("cannot load {}: {}".format(args[0], e))
+            return
+        self.set_engine_attribute("patterns", patterns)
+        self.search_settings_changed()
+        self.respond()
+
+    def stop_playout_workers(self):
+        """ Close the remote or shared workers of the engine, if any """
+        cluster = self.engine_attribute("cluster")
+        if cluster is not None:
+            cluster.close()
+            self.set_engine_attribute("cluster", None)
+
+    def proven_cache_cmd(self, args):
+        """
+        Use the proven result database at args[0], or switch it off
+        """
+        if self.proven:
+            self.proven.close()
+        if args[0] == "off":
+            self.proven = None
+        else:
+            self.proven = ProvenResultStore(args[0])
+        self.respond('')
+
+    def lookup_proven(self, color):
+        """
+        Return the stored best point for color if the position is proven,
+        None otherwise.
+        """
+        if not self.proven:
+            return None
+        hash_value, sym = zobrist.canonical_hash(self.board)
+        stored = self.proven.get(self.board.size, hash_value, color)
+        if stored is None:
+            return None
+        result, move = stored
+        if move is None or result not in (WIN, LOSS):
+            return None
+        point = zobrist.from_canonical(move, sym, self.board.size)
+        if self.board.get_color(point) != EMPTY:
+            return None
+        return point
+
+    def record_proven(self, color, point):
+        """ Store point as a proven win for color in this position """
+        if not self.proven or color != self.board.current_player:
+            return
+        hash_value, sym = zobrist.canonical_hash(self.board)
+        self.proven.put(self.board.size, hash_value, color, WIN,
+                        zobrist.to_canonical(point, sym, self.board.size))
+
+    def prove_win(self, color, moves):
+        """
+        Return a point of moves after which color has two different
+        points that complete five and the opponent none. The opponent
+        can block only one of them, so the move wins. None if no move
+        of moves does that. All moves are classified in one batch.
+        """
+        points = np.array(sorted(set(moves)))
+        NS = self.board.NS
+        grids = np.repeat(self.board.stones_grid()[None], len(points), axis=0)
+        grids[np.arange(len(points)), points // NS - 1, points % NS - 1] = color
+        flags = threats.threat_flags(grids)
+        # (move, color) -> points completing five in any direction
+        fives = flags[:, :, threats.FIVE].any(axis=-1).reshape(
+            len(points), 2, -1)
+        me = 0 if color == BLACK else 1
+        proven = (np.count_nonzero(fives[:, me], axis=1) >= 2) & \
+                 ~fives[:, 1 - me].any(axis=1)
+        if not proven.any():
+            return None
+        return int(points[np.argmax(proven)])
+
+    def decision_cache_cmd(self, args):
+        """
+        Keep the decisions of up to args[0] searches across games, or
+        switch the cache off. Starts with an empty cache.
+        """
+        if args[0] == "off":
+            self.decisions = None
+            self.respond('')
+            return
+        try:
+            capacity = int(args[0])
+        except ValueError:
+            capacity = -1
+        if capacity < 0:
+            self.error("capacity must be a non-negative integer")
+            return
+        self.decisions = DecisionCache(capacity, self.decision_threshold)
+        self.respond('')
+
+    def decision_cache_threshold_cmd(self, args):
+        """
+        Answer a position from the decision cache only if its stored
+        search ran at least args[0] simulations. Kept while the cache
+        is off.
+        """
+        try:
+            threshold = int(args[0])
+        except ValueError:
+            threshold = -1
+        if threshold < 0:
+            self.error("threshold must be a non-negative integer")
+            return
+        self.decision_threshold = threshold
+        if self.decisions is not None:
+            self.decisions.min_simulations = threshold
+        self.respond('')
+
+    def search_settings_changed(self):
+        """
+        Forget the cached decisions, which were searched with the old
+        playout settings
+        """
+        if self.decisions is not None:
+            self.decisions.clear()
+
+    def lookup_decision(self, color):
+        """
+        Return the point an earlier search chose for color in this
+        position, None if there is none or its search was too short.
+        """
+        if self.decisions is None:
+            return None
+        hash_value, sym = zobrist.canonical_hash(self.board)
+        decision = self.decisions.get(self.board.size, hash_value, color)
+        if decision is None:
+            return None
+        point = zobrist.from_canonical(decision.move, sym, self.board.size)
+        if self.board.get_color(point) != EMPTY:
+            return None
+        return point
+
+    def record_decision(self, color, move):
+        """ Store the move the engine's last search chose for color """
+        info = self.go_engine.last_info
+        if self.decisions is None or info is None or info["best"] != move:
+            return
+        for point, visits, win_rate in info["moves"]:
+            if point == move:
+                break
+        else:
+            return
+        hash_value, sym = zobrist.canonical_hash(self.board)
+        self.decisions.put(self.board.size, hash_value, color, Decision(
+            zobrist.to_canonical(move, sym, self.board.size),
+            info["simulations"], visits, float(win_rate)))
+
+    def engine_stats(self):
+        """
+        Counters of the connection, engine and board as a dict.
+        Times are in seconds, totals are since the engine started.
+        """
+        engine = self.go_engine
+        board_class = type(self.board)
+        stats = {
+            "commands": self.num_commands,
+            "genmoves": self.num_genmoves,
+            "genmove_time": round(self.genmove_time, 4),
+            "stop_reason": self.stop_reason,
+            "simulations": engine.total_simulations,
+            "last_simulations": engine.last_simulations,
+            "policy_moves_calls": self.policy_calls,
+            "policy_moves_time": round(self.policy_time, 4),
+            "copy_time": round(engine.copy_time, 4),
+            "playout_time": round(engine.playout_time, 4),
+            "board_copies": board_class.num_copies,
+            "playouts": board_class.num_playouts,
+            "avg_playout_length": round(board_class.num_playout_moves /
+                                        max(board_class.num_playouts, 1), 2),
+            "tree_nodes": engine.tree.num_nodes(),
+            "tree_evictions": engine.tree.evictions,
+            "tree_growths": engine.tree.growths,
+            "response_cache_hits": self.response_cache_hits,
+        }
+        if self.time_manager.has_clock():
+            for color, name in ((BLACK, "black"), (WHITE, "white")):
+                stats["time_left_" + name] = \
+                    round(self.time_manager.clock(color)[0], 3)
+        if engine.cluster is not None:
+            stats.update(engine.cluster.stats())
+        if self.proven:
+            lookups = self.proven.hits + self.proven.misses
+            stats["proven_hits"] = self.proven.hits
+            stats["proven_misses"] = self.proven.misses
+            stats["proven_hit_rate"] = round(self.proven.hits / max(lookups, 1), 4)
+            if self.proven.error is not None:
+                stats["proven_error"] = self.proven.error
+        if self.decisions is not None:
+            lookups = self.decisions.hits + self.decisions.misses
+            stats["decision_hits"] = self.decisions.hits
+            stats["decision_misses"] = self.decisions.misses
+            stats["decision_hit_rate"] = round(self.decisions.hits /
+                                               max(lookups, 1), 4)
+            stats["decision_entries"] = len(self.decisions)
+            stats["decision_evictions"] = self.decisions.evictions
+        return stats
+
+    def engine_stats_cmd(self, args):
+        """ Engine counters as key=value pairs, one per line """
+        self.respond('\n'.join("{}={}".format(key, value)
+                               for key, value in self.engine_stats().items()))
+
+    def engine_stats_json_cmd(self, args):
+        """ Write engine_stats as a JSON line to stderr after each genmove """
+        self.stats_json = args[0] == "on"
+        self.respond()
+
+    def start_profile(self, scope, prefix):
+        """
+        Trace the next genmove (scope "move") or everything until
+        stop_profile (scope "game") into prefix.trace.json and prefix.folded
+        """
+        from profiler import SpanTracer
+        self.stop_profile()
+        self.tracer = SpanTracer()
+        self.go_engine.tracer = self.tracer
+        self.profile_scope = scope
+        self.profile_prefix = prefix
+
+    def stop_profile(self):
+        """ Write the profile files, returns their paths or None """
+        if self.tracer is None:
+            return None
+        paths = self.tracer.write(self.profile_prefix)
+        self.tracer = None
+        self.set_engine_attribute("tracer", None)
+        self.profile_scope = None
+        return paths
+
+    def profile_start_cmd(self, args):
+        if args[0] not in ("move", "game"):
+            self.error('Usage: profile_start {move,game} PREFIX')
+            return
+        self.start_profile(args[0], args[1])
+        self.respond()
+
+    def profile_stop_cmd(self, args):
+        paths = self.stop_profile()
+        self.respond(' '.join(paths) if paths else '')
+
+    def count_color(self,color):
+        return int(np.count_nonzero(self.board.board == color))
 
     def find_stone(self,color):
-        
-        empty_points = self.all_points
-        for point in empty_points:
-            if self.board.get_color(point) == color:
-                return point
+        stones = np.flatnonzero(self.board.board == color)
+        if len(stones):
+            return stones[0]
 
     def check_direction(self,pointA,pointB):
 
@@ -390,8 +1124,7 @@ class GtpConnection():
     def count_color_cmd(self,color):
         color = BLACK if color == 'b' else WHITE
         count = 0
-        empty_moves = self.legalMoves()
-        empty_points=[self.move_to_point[move] for move in empty_moves]
+        empty_points = self.legalMoves()
         self.respond(str(empty_points))
         for point in empty_points:
             if self.board.get_color(point) == color:
@@ -403,11 +1136,12 @@ class GtpConnection():
 
         #Opening
         
+        center = self.board.center_point()
         if self.count_color(BLACK) == 0:
-            return "First Move, ",["D4"]
+            return "First Move, ",[center]
 
-        if self.count_color(BLACK) == 1 and self.board.get_color(36) == EMPTY and self.board.current_player == WHITE:
-            return "First Move, ",["D4"]
+        if self.count_color(BLACK) == 1 and self.board.get_color(center) == EMPTY and self.board.current_player == WHITE:
+            return "First Move, ",[center]
 
 
         if self.count_color(self.board.current_player) == 1 and self.count_color(GoBoardUtil.opponent(self.board.current_player)) >= 1:
@@ -415,44 +1149,32 @@ class GtpConnection():
             #print(black_position,white_position)
             #direction,step = self.check_direction(black_position,white_position)
             #if direction == "vert_hori":
-            pointsA = self.board.StraightOpening(my_position)
+            pointsA = [point for point in self.board.StraightOpening(my_position)
+                       if self.board.get_color(point) == EMPTY]
             #print(pointsA)
-            return "Opening ",[self.point_to_move[point] for point in pointsA]
+            if pointsA:
+                return "Opening ",pointsA
         
-        empty_moves = self.legalMoves()
-        win_moves=[]
-        block_win_moves=[]
-        open_four_moves=[]
-        block_open_four_moves=[]
-        open_three_moves = []
-        double_open_three = []
-        block_open_three = []
-        double_dead_four = []
-        block_dead_four = []
-        
-        steps = [1,self.board.NS,self.board.NS-1,self.board.NS+1]
-        for move in empty_moves:
-            for step in steps:
-                point = self.move_to_point[move]
-                if self.board.five_in_row(point,self.board.current_player,step):
-                    win_moves.append(move)
-                elif self.board.five_in_row(point,GoBoardUtil.opponent(self.board.current_player),step):
-                    block_win_moves.append(move)
-                elif self.board.OpenFour(point,self.board.current_player,step):
-                    open_four_moves.append(move)
-                elif self.board.BlockOpenFour(point,GoBoardUtil.opponent(self.board.current_player),step):
-                    block_open_four_moves.append(move)
-                elif self.board.OpenThree(point,self.board.current_player,step):
-                    open_three_moves.append(move)
-                elif self.board.OpenThree(point,GoBoardUtil.opponent(self.board.current_player),step):
-                    block_open_three.append(move)
-                elif self.board.DeadFour(point,self.board.current_player,step):
-                    double_dead_four.append(move)
-                elif self.board.DeadFour(point,GoBoardUtil.opponent(self.board.current_player),step):
-                    block_dead_four.append(move)
-
-
-        dead_four_open_three = set(double_dead_four).intersection(set(open_three_moves))
+        # category of every point and direction, in the priority order
+        # of the scalar checks of SimpleGoBoard, see threats.py
+        categories = threats.move_categories(self.board.stones_grid(),
+                                             self.board.current_player)[0]
+        counts = [np.count_nonzero(categories == category, axis=2).ravel()
+                  for category in range(threats.BLOCK_DEAD_FOUR + 1)]
+        points = self.board.grid_points()
+        def moves_of(category):
+            """ Each point once for every direction it has category in """
+            return list(np.repeat(points, counts[category]))
+        win_moves = moves_of(threats.WIN)
+        block_win_moves = moves_of(threats.BLOCK_WIN)
+        open_four_moves = moves_of(threats.MAKE_OPEN_FOUR)
+        block_open_four_moves = moves_of(threats.BLOCK_OPEN_FOUR_MOVE)
+        open_three_moves = moves_of(threats.MAKE_OPEN_THREE)
+        block_open_three = moves_of(threats.BLOCK_OPEN_THREE)
+        double_dead_four = moves_of(threats.MAKE_DEAD_FOUR)
+        block_dead_four = moves_of(threats.BLOCK_DEAD_FOUR)
+
+        dead_four_open_three = list(set(double_dead_four).intersection(set(open_three_moves)))
         double_open_three = [move for move in set(open_three_moves) if open_three_moves.count(move) > 1]
         block_open_three = [move for move in set(block_open_three) if block_open_three.count(move) > 1]
         double_dead_four = [move for move in set(double_dead_four) if double_dead_four.count(move) > 1]
@@ -460,17 +1182,19 @@ class GtpConnection():
 
         #print(double_dead_four)
         move_types=["Win ","BlockWin ","OpenFour ","DoubleDeadFour","BlockOpenFour ","BlockDoubleDeadFour ","DeadFourOpenThree ","DoubleOpenThree","BlockDoubleThree","OpenThree ","Random "]
-        moves=[win_moves,block_win_moves,open_four_moves,double_dead_four,block_open_four_moves,block_dead_four,dead_four_open_three,double_open_three,block_open_three,open_three_moves,empty_moves]
+        # quiet positions: only points close to the stones are searched
+        quiet_moves = self.board.points_near_stones(self.candidate_distance)
+        moves=[win_moves,block_win_moves,open_four_moves,double_dead_four,block_open_four_moves,block_dead_four,dead_four_open_three,double_open_three,block_open_three,open_three_moves,list(quiet_moves)]
         for i in range(len(move_types)):
             if moves[i]:
                 return move_types[i],moves[i]
+        return "Random ",self.legalMoves()
 
     def policy_moves_cmd(self,args):
         
         move_type,moves = self.policy_moves()
         if moves:
-            move_as_string = ' '.join(sorted(moves))
-            self.respond(move_type+move_as_string)
+            self.respond(move_type+self.format_moves(moves))
         else:
             self.respond(" ")
         return
@@ -481,6 +1205,47 @@ class GtpConnection():
         """
         board_color = args[0].lower()
         color = color_to_int(board_color)
+        tracer = self.tracer
+        if tracer is not None:
+            tracer.begin("genmove")
+            tracer.begin("end_check")
+        game_over = self.respond_game_over(color)
+        if tracer is not None:
+            tracer.end()
+        if game_over:
+            if tracer is not None:
+                tracer.end()
+            return
+        start = time.time()
+        try:
+            move = self.generate_move(color, start)
+        except Exception:
+            # a failed search must not end the game: log it and play
+            # the best move found so far, or any legal one
+            stderr.write("genmove failed:\n{}".format(traceback.format_exc()))
+            stderr.flush()
+            self.stop_reason = "error"
+            move = self.fallback_move()
+        if move is None:
+            self.error("genmove failed")
+        else:
+            self.play_generated_move(move, color)
+        self.time_manager.consume(color, time.time() - start)
+        if tracer is not None:
+            tracer.end()
+            if self.profile_scope == "move":
+                self.stop_profile()
+        self.num_genmoves += 1
+        self.genmove_time += time.time() - start
+        if self.stats_json:
+            stderr.write(json.dumps(self.engine_stats()) + "\n")
+            stderr.flush()
+
+    def respond_game_over(self, color):
+        """
+        If the game is over, answer genmove with pass or resign
+        and return True.
+        """
         game_end, winner = self.board.check_game_end_gomoku()
         if game_end or len(self.legalMoves()) == 0:
             if winner == color:
@@ -489,28 +1254,93 @@ class GtpConnection():
                 self.respond("pass")
             else:
                 self.respond("resign")
-            return
-        signal.signal(signal.SIGALRM, signal_handler)
-        signal.alarm(self.timelimit)
-        try:
+            return True
+        return False
+
+    def generate_move(self, color, start):
+        """
+        Choose a point for color: the decisions of earlier searches
+        first, then the policy moves. Wins and forced blocks are played
+        at once, and so are moves that prove a win in positions with
+        four-making moves, see prove_win. Otherwise the engine searches
+        for the time the time manager gives the move, counted from start.
+        """
+        # the analysis of the last search is stale whether or not
+        # this move searches
+        self.set_engine_attribute("last_info", None)
+        move = self.lookup_decision(color)
+        if move is not None:
+            self.stop_reason = "cached"
+            return move
+        policy_start = time.perf_counter()
+        if self.tracer is not None:
+            with self.tracer.span("policy_moves"):
+                move_type,pending_moves = self.policy_moves()
+        else:
             move_type,pending_moves = self.policy_moves()
-            move = self.go_engine.genmove(pending_moves,self.board, color)
-            signal.alarm(0)
-        except Exception as e:
-            move = self.go_engine.bestMove
+        self.policy_calls += 1
+        self.policy_time += time.perf_counter() - policy_start
+        if move_type in INSTANT:
+            self.stop_reason = "win" if move_type == "Win " else "forced"
+            return pending_moves[0]
+        if move_type in PROVABLE:
+            move = self.lookup_proven(color)
+            if move is None:
+                move = self.prove_win(color, pending_moves)
+                if move is not None:
+                    self.record_proven(color, move)
+            if move is not None:
+                self.stop_reason = "proven"
+                return move
+        # policy_moves lists a point once per direction it has its
+        # category in; the search needs every candidate once
+        candidates = sorted(set(pending_moves))
+        budget = self.time_manager.budget(color, len(self.legalMoves()),
+                                          move_type, self.timelimit)
+        move = self.go_engine.genmove(candidates,self.board, color,
+                                      start + budget)
+        self.stop_reason = self.go_engine.stop_reason
+        if self.stop_reason in ("budget", "deadline"):
+            self.record_decision(color, move)
+        return move
 
+    def fallback_move(self):
+        """
+        Move to play after a failed search: the engine's best move if
+        it is still an empty point, otherwise the first empty point.
+        None if there is none.
+        """
+        best = self.engine_attribute("bestMove")
+        if best is not None and 0 <= best < self.board.maxpoint and \
+           self.board.get_color(best) == EMPTY:
+            return best
+        moves = self.legalMoves()
+        return int(moves[0]) if len(moves) else None
+
+    def play_generated_move(self, move, color):
+        """ Play the generated move on the board and respond with it """
         if move == PASS:
             self.respond("pass")
             return
-        coord = move_to_coord(move,self.board.size)
-        point = coord_to_point(coord[0],coord[1],self.board.size)
+        point = move
         if self.board.is_legal_gomoku(point, color):
             self.board.play_move_gomoku(point, color)
-            self.respond(move)
+            if self._go_engine is not None:
+                self._go_engine.advance(point)
+            self.respond(self.point_to_move[point])
+        else:
+            self.error("generated illegal move {}".format(self.point_to_move[point]))
+
+def point_tables(size):
+    """
+    Return (point_to_move, move_to_point) for a board of given size.
+    point_to_move maps board points to GTP names such as 'D4',
+    move_to_point maps lower case names back to points.
+    The tables are built once per size and shared, see size_tables.
+    """
+    table = size_tables.tables(size)
+    return table["point_to_move"], table["move_to_point"]
 
-def signal_handler(signum, frame):
-    raise Exception("Timed out!")
-            
 def point_to_coord(point, boardsize):
     """
     Transform point given as board array index 
@@ -532,7 +1362,7 @@ def format_point(move):
     if move == PASS:
         return "pass"
     row, col = move
-    if not 0 <= row < MAXSIZE or not 0 <= col < MAXSIZE:
+    if not 1 <= row <= MAXSIZE or not 1 <= col <= MAXSIZE:
         raise ValueError
     return column_letters[col - 1]+ str(row) 
     
@@ -0,0 +1,150 @@
+"""
+gtp_replay.py
+Replay a recorded GTP session (see session_log.py) into fresh engines.
+
+Every command of the log is sent to each engine in order. The tool
+reports per-command latency percentiles for every engine and lists the
+commands whose responses differ: between the two engines when two are
+given, otherwise between the engine and the recorded responses.
+
+Engines are given as for match_runner.py: a command line started as a
+GTP subprocess, or "inproc". To compare searches reproducibly, fix the
+random stream and the budget with --setup, e.g.
+    python gtp_replay.py game.log --engine1 "python Gomoku4.py" \\
+        --engine2 "python ../old/Gomoku4.py" \\
+        --setup "random_seed 1" --setup "playout_limit 500"
+"""
+import argparse
+import json
+import sys
+import time
+
+from match_runner import make_engine
+from session_log import read_log
+
+# not replayed: the engines are closed by the tool
+SKIPPED = ("quit",)
+
+def normalize(response):
+    """
+    (success, text) of a raw recorded response. Output written before
+    the GTP answer, such as live analysis lines, is ignored.
+    """
+    lines = response.strip().split("\n")
+    for i, line in enumerate(lines):
+        if line[:1] in ("=", "?"):
+            text = "\n".join([line[1:]] + lines[i + 1:]).strip()
+            return line[0] == "=", text
+    return False, response.strip()
+
+def percentile(values, p):
+    """ Nearest rank percentile of values """
+    ordered = sorted(values)
+    rank = max(int(len(ordered) * p / 100.0 + 0.999999) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+def latency_table(latencies):
+    """ {command name: {count, p50, p95, p99, max}} in milliseconds """
+    table = {}
+    for name, values in sorted(latencies.items()):
+        table[name] = {
+            "count": len(values),
+            "p50": 1000 * percentile(values, 50),
+            "p95": 1000 * percentile(values, 95),
+            "p99": 1000 * percentile(values, 99),
+            "max": 1000 * max(values),
+        }
+    return table
+
+def replay(entries, specs, size, setup=(), pace=False):
+    """
+    Feed the recorded commands to one engine per spec.
+    Returns ({spec index: latency table}, differences).
+    """
+    engines = [make_engine(spec, size) for spec in specs]
+    latencies = [{} for _ in engines]
+    differences = []
+    try:
+        for engine in engines:
+            for command in setup:
+                engine.send(command)
+        start = time.time()
+        for index, entry in enumerate(entries):
+            command = entry["cmd"]
+            name = command.split()[0] if command.split() else ""
+            if name in SKIPPED:
+                continue
+            if pace:
+                delay = start + entry["t"] - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+            responses = []
+            for engine, times in zip(engines, latencies):
+                t0 = time.perf_counter()
+                responses.append(engine.send(command))
+                times.setdefault(name, []).append(time.perf_counter() - t0)
+            if len(engines) == 1:
+                responses.insert(0, normalize(entry.get("response", "")))
+            if responses[0] != responses[1]:
+                differences.append({"index": index, "cmd": command,
+                                    "responses": responses})
+    finally:
+        for engine in engines:
+            engine.close()
+    return [latency_table(times) for times in latencies], differences
+
+def print_report(labels, tables, differences):
+    """ labels name the latency tables and the responses of a difference """
+    for label, table in zip(labels, tables):
+        print(label)
+        print("  {:28} {:>6} {:>10} {:>10} {:>10} {:>10}".format(
+            "command", "count", "p50 ms", "p95 ms", "p99 ms", "max ms"))
+        for command, row in table.items():
+            print("  {:28} {:>6} {:>10.3f} {:>10.3f} {:>10.3f} {:>10.3f}".
+                  format(command, row["count"], row["p50"], row["p95"],
+                         row["p99"], row["max"]))
+    print("{} differing responses".format(len(differences)))
+    for diff in differences:
+        print("  #{} {}".format(diff["index"], diff["cmd"]))
+        for label, (success, text) in zip(labels, diff["responses"]):
+            print("    {:10} {} {}".format(label, "=" if success else "?",
+                                           text))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a GTP session log")
+    parser.add_argument("log")
+    parser.add_argument("--engine1", default="inproc")
+    parser.add_argument("--engine2", default=None)
+    parser.add_argument("--setup", action="append", default=[],
+                        help="GTP command sent to each engine before the "
+                             "replay, may be repeated")
+    parser.add_argument("--pace", action="store_true",
+                        help="keep the recorded gaps between commands")
+    parser.add_argument("--output", default=None,
+                        help="write the report here as JSON")
+    args = parser.parse_args(argv)
+
+    header, entries = read_log(args.log)
+    specs = [args.engine1] + ([args.engine2] if args.engine2 else [])
+    tables, differences = replay(entries, specs, header.get("size", 7),
+                                 args.setup, args.pace)
+    labels = ["engine{} ({})".format(i + 1, spec)
+              for i, spec in enumerate(specs)]
+    if len(specs) == 1:
+        recorded_times = {}
+        for entry in entries:
+            name = entry["cmd"].split()[0] if entry["cmd"].split() else ""
+            if name not in SKIPPED:
+                recorded_times.setdefault(name, []).append(entry["latency"])
+        labels.insert(0, "recorded ({})".format(header.get("engine", "?")))
+        tables.insert(0, latency_table(recorded_times))
+    print_report(labels, tables, differences)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"log": args.log, "engines": labels,
+                       "latency_ms": tables, "differences": differences},
+                      f, indent=2)
+    return 1 if differences else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,279 @@
+"""
+gtp_server.py
+Serve many GTP games from one process over TCP or Unix sockets.
+
+Every client connection is an independent GTP session with its own
+board and engine settings. Commands of a session are answered in
+order, but the search of a genmove runs in a shared pool of worker
+processes, so a long genmove in one game does not block the commands
+of any other game. Sessions never search themselves and have no engine
+of their own, only the settings they forward to the pool with each
+genmove: playout_cutoff, playout_limit, playout_patterns and
+random_seed. Commands that need a local engine, such as node_budget
+or live_analysis, are answered with an error.
+
+Addresses are given as tcp:HOST:PORT or unix:PATH.
+"""
+import asyncio
+import io
+import multiprocessing
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+from gtp_connection import GtpConnection, color_to_int, point_tables
+
+def parse_address(address):
+    """
+    Return ("tcp", host, port) or ("unix", path, None) for an address
+    string of the form tcp:HOST:PORT, tcp:PORT or unix:PATH.
+    """
+    kind, _, rest = address.partition(":")
+    if kind == "unix" and rest:
+        return "unix", rest, None
+    if kind == "tcp" and rest:
+        host, _, port = rest.rpartition(":")
+        return "tcp", host or "127.0.0.1", int(port)
+    raise ValueError("bad address {}, use tcp:HOST:PORT or unix:PATH"
+                     .format(address))
+
+_worker_connection = None
+# engine settings of a pool process before any session changed them
+_worker_defaults = {}
+# pattern tables by path, loaded once per pool process
+_worker_patterns = {}
+# settings of the last genmove of a pool process
+_worker_settings = {}
+
+def _worker_init(engine_factory, board_factory, proven_path):
+    """ Set up the engine of a pool process once """
+    global _worker_connection
+    _worker_connection = GtpConnection(engine_factory(), board_factory(),
+                                       outfile=io.StringIO())
+    _worker_connection.proven_cache_cmd([proven_path or "off"])
+    for name in GtpSession.forwarded_settings:
+        _worker_defaults[name] = getattr(_worker_connection.go_engine, name)
+
+def _worker_patterns_of(path):
+    from pattern_policy import PatternPolicy
+    if path not in _worker_patterns:
+        _worker_patterns[path] = PatternPolicy.load(path)
+    return _worker_patterns[path]
+
+def _worker_generate(board, color, start, settings, timelimit, time_manager):
+    """
+    Run the move generation of a session on a pool process, with the
+    engine settings, time limit and clock of the session. settings
+    holds the forwarded settings the session changed, the path of its
+    pattern table as "patterns" and its random seed as "seed".
+    Returns the chosen point.
+    """
+    connection = _worker_connection
+    connection.board = board
+    connection.point_to_move, connection.move_to_point = \
+        point_tables(board.size)
+    engine = connection.go_engine
+    engine.reset_tree()
+    settings = dict(_worker_defaults, **settings)
+    seed = settings.pop("seed", None)
+    if settings != _worker_settings:
+        # decisions searched with other settings, see decision_cache
+        connection.search_settings_changed()
+        _worker_settings.clear()
+        _worker_settings.update(settings)
+    if settings["patterns"] is not None:
+        settings["patterns"] = _worker_patterns_of(settings["patterns"])
+    for name, value in settings.items():
+        setattr(engine, name, value)
+    if seed is not None:
+        # the same seed and position give the same search
+        engine.set_seed(seed * 1000003 + board.moveNumber())
+    connection.timelimit = timelimit
+    connection.time_manager = time_manager
+    return connection.generate_move(color, start)
+
+class GtpSession(GtpConnection):
+    """
+    GTP connection of a single client. Responses are collected and
+    written to the socket after each command.
+    """
+
+    # engine attributes forwarded to the pool process for each genmove
+    forwarded_settings = ("playout_cutoff", "playout_limit", "patterns")
+    # commands that need an engine in the session
+    local_engine_commands = ("node_budget", "playout_workers",
+                             "shared_workers", "live_analysis",
+                             "search_analysis", "search_analysis_text",
+                             "engine_stats", "engine_stats_json",
+                             "profile_start", "profile_stop",
+                             "proven_cache")
+
+    def __init__(self, engine_factory, board, executor, debug_mode = False):
+        """
+        Session playing on board. engine_factory, usually the engine
+        class, gives the name and version; no engine is created.
+        """
+        GtpConnection.__init__(self, None, board, debug_mode,
+                               outfile=io.StringIO())
+        self.engine_factory = engine_factory
+        self.executor = executor
+        self.closed = False
+        self.seed = None
+
+    @property
+    def go_engine(self):
+        raise ValueError("no engine in a server session")
+
+    def random_seed_cmd(self, args):
+        """ Seed the searches of this session, see _worker_generate """
+        try:
+            seed = int(args[0])
+        except ValueError:
+            seed = -1
+        if seed < 0:
+            self.error("seed must be a non-negative integer")
+            return
+        self.seed = seed
+        self.respond('')
+
+    def playout_patterns_cmd(self, args):
+        """
+        Use the pattern table in file args[0], or "off". The pool
+        processes load the table from the path.
+        """
+        if args[0] != "off":
+            from pattern_policy import PatternPolicy
+            try:
+                PatternPolicy.load(args[0])
+            except (OSError, ValueError, KeyError) as e:
+                self.error("cannot load {}: {}".format(args[0], e))
+                return
+        self.set_engine_attribute("patterns",
+                                  None if args[0] == "off" else args[0])
+        self.search_settings_changed()
+        self.respond()
+
+    def forwarded(self):
+        """ Settings of this session for _worker_generate """
+        settings = dict((name, self.engine_settings[name])
+                        for name in self.forwarded_settings
+                        if name in self.engine_settings)
+        if self.seed is not None:
+            settings["seed"] = self.seed
+        return settings
+
+    def quit_cmd(self, args):
+        """ End this session only, the server keeps running """
+        self.respond()
+        self.closed = True
+
+    def take_output(self):
+        data = self.outfile.getvalue()
+        self.outfile.seek(0)
+        self.outfile.truncate()
+        return data
+
+    async def genmove_async(self, args):
+        """ genmove_cmd with the search running on the worker pool """
+        board_color = args[0].lower()
+        color = color_to_int(board_color)
+        if self.respond_game_over(color):
+            return
+        start = time.time()
+        loop = asyncio.get_running_loop()
+        move = await loop.run_in_executor(
+            self.executor, _worker_generate, self.board.copy(), color,
+            start, self.forwarded(), self.timelimit, self.time_manager)
+        self.play_generated_move(move, color)
+        self.time_manager.consume(color, time.time() - start)
+
+    async def run_cmd(self, line):
+        """ Execute one command line, dispatching genmove to the pool """
+        parsed = self.parse_cmd(line)
+        if parsed is None:
+            return
+        command_name, args = parsed
+        try:
+            if command_name == "genmove":
+                if not self.has_arg_error(command_name, len(args)):
+                    await self.genmove_async(args)
+            elif command_name in self.local_engine_commands:
+                self.error("{} is not available in a server session".format(
+                    command_name))
+            else:
+                self.get_cmd(line)
+        except Exception as e:
+            self.debug_msg("Stack Trace:\n{}\n".format(traceback.format_exc()))
+            self.error('{}'.format(str(e)))
+
+class GtpServer(object):
+
+    def __init__(self, engine_factory, board_factory, workers=None,
+                 debug_mode=False, proven_path=None):
+        """
+        Arguments
+        ---------
+        engine_factory, board_factory:
+            callables creating a fresh engine and board. Each pool
+            process has an engine, each session only a board, and reads
+            the engine name and version from engine_factory.
+        workers: int
+            number of search processes, os.cpu_count() if None.
+        proven_path: str
+            proven result database of the pool processes, shared by
+            all sessions, or None for no database.
+        """
+        self.engine_factory = engine_factory
+        self.board_factory = board_factory
+        self.debug_mode = debug_mode
+        self.proven_path = proven_path
+        # spawn, since forking the threaded server process can deadlock
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers or os.cpu_count(),
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_worker_init,
+            initargs=(engine_factory, board_factory, proven_path))
+        self.sessions = 0
+
+    async def handle_client(self, reader, writer):
+        session = GtpSession(self.engine_factory, self.board_factory(),
+                             self.executor, self.debug_mode)
+        self.sessions += 1
+        try:
+            while not session.closed:
+                line = await reader.readline()
+                if not line:
+                    break
+                await session.run_cmd(line.decode("utf-8", "replace"))
+                writer.write(session.take_output().encode("utf-8"))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.sessions -= 1
+            writer.close()
+
+    async def serve(self, address):
+        kind, host, port = parse_address(address)
+        if kind == "unix":
+            server = await asyncio.start_unix_server(self.handle_client, host)
+        else:
+            server = await asyncio.start_server(self.handle_client, host, port)
+        async with server:
+            await server.serve_forever()
+
+    def shutdown(self):
+        self.executor.shutdown(cancel_futures=True)
+
+def serve(engine_factory, board_factory, address, workers=None,
+          debug_mode=False, proven_path=None):
+    """ Run a GTP server on address until interrupted """
+    server = GtpServer(engine_factory, board_factory, workers, debug_mode,
+                       proven_path)
+    try:
+        asyncio.run(server.serve(address))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
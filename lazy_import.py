@@ -0,0 +1,29 @@
+"""
+lazy_import.py
+Modules that are imported on first use.
+
+Importing NumPy takes several times longer than starting the
+interpreter, while GTP commands such as protocol_version and name
+never touch it. The engine modules bind np with lazy_module, so the
+import happens at the first attribute access instead of at startup.
+"""
+import importlib.util
+import sys
+
+def lazy_module(name):
+    """
+    Return the module name, executed on first attribute access.
+    A module that is already imported is returned unchanged.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ImportError("No module named {!r}".format(name), name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
@@ -0,0 +1,257 @@
+"""
+match_runner.py
+Play matches between two GTP engines on one machine.
+
+Games run in parallel in a process pool, colors alternate between
+games, and every finished game is appended to a JSON lines file with
+its moves and per-move timings. With --sprt the match stops as soon
+as a sequential probability ratio test accepts H0 (elo0) or H1 (elo1).
+
+An engine is either a command line, started as a GTP subprocess for
+every game, or "inproc", the engine of Gomoku4.py run inside the
+game's worker process.
+
+Usage example:
+    python match_runner.py --engine1 "python Gomoku4.py" --engine2 inproc \\
+        --games 100 --parallel 4 --timelimit 1 --sprt 0 50 0.05 0.05
+"""
+import argparse
+import io
+import json
+import math
+import os
+import shlex
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from board_util import BLACK, WHITE, GoBoardUtil
+from gtp_connection import point_tables
+
+ENGINE_NAMES = ("engine1", "engine2")
+
+class SubprocessEngine(object):
+    """ A GTP engine running as a child process """
+
+    def __init__(self, command):
+        self.process = subprocess.Popen(
+            shlex.split(command), stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            universal_newlines=True, bufsize=1,
+            cwd=os.path.dirname(os.path.abspath(__file__)))
+        # results cached by earlier games or by the other engine would
+        # make the games of a match depend on each other; engines
+        # without these commands just answer with an error
+        for command in ("proven_cache off", "decision_cache off"):
+            self.send(command)
+
+    def send(self, command):
+        """ Send command, return (success, response) """
+        self.process.stdin.write(command + "\n")
+        self.process.stdin.flush()
+        lines = []
+        while True:
+            line = self.process.stdout.readline()
+            if not line:
+                raise EOFError("engine exited during {}".format(command))
+            line = line.rstrip("\r\n")
+            if line == "" and lines:
+                break
+            if line or lines:
+                lines.append(line)
+        response = "\n".join(lines)
+        return response[0] == "=", response[1:].strip()
+
+    def close(self):
+        try:
+            self.send("quit")
+        except (EOFError, OSError):
+            pass
+        self.process.wait()
+
+class InProcessEngine(object):
+    """ The Gomoku4 engine driven through GtpConnection in this process """
+
+    def __init__(self, size):
+        from Gomoku4 import SimulationPlayer
+        from gtp_connection import GtpConnection
+        from simple_board import SimpleGoBoard
+        self.connection = GtpConnection(SimulationPlayer(), SimpleGoBoard(size),
+                                        outfile=io.StringIO())
+        self.connection.proven_cache_cmd(["off"])
+        self.connection.decision_cache_cmd(["off"])
+
+    def send(self, command):
+        outfile = self.connection.outfile
+        outfile.seek(0)
+        outfile.truncate()
+        self.connection.get_cmd(command + "\n")
+        response = outfile.getvalue().strip()
+        return response[0] == "=", response[1:].strip()
+
+    def close(self):
+        pass
+
+def make_engine(spec, size):
+    if spec == "inproc":
+        return InProcessEngine(size)
+    return SubprocessEngine(spec)
+
+def play_game(game_id, specs, size, timelimit, playouts, seed):
+    """
+    Play one game. Engine game_id % 2 plays Black.
+    Returns the game record as a dict.
+    """
+    from simple_board import SimpleGoBoard
+    first = game_id % 2
+    players = {BLACK: first, WHITE: 1 - first}
+    engines = [make_engine(spec, size) for spec in specs]
+    point_to_move, move_to_point = point_tables(size)
+    board = SimpleGoBoard(size)
+    record = {"game": game_id, "black": ENGINE_NAMES[players[BLACK]],
+              "white": ENGINE_NAMES[players[WHITE]], "size": size,
+              "moves": [], "times": []}
+    try:
+        for index, engine in enumerate(engines):
+            engine.send("boardsize {}".format(size))
+            engine.send("clear_board")
+            if timelimit:
+                engine.send("timelimit {}".format(timelimit))
+            if playouts:
+                engine.send("playout_limit {}".format(playouts))
+            if seed is not None:
+                engine.send("random_seed {}".format(seed + 2 * game_id + index))
+        color = BLACK
+        winner, reason = None, "draw"
+        while True:
+            engine = engines[players[color]]
+            name = "b" if color == BLACK else "w"
+            start = time.time()
+            success, response = engine.send("genmove {}".format(name))
+            record["times"].append(round(time.time() - start, 4))
+            move = response.lower()
+            if not success or move not in move_to_point or \
+               board.get_color(move_to_point[move]) != 0:
+                winner = GoBoardUtil.opponent(color)
+                reason = "resign" if move == "resign" else "illegal"
+                break
+            point = move_to_point[move]
+            board.play_move_gomoku(point, color)
+            record["moves"].append(point_to_move[point])
+            engines[players[GoBoardUtil.opponent(color)]].send(
+                "play {} {}".format(name, move))
+            game_end, game_winner = board.check_game_end_gomoku()
+            if game_end:
+                winner, reason = game_winner, "five"
+                break
+            if board.is_dead_position() or len(board.get_empty_points()) == 0:
+                break
+            color = GoBoardUtil.opponent(color)
+    finally:
+        for engine in engines:
+            engine.close()
+    record["winner"] = ENGINE_NAMES[players[winner]] if winner else "draw"
+    record["reason"] = reason
+    return record
+
+def sprt_llr(wins, draws, losses, elo0, elo1):
+    """
+    Log likelihood ratio of H1 (elo1) against H0 (elo0) for the
+    results of engine1, using the normal approximation of the GSPRT.
+    """
+    n = wins + draws + losses
+    if n == 0 or wins + draws == 0 or draws + losses == 0:
+        return 0.0
+    score = (wins + 0.5 * draws) / n
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 +
+                losses * score ** 2) / n
+    if variance <= 0:
+        return 0.0
+    s0 = 1 / (1 + 10 ** (-elo0 / 400.0))
+    s1 = 1 / (1 + 10 ** (-elo1 / 400.0))
+    return n * (s1 - s0) * (2 * score - s0 - s1) / (2 * variance)
+
+def sprt_bounds(alpha, beta):
+    """ (lower, upper) LLR bounds accepting H0 and H1 """
+    return math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
+
+def run_match(specs, games, parallel, size, timelimit, playouts, output,
+              sprt=None, seed=None, log=sys.stderr):
+    """
+    Play up to games games and append their records to output.
+    Returns (wins, draws, losses) of engine1 and the SPRT verdict.
+    """
+    wins = draws = losses = 0
+    verdict = None
+    bounds = sprt_bounds(sprt[2], sprt[3]) if sprt else None
+    with open(output, "a") as out, \
+         ProcessPoolExecutor(max_workers=parallel) as executor:
+        next_game = 0
+        pending = set()
+        while next_game < games or pending:
+            while next_game < games and len(pending) < parallel and \
+                  verdict is None:
+                pending.add(executor.submit(play_game, next_game, specs, size,
+                                            timelimit, playouts, seed))
+                next_game += 1
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                record = future.result()
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+                if record["winner"] == "engine1":
+                    wins += 1
+                elif record["winner"] == "engine2":
+                    losses += 1
+                else:
+                    draws += 1
+            if sprt and verdict is None:
+                llr = sprt_llr(wins, draws, losses, sprt[0], sprt[1])
+                if llr <= bounds[0]:
+                    verdict = "H0"
+                elif llr >= bounds[1]:
+                    verdict = "H1"
+                log.write("+{} ={} -{} llr {:.3f} [{:.3f}, {:.3f}]\n".format(
+                    wins, draws, losses, llr, bounds[0], bounds[1]))
+            else:
+                log.write("+{} ={} -{}\n".format(wins, draws, losses))
+            log.flush()
+            if verdict is not None:
+                for future in pending:
+                    future.cancel()
+                next_game = games
+    return (wins, draws, losses), verdict
+
+def main(argv=None):
+    here = os.path.dirname(os.path.abspath(__file__))
+    default_engine = "{} {}".format(sys.executable,
+                                    os.path.join(here, "Gomoku4.py"))
+    parser = argparse.ArgumentParser(description="Gomoku engine match runner")
+    parser.add_argument("--engine1", default=default_engine)
+    parser.add_argument("--engine2", default=default_engine)
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--parallel", type=int, default=os.cpu_count())
+    parser.add_argument("--size", type=int, default=7)
+    parser.add_argument("--timelimit", type=float, default=None,
+                        help="seconds per move for both sides")
+    parser.add_argument("--playouts", type=int, default=None,
+                        help="simulations per move for both sides")
+    parser.add_argument("--output", default="match_results.jsonl")
+    parser.add_argument("--sprt", type=float, nargs=4,
+                        metavar=("ELO0", "ELO1", "ALPHA", "BETA"))
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+    if args.timelimit is None and args.playouts is None:
+        parser.error("give --timelimit or --playouts")
+    (wins, draws, losses), verdict = run_match(
+        (args.engine1, args.engine2), args.games, args.parallel, args.size,
+        args.timelimit, args.playouts, args.output, args.sprt, args.seed)
+    print("engine1 +{} ={} -{}{}".format(
+        wins, draws, losses, " SPRT {}".format(verdict) if verdict else ""))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,206 @@
+"""
+node_store.py
+Search tree storage with a fixed node budget.
+
+Nodes live in preallocated NumPy arrays (struct of arrays) and are
+addressed by integer index. Children of a node form a linked list
+through first_child and sibling. When the budget is exhausted, the
+least visited leaves are evicted; subtrees that become unreachable
+when the root advances are recycled through a free list. Memory use
+is fixed by the budget for the lifetime of the store, except that the
+root and its children always fit: if nothing can be evicted, the
+store grows instead of failing the search.
+"""
+from lazy_import import lazy_module
+np = lazy_module("numpy")
+
+"""
+Index used for "no node" in the link arrays and "no move" for the root
+"""
+NO_NODE = -1
+
+class NodeStore(object):
+
+    def __init__(self, capacity=200000, evict_fraction=16):
+        """
+        Arguments
+        ---------
+        capacity: int
+            maximum number of nodes, at least 2.
+        evict_fraction: int
+            when the store is full, capacity // evict_fraction leaves
+            are evicted at once.
+        """
+        assert capacity >= 2
+        self.capacity = capacity
+        self.evict_fraction = evict_fraction
+        self.visits = np.zeros(capacity, dtype=np.int64)
+        self.value_sum = np.zeros(capacity, dtype=np.float64)
+        self.first_child = np.full(capacity, NO_NODE, dtype=np.int32)
+        self.sibling = np.full(capacity, NO_NODE, dtype=np.int32)
+        self.parent = np.full(capacity, NO_NODE, dtype=np.int32)
+        self.move = np.full(capacity, NO_NODE, dtype=np.int32)
+        self.in_use = np.zeros(capacity, dtype=bool)
+        self.reset()
+
+    def _grow(self):
+        """ Double the capacity, keeping all nodes """
+        old = self.capacity
+        self.capacity = 2 * old
+        for name, fill in (("visits", 0), ("value_sum", 0),
+                           ("first_child", NO_NODE), ("sibling", NO_NODE),
+                           ("parent", NO_NODE), ("move", NO_NODE),
+                           ("in_use", False)):
+            array = getattr(self, name)
+            grown = np.full(self.capacity, fill, dtype=array.dtype)
+            grown[:old] = array
+            setattr(self, name, grown)
+        self._free.extend(range(self.capacity - 1, old - 1, -1))
+
+    def reset(self):
+        """ Drop the whole tree and start from an empty root """
+        self.visits[:] = 0
+        self.value_sum[:] = 0
+        self.first_child[:] = NO_NODE
+        self.sibling[:] = NO_NODE
+        self.parent[:] = NO_NODE
+        self.move[:] = NO_NODE
+        self.in_use[:] = False
+        self._free = list(range(self.capacity - 1, -1, -1))
+        self.evictions = 0
+        self.growths = 0
+        self.root = self._allocate(NO_NODE, NO_NODE)
+
+    def num_nodes(self):
+        return self.capacity - len(self._free)
+
+    def _allocate(self, parent, move):
+        if not self._free:
+            self.evict(keep=parent)
+        node = self._free.pop()
+        self.in_use[node] = True
+        self.move[node] = move
+        self.parent[node] = parent
+        if parent != NO_NODE:
+            self.sibling[node] = self.first_child[parent]
+            self.first_child[parent] = node
+        return node
+
+    def _release(self, node):
+        self.in_use[node] = False
+        self.visits[node] = 0
+        self.value_sum[node] = 0
+        self.first_child[node] = NO_NODE
+        self.sibling[node] = NO_NODE
+        self.parent[node] = NO_NODE
+        self.move[node] = NO_NODE
+        self._free.append(node)
+
+    def children(self, node):
+        """ List of the child nodes of node """
+        result = []
+        child = self.first_child[node]
+        while child != NO_NODE:
+            result.append(child)
+            child = self.sibling[child]
+        return result
+
+    def find_child(self, node, move):
+        """ Return the child of node reached by move, or NO_NODE """
+        child = self.first_child[node]
+        while child != NO_NODE:
+            if self.move[child] == move:
+                return child
+            child = self.sibling[child]
+        return NO_NODE
+
+    def child(self, node, move):
+        """ Return the child of node reached by move, creating it if needed """
+        child = self.find_child(node, move)
+        if child == NO_NODE:
+            child = self._allocate(node, move)
+        return child
+
+    def update(self, node, reward):
+        self.visits[node] += 1
+        self.value_sum[node] += reward
+
+    def add_stats(self, nodes, visits, value_sum):
+        """ Add visits and rewards counted elsewhere, e.g. on remote workers """
+        self.visits[nodes] += visits
+        self.value_sum[nodes] += value_sum
+
+    def mean(self, node):
+        visits = self.visits[node]
+        if visits == 0:
+            return 0.0
+        return self.value_sum[node] / visits
+
+    def _unlink(self, node):
+        """ Remove node from the child list of its parent """
+        parent = self.parent[node]
+        if parent == NO_NODE:
+            return
+        child = self.first_child[parent]
+        if child == node:
+            self.first_child[parent] = self.sibling[node]
+            return
+        while child != NO_NODE:
+            next_child = self.sibling[child]
+            if next_child == node:
+                self.sibling[child] = self.sibling[node]
+                return
+            child = next_child
+
+    def free_subtree(self, node):
+        """ Recycle node and all its descendants """
+        self._unlink(node)
+        stack = [node]
+        while stack:
+            n = stack.pop()
+            child = self.first_child[n]
+            while child != NO_NODE:
+                stack.append(child)
+                child = self.sibling[child]
+            self._release(n)
+
+    def advance(self, move):
+        """
+        Make the child reached by move the new root after move was played.
+        Everything that is no longer reachable is recycled.
+        """
+        old_root = self.root
+        new_root = self.find_child(old_root, move)
+        if new_root == NO_NODE:
+            new_root = self._allocate(old_root, move)
+        self._unlink(new_root)
+        self.parent[new_root] = NO_NODE
+        self.sibling[new_root] = NO_NODE
+        self.free_subtree(old_root)
+        self.root = new_root
+
+    def evict(self, keep=NO_NODE):
+        """
+        Free the least visited leaves. Children of the root are kept,
+        since the search holds on to them during a move, and so is
+        the node keep, which is about to get a new child. If there
+        is no other leaf, the store grows instead.
+        """
+        candidates = self.in_use.copy()
+        candidates[self.root] = False
+        candidates[self.children(self.root)] = False
+        if keep != NO_NODE:
+            candidates[keep] = False
+        leaves = np.flatnonzero(candidates & (self.first_child == NO_NODE))
+        if len(leaves) == 0:
+            self._grow()
+            self.growths += 1
+            return
+        count = min(len(leaves), max(1, self.capacity // self.evict_fraction))
+        if count < len(leaves):
+            order = np.argpartition(self.visits[leaves], count - 1)[:count]
+            leaves = leaves[order]
+        for leaf in leaves:
+            self._unlink(leaf)
+            self._release(leaf)
+        self.evictions += count
@@ -0,0 +1,210 @@
+"""
+pattern_policy.py
+Playout policy biased by line pattern weights fitted offline.
+
+The pattern of an empty point in one of the four directions of
+threats.DIRECTIONS is the content of the 8 cells up to 4 steps away
+on that line, see size_tables.LINE_OFFSETS, as a base 4 code with
+one digit per cell: EMPTY, own stone, opponent stone or BORDER, seen
+from the player to move. A table gives a factor for every code, and
+the weight of a point is the sum of the factors of its four patterns.
+fit_patterns.py fits the table to the moves of self-play or archive
+games.
+
+A playout picks each move with probability proportional to its
+weight. Boards keep the codes of all points up to date as stones are
+placed, see SimpleGoBoard.track_patterns, at a fixed cost per move.
+Codes whose factor is above the threshold of the table are urgent,
+and the board also collects the points that have an urgent code.
+Their weights are summed exactly for every move. Every other point
+weighs at most 4 * threshold, so it is drawn by rejection: a uniform
+proposal from the empty points is accepted with probability
+weight / (4 * threshold). The weight is a sum rather than a product
+of the factors to keep that bound, and the acceptance rate, fixed.
+"""
+from lazy_import import lazy_module
+np = lazy_module("numpy")
+
+from board_util import EMPTY, BLACK, WHITE, BORDER
+from simple_board import SimpleGoBoard
+import size_tables
+
+CELLS = len(size_tables.LINE_OFFSETS)
+NUM_CODES = 4 ** CELLS
+assert NUM_CODES == size_tables.OCCUPIED
+
+FORMAT_VERSION = 1
+
+_maps = None
+
+def code_maps():
+    """
+    (swap, mirror): swap[code] exchanges the colors of the stones of a
+    code, mirror[code] reads its cells in the opposite direction.
+    """
+    global _maps
+    if _maps is None:
+        codes = np.arange(NUM_CODES)
+        digits = (codes[:, None] >> (2 * np.arange(CELLS))) & 3
+        units = 4 ** np.arange(CELLS)
+        swapped = np.array([EMPTY, WHITE, BLACK, BORDER])[digits]
+        _maps = (swapped @ units, digits[:, ::-1] @ units)
+    return _maps
+
+def line_pattern_codes(boards, to_play):
+    """
+    Pattern codes of every point of a stack of boards as an int array
+    of shape (B, size, size, 4), from the view of to_play (a color, or
+    one color per board). Codes of occupied points are meaningless.
+    """
+    from threats import line_windows, RADIUS
+    lines = line_windows(boards)
+    to_play = np.broadcast_to(np.asarray(to_play), (lines.shape[0],))
+    codes = np.zeros(lines.shape[:4], dtype=np.int64)
+    for digit, k in enumerate(size_tables.LINE_OFFSETS):
+        codes += lines[..., RADIUS + k].astype(np.int64) << (2 * digit)
+    swap, _ = code_maps()
+    white = to_play == WHITE
+    codes[white] = swap[codes[white]]
+    return codes
+
+class PatternPolicy(object):
+    """
+    A table of pattern factors with the lookup lists used by
+    playouts. factors[code] is the factor of a code seen by the player
+    to move, with 1 for own stones and 2 for opponent stones.
+    """
+
+    def __init__(self, factors, threshold, info=None):
+        factors = np.asarray(factors, dtype=np.float64)
+        assert factors.shape == (NUM_CODES,)
+        swap, _ = code_maps()
+        self.factors = factors
+        self.threshold = float(threshold)
+        self.info = info or {}
+        # factors by absolute code, for Black and for White to move;
+        # codes of occupied points, OCCUPIED and above, weigh 0
+        occupied = [0.0] * (2 * NUM_CODES)
+        self.weights = [None, factors.tolist() + occupied,
+                        factors[swap].tolist() + occupied]
+        self.urgent_codes = ((factors > threshold) |
+                             (factors[swap] > threshold)).tolist() + \
+                            [False] * (2 * NUM_CODES)
+        self.bound = 4 * self.threshold
+
+    @classmethod
+    def load(cls, path):
+        """ Read a table written by save() """
+        with np.load(path) as data:
+            if int(data["version"]) != FORMAT_VERSION:
+                raise ValueError("unknown pattern table version {}".format(
+                    int(data["version"])))
+            info = dict((name[5:], data[name].item()) for name in data.files
+                        if name.startswith("info_"))
+            return cls(data["factors"], float(data["threshold"]), info)
+
+    def save(self, path):
+        """ Write the table as a compressed .npz file """
+        extra = dict(("info_" + name, value)
+                     for name, value in self.info.items())
+        with open(path, "wb") as f:
+            np.savez_compressed(f, version=FORMAT_VERSION,
+                                factors=self.factors.astype(np.float32),
+                                threshold=self.threshold, **extra)
+
+    def point_weight(self, board, point, color):
+        """ Weight of an empty point for color, board tracking patterns """
+        board.track_patterns(self)
+        codes = board.line_codes
+        weights = self.weights[color]
+        return sum(weights[codes[d * board.maxpoint + point]]
+                   for d in range(4))
+
+    def choose(self, board, color, empties, rng):
+        """
+        Draw a point with probability proportional to its weight for
+        color. empties holds every empty point and maybe some occupied
+        ones, which weigh 0.
+        """
+        codes = board.line_codes
+        maxpoint = board.maxpoint
+        weights = self.weights[color]
+        urgent = board.urgent
+        total = 0.0
+        cumulative = []
+        occupied = []
+        for point in urgent:
+            weight = weights[codes[point]] + \
+                     weights[codes[point + maxpoint]] + \
+                     weights[codes[point + 2 * maxpoint]] + \
+                     weights[codes[point + 3 * maxpoint]]
+            if weight:
+                total += weight
+                cumulative.append((total, point))
+            else:
+                occupied.append(point)
+        urgent.difference_update(occupied)
+        bound = self.bound
+        span = total + len(empties) * bound
+        while True:
+            r = rng.random() * span
+            if r < total:
+                for limit, point in cumulative:
+                    if r < limit:
+                        return point
+            r = (r - total) / bound
+            slot = int(r)
+            if slot >= len(empties):
+                continue
+            point = empties[slot]
+            if point in urgent:
+                continue
+            weight = weights[codes[point]] + \
+                     weights[codes[point + maxpoint]] + \
+                     weights[codes[point + 2 * maxpoint]] + \
+                     weights[codes[point + 3 * maxpoint]]
+            if (r - slot) * bound < weight:
+                return point
+
+    def simulate(self, board, color, cutoff, rng):
+        """
+        Playout with moves drawn by choose(), truncated after cutoff
+        moves unless cutoff is 0. Returns the reward for color like
+        SimpleGoBoard.cutoff_simulate.
+        """
+        if board.patterns is not self:
+            board.track_patterns(self)
+        win, winner = board.check_game_end_gomoku()
+        dead = board.is_dead_position()
+        i = 0
+        if not win and not dead:
+            empties = board.get_empty_points().tolist()
+            limit = min(cutoff, len(empties)) if cutoff else len(empties)
+            counts = board.pattern_counts
+            played = 0
+            while i < limit:
+                # drop the occupied points once they are half the list
+                if 2 * played > len(empties):
+                    codes = board.line_codes
+                    empties = [p for p in empties if codes[p] < NUM_CODES]
+                    played = 0
+                player = board.current_player
+                board.play_move_gomoku(self.choose(board, player, empties,
+                                                   rng), player)
+                i += 1
+                played += 1
+                if counts[player][5]:
+                    win, winner = True, player
+                    break
+                if board.is_dead_position():
+                    dead = True
+                    break
+        SimpleGoBoard.num_playouts += 1
+        SimpleGoBoard.num_playout_moves += i
+        if dead:
+            return 0
+        if win:
+            return 1 if winner == color else -1
+        if not cutoff:
+            return 0
+        return 2.0 * board.win_probability(color) - 1.0
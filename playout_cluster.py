@@ -0,0 +1,483 @@
+"""
+playout_cluster.py
+Simulation batches on remote worker processes.
+
+The engine listens on a TCP or Unix socket and worker processes,
+on the same machine or elsewhere, connect to it and register. During
+a genmove with a deadline every idle worker gets a batch: the position
+as a move list, the candidate moves and a number of simulations. The
+worker runs a root search over the candidates, stops at the batch
+size or the batch deadline, whichever comes first, and sends back the
+visits and value sums of every candidate, which are added to the
+root statistics of the local search. A worker that finishes early
+gets the next batch while time is left.
+
+The engine never waits for a worker: results are read while the local
+search runs, and whatever has not arrived when the search ends is
+dropped. Workers that miss the deadlines of MAX_LATE batches in a row,
+close their connection or send a malformed result are removed.
+
+A registered worker steers the moves of the engine, and the protocol
+has no encryption. The engine should listen on localhost or a Unix
+socket; when it listens on any other TCP address, workers must
+present the shared token of $GOMOKU_CLUSTER_TOKEN when they register,
+and the engine refuses to start without one. Use it on trusted
+networks only.
+
+Messages are JSON objects, one per line:
+    worker -> engine {"op": "register", "name": ..., "protocol": 1,
+                      "token": ...}
+    engine -> worker {"op": "welcome", "id": ...}
+    engine -> worker {"op": "batch", "id": ..., "search": ..., "size": ...,
+                      "moves": [["b", "D4"], ...], "to_play": "w",
+                      "candidates": ["C3", ...], "simulations": ...,
+                      "seconds": ..., "cutoff": ..., "seed": ...}
+    worker -> engine {"op": "result", "id": ..., "search": ...,
+                      "visits": [...], "value_sum": [...]}
+"seconds" is the time the batch may take from its arrival, so the
+clocks of the machines need not agree.
+
+Usage, with the engine started with --playout-workers tcp:127.0.0.1:7070:
+    python playout_cluster.py worker tcp:127.0.0.1:7070 [--count 4]
+and across machines, with the same $GOMOKU_CLUSTER_TOKEN on both sides
+and the engine started with --playout-workers tcp:0.0.0.0:7070:
+    python playout_cluster.py worker tcp:ENGINE_HOST:7070 [--count 4]
+"""
+import argparse
+import hmac
+import math
+import json
+import os
+import select
+import socket
+import sys
+import time
+
+from board_util import BLACK
+from gtp_server import parse_address
+
+PROTOCOL_VERSION = 1
+
+# simulations of one batch
+BATCH_SIZE = 256
+# seconds before the search deadline at which workers stop, for the
+# result to travel back
+RESULT_MARGIN = 0.05
+# no batch is sent with less time than this left
+MIN_BATCH_SECONDS = 0.02
+# seconds past its deadline after which a batch counts as late
+LATE_GRACE = 0.25
+MAX_LATE = 3
+
+LOOPBACK_HOSTS = ("127.0.0.1", "localhost", "::1")
+
+def default_token():
+    """ Shared secret of engine and workers: $GOMOKU_CLUSTER_TOKEN """
+    return os.environ.get("GOMOKU_CLUSTER_TOKEN") or None
+
+def check_result(message, count):
+    """
+    (visits, value_sum) of a result message as lists, with count
+    candidates unless count is None. Raises ValueError if the lengths
+    differ, a number is not finite, a visit count is negative or not
+    an integer, or a value sum exceeds its visits, since every reward
+    is in [-1, 1].
+    """
+    visits = message["visits"]
+    value_sum = message["value_sum"]
+    if not isinstance(visits, list) or not isinstance(value_sum, list) or \
+       len(visits) != len(value_sum) or \
+       (count is not None and len(visits) != count):
+        raise ValueError("result of the wrong shape")
+    for n, value in zip(visits, value_sum):
+        if not isinstance(n, int) or isinstance(n, bool) or n < 0 or \
+           not isinstance(value, (int, float)) or \
+           not math.isfinite(value) or abs(value) > n + 1e-6:
+            raise ValueError("result out of range")
+    return visits, value_sum
+
+def _listen(address):
+    kind, host, port = parse_address(address)
+    if kind == "unix":
+        if os.path.exists(host):
+            os.remove(host)
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(host)
+        return listener, "unix:" + host
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((host, port))
+    return listener, "tcp:{}:{}".format(host, listener.getsockname()[1])
+
+def _connect(address):
+    kind, host, port = parse_address(address)
+    if kind == "unix":
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(host)
+        return sock
+    sock = socket.create_connection((host, port))
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return sock
+
+def _encode(message):
+    return (json.dumps(message) + "\n").encode("utf-8")
+
+class RemoteWorker(object):
+    """ Engine side of the connection to one worker """
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.sock.setblocking(False)
+        # set by the register message
+        self.name = None
+        self.buffer = b""
+        # id of the batch being run, None when idle
+        self.batch = None
+        # time.time() after which the running batch is late
+        self.due = 0.0
+        self.overdue = False
+        # batches in a row that were late
+        self.late = 0
+        self.batches = 0
+        self.simulations = 0
+
+    def send(self, message):
+        """ Send without blocking; raises OSError if the worker lags """
+        self.sock.sendall(_encode(message))
+
+    def receive(self):
+        """
+        Complete messages received so far. Raises EOFError when the
+        worker closed the connection.
+        """
+        while True:
+            try:
+                data = self.sock.recv(1 << 16)
+            except BlockingIOError:
+                break
+            if not data:
+                raise EOFError
+            self.buffer += data
+        lines = self.buffer.split(b"\n")
+        self.buffer = lines.pop()
+        return [json.loads(line) for line in lines if line.strip()]
+
+class PlayoutCluster(object):
+    """ Engine side of the cluster: registration, batches and results """
+
+    def __init__(self, address, batch_size=BATCH_SIZE, margin=RESULT_MARGIN,
+                 token=None):
+        """
+        Listen for workers on address, tcp:HOST:PORT or unix:PATH.
+        With port 0 a free port is picked, see self.address. Workers
+        must register with token, default_token() if None. Raises
+        ValueError for a TCP address other than localhost without a
+        token.
+        """
+        self.token = token or default_token()
+        kind, host, _ = parse_address(address)
+        if kind == "tcp" and host not in LOOPBACK_HOSTS and not self.token:
+            raise ValueError("listening on {} needs a shared token in "
+                             "$GOMOKU_CLUSTER_TOKEN".format(address))
+        self.listener, self.address = _listen(address)
+        self.listener.listen(64)
+        self.listener.setblocking(False)
+        self.batch_size = batch_size
+        self.margin = margin
+        self.workers = []
+        # the running search: id, deadline and the batch message
+        self.search = None
+        self.next_search = 0
+        self.next_batch = 0
+        # counters for engine_stats
+        self.registered = 0
+        self.dropped = 0
+        self.batches = 0
+        self.late_batches = 0
+        self.remote_simulations = 0
+
+    def start_search(self, board, color, candidates, cutoff, deadline, seed):
+        """
+        Begin a search for color over the candidate points on board,
+        ending at time.time() deadline. Batches go out at once.
+        """
+        from gtp_connection import point_tables
+        point_to_move = point_tables(board.size)[0]
+        self.next_search += 1
+        moves = [["b" if board.get_color(point) == BLACK else "w",
+                  point_to_move[point]] for point in board.moves]
+        self.search = {
+            "id": self.next_search,
+            "deadline": deadline,
+            "seed": seed,
+            "message": {
+                "op": "batch",
+                "search": self.next_search,
+                "size": board.size,
+                "moves": moves,
+                "to_play": "b" if color == BLACK else "w",
+                "candidates": [point_to_move[point] for point in candidates],
+                "simulations": self.batch_size,
+                "cutoff": cutoff,
+            },
+        }
+        self.poll()
+
+    def poll(self):
+        """
+        Handle registrations and finished batches without waiting.
+        Returns the (visits, value_sum) lists of the batches of the
+        running search that arrived since the last call.
+        """
+        sockets = [self.listener] + [worker.sock for worker in self.workers]
+        try:
+            readable = set(select.select(sockets, [], [], 0)[0])
+        except (OSError, ValueError):
+            readable = set(sockets)
+        if self.listener in readable:
+            self._accept()
+        results = []
+        for worker in list(self.workers):
+            if worker.sock not in readable:
+                continue
+            try:
+                for message in worker.receive():
+                    self._handle(worker, message, results)
+            except (EOFError, OSError, ValueError, KeyError, TypeError):
+                self._drop(worker)
+        now = time.time()
+        for worker in list(self.workers):
+            if worker.batch is not None and not worker.overdue and \
+               now > worker.due:
+                worker.overdue = True
+                worker.late += 1
+                self.late_batches += 1
+                if worker.late >= MAX_LATE:
+                    self._drop(worker)
+        for worker in list(self.workers):
+            self._dispatch(worker)
+        return results
+
+    def finish(self):
+        """ End the running search, returning its last results """
+        results = self.poll()
+        self.search = None
+        return results
+
+    def _accept(self):
+        while True:
+            try:
+                sock, _ = self.listener.accept()
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                return
+            self.workers.append(RemoteWorker(sock))
+
+    def _handle(self, worker, message, results):
+        op = message["op"]
+        if op == "register":
+            if message.get("protocol") != PROTOCOL_VERSION:
+                worker.send({"op": "reject",
+                             "reason": "protocol {} expected".format(
+                                 PROTOCOL_VERSION)})
+                raise ValueError("protocol mismatch")
+            if self.token and not hmac.compare_digest(
+                    str(message.get("token", "")), self.token):
+                worker.send({"op": "reject", "reason": "wrong token"})
+                raise ValueError("wrong token")
+            worker.name = str(message.get("name"))
+            self.registered += 1
+            worker.send({"op": "welcome", "id": self.registered})
+        elif op == "result":
+            if worker.name is None or message["id"] != worker.batch:
+                return
+            current = self.search is not None and \
+                message["search"] == self.search["id"]
+            count = len(self.search["message"]["candidates"]) \
+                if current else None
+            visits, value_sum = check_result(message, count)
+            worker.batch = None
+            worker.late = 0
+            worker.batches += 1
+            self.batches += 1
+            simulations = sum(visits)
+            worker.simulations += simulations
+            if current:
+                results.append((visits, value_sum))
+                self.remote_simulations += simulations
+        else:
+            raise ValueError("unexpected message {}".format(op))
+
+    def _dispatch(self, worker):
+        """ Send the next batch of the running search to an idle worker """
+        search = self.search
+        if search is None or worker.name is None or worker.batch is not None:
+            return
+        seconds = search["deadline"] - time.time() - self.margin
+        if seconds < MIN_BATCH_SECONDS:
+            return
+        self.next_batch += 1
+        message = dict(search["message"], id=self.next_batch,
+                       seconds=round(seconds, 4),
+                       seed=search["seed"] + self.next_batch)
+        try:
+            worker.send(message)
+        except OSError:
+            self._drop(worker)
+            return
+        worker.batch = self.next_batch
+        worker.due = time.time() + seconds + LATE_GRACE
+        worker.overdue = False
+
+    def _drop(self, worker):
+        if worker in self.workers:
+            self.workers.remove(worker)
+            self.dropped += 1
+        try:
+            worker.sock.close()
+        except OSError:
+            pass
+
+    def stats(self):
+        """ Counters for engine_stats """
+        return {
+            "cluster_workers": sum(1 for worker in self.workers
+                                   if worker.name is not None),
+            "cluster_batches": self.batches,
+            "cluster_late_batches": self.late_batches,
+            "cluster_dropped_workers": self.dropped,
+            "cluster_simulations": self.remote_simulations,
+        }
+
+    def close(self):
+        for worker in list(self.workers):
+            worker.sock.close()
+        self.workers = []
+        self.listener.close()
+        kind, path, _ = parse_address(self.address)
+        if kind == "unix" and os.path.exists(path):
+            os.remove(path)
+
+def run_batch(engine, batch):
+    """ Run one batch message on engine, return the result message """
+    from gtp_connection import point_tables, color_to_int
+    from simple_board import SimpleGoBoard
+    size = batch["size"]
+    move_to_point = point_tables(size)[1]
+    board = SimpleGoBoard(size)
+    for color, move in batch["moves"]:
+        board.play_move_gomoku(move_to_point[move.lower()],
+                               color_to_int(color))
+    color = color_to_int(batch["to_play"])
+    board.current_player = color
+    candidates = [move_to_point[move.lower()] for move in batch["candidates"]]
+    engine.reset_tree()
+    engine.set_seed(batch["seed"])
+    engine.playout_cutoff = batch["cutoff"]
+    engine.playout_limit = batch["simulations"]
+    engine.genmove(candidates, board, color,
+                   deadline=time.time() + batch["seconds"])
+    return {
+        "op": "result",
+        "id": batch["id"],
+        "search": batch["search"],
+        "visits": [int(v) for v in engine.tree.visits[engine.children]],
+        "value_sum": [float(v) for v in engine.tree.value_sum[engine.children]],
+    }
+
+def run_worker(address, name=None, delay=0.0, once=False, retry=0.5,
+               log=sys.stderr, token=None):
+    """
+    Serve batches of the engine at address. Reconnects when the engine
+    goes away, e.g. between games, unless once is set.
+    delay seconds are slept before every result, to stand in for a
+    slow node in tests. token is sent on registering, default_token()
+    if None.
+    """
+    from Gomoku4 import SimulationPlayer
+    engine = SimulationPlayer()
+    name = name or "{}:{}".format(socket.gethostname(), os.getpid())
+    token = token or default_token()
+    connected = False
+    while True:
+        try:
+            sock = _connect(address)
+        except OSError:
+            if once and connected:
+                return
+            time.sleep(retry)
+            continue
+        connected = True
+        try:
+            _serve(sock, engine, name, delay, log, token)
+        except (OSError, ValueError) as e:
+            log.write("worker {}: {}\n".format(name, e))
+        finally:
+            sock.close()
+        if once:
+            return
+        time.sleep(retry)
+
+def _serve(sock, engine, name, delay, log, token):
+    stream = sock.makefile("rb")
+    register = {"op": "register", "name": name, "protocol": PROTOCOL_VERSION}
+    if token:
+        register["token"] = token
+    sock.sendall(_encode(register))
+    for line in stream:
+        message = json.loads(line)
+        op = message.get("op")
+        if op == "welcome":
+            log.write("worker {} registered as {}\n".format(
+                name, message["id"]))
+        elif op == "reject":
+            raise ValueError("rejected: {}".format(message.get("reason")))
+        elif op == "batch":
+            result = run_batch(engine, message)
+            if delay:
+                time.sleep(delay)
+            sock.sendall(_encode(result))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="remote playout workers")
+    commands = parser.add_subparsers(dest="command")
+    worker = commands.add_parser("worker", help="serve simulation batches")
+    worker.add_argument("address", help="tcp:HOST:PORT or unix:PATH "
+                        "of the engine")
+    worker.add_argument("--count", type=int, default=1,
+                        help="worker processes to start")
+    worker.add_argument("--name")
+    worker.add_argument("--delay", type=float, default=0.0,
+                        help="seconds to hold every result, for testing")
+    worker.add_argument("--once", action="store_true",
+                        help="exit when the engine closes the connection")
+    args = parser.parse_args(argv)
+    if args.command != "worker":
+        parser.print_help()
+        return 1
+    if args.count == 1:
+        run_worker(args.address, args.name, args.delay, args.once)
+        return 0
+    import multiprocessing
+    processes = [multiprocessing.Process(
+                     target=run_worker,
+                     args=(args.address,
+                           args.name and "{}-{}".format(args.name, i),
+                           args.delay, args.once))
+                 for i in range(args.count)]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+    return 0
+
+if __name__ == '__main__':
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        pass
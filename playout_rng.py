@@ -0,0 +1,109 @@
+"""
+playout_rng.py
+Random numbers for playouts and move selection.
+
+Move orders are drawn in bulk: for each number of empty points a pool
+of permutations is generated with a single NumPy call into a reused
+buffer, and single random integers come from a pre-drawn block of
+floats. Only the pools of the last MAX_POOLS numbers are kept, since
+the number of empty points drops by one with every move of a game. Streams are seeded through numpy SeedSequence, so independent
+per-worker streams can be derived from one seed for reproducible
+parallel runs.
+"""
+from lazy_import import lazy_module
+np = lazy_module("numpy")
+
+# permutation pools kept, one per number of points
+MAX_POOLS = 4
+
+class PlayoutRNG(object):
+
+    def __init__(self, seed=None, pool_size=256):
+        """
+        Create a random stream.
+
+        Arguments
+        ---------
+        seed: int, SeedSequence or None
+            None draws fresh entropy from the operating system.
+        pool_size: int
+            number of permutations and floats drawn per refill.
+        """
+        if isinstance(seed, np.random.SeedSequence):
+            self.seed_seq = seed
+        else:
+            self.seed_seq = np.random.SeedSequence(seed)
+        self.generator = np.random.Generator(np.random.SFC64(self.seed_seq))
+        self.pool_size = pool_size
+        # n -> [permutation buffer of shape (pool_size, n), next row]
+        self._permutations = {}
+        # drawn as one array, handed out as Python floats
+        self._floats = np.empty(pool_size)
+        self._float_list = []
+        self._next_float = pool_size
+
+    def spawn(self, n):
+        """
+        Return n independent child streams, e.g. one per worker process.
+        """
+        return [PlayoutRNG(s, self.pool_size) for s in self.seed_seq.spawn(n)]
+
+    def permutation(self, n):
+        """
+        Return a random permutation of range(n) as a NumPy array.
+        The array is a view into a reused buffer and is only valid
+        until the pool for n is refilled.
+        """
+        entry = self._permutations.get(n)
+        if entry is None:
+            if len(self._permutations) >= MAX_POOLS:
+                # dicts keep insertion order: drop the oldest pool
+                del self._permutations[next(iter(self._permutations))]
+            entry = [np.empty((self.pool_size, n), dtype=np.intp),
+                     self.pool_size]
+            self._permutations[n] = entry
+        buffer, row = entry
+        if row == self.pool_size:
+            buffer[:] = np.arange(n)
+            self.generator.permuted(buffer, axis=1, out=buffer)
+            row = 0
+        entry[1] = row + 1
+        return buffer[row]
+
+    def shuffled(self, points):
+        """
+        Return the points of a NumPy array as a list in random order.
+        """
+        return points[self.permutation(len(points))].tolist()
+
+    def random(self):
+        """ Return a float uniformly drawn from [0, 1) """
+        if self._next_float == self.pool_size:
+            self.generator.random(out=self._floats)
+            self._float_list = self._floats.tolist()
+            self._next_float = 0
+        value = self._float_list[self._next_float]
+        self._next_float += 1
+        return value
+
+    def randrange(self, n):
+        """ Return an int uniformly drawn from range(n) """
+        return int(self.random() * n)
+
+_default_rng = None
+
+def default_rng():
+    """
+    Return the process wide stream used when no stream is given.
+    """
+    global _default_rng
+    if _default_rng is None:
+        _default_rng = PlayoutRNG()
+    return _default_rng
+
+def worker_rng(seed, worker_id):
+    """
+    Return the stream of worker worker_id derived from a common seed.
+    The same (seed, worker_id) always gives the same stream.
+    """
+    return PlayoutRNG(np.random.SeedSequence(seed, spawn_key=(worker_id,)))
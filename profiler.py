@@ -0,0 +1,100 @@
+"""
+profiler.py
+Span tracer for profiling move generation.
+
+Spans are recorded with begin()/end() and written as Chrome trace
+events (load in chrome://tracing or Perfetto) and as collapsed stacks
+for flamegraph.pl / speedscope. Spans named in sampled are only
+recorded for every sample_every-th occurrence, together with all spans
+nested inside them; collapsed stack weights are scaled back up so the
+flamegraph still shows estimated totals.
+"""
+import json
+import os
+import time
+
+class SpanTracer(object):
+
+    def __init__(self, sample_every=16, sampled=("selection",),
+                 max_events=500000):
+        self.sample_every = sample_every
+        self.sampled = frozenset(sampled)
+        self.max_events = max_events
+        self.events = []
+        self.folded = {}
+        self._counts = {}
+        # entries: [name, start, child time, recorded, scale]
+        self._stack = []
+        self._origin = time.perf_counter()
+
+    def begin(self, name):
+        parent = self._stack[-1] if self._stack else None
+        recorded = parent is None or parent[3]
+        scale = parent[4] if parent else 1
+        if recorded and name in self.sampled:
+            count = self._counts.get(name, 0)
+            self._counts[name] = count + 1
+            if count % self.sample_every:
+                recorded = False
+            else:
+                scale *= self.sample_every
+        if len(self.events) >= self.max_events:
+            recorded = False
+        self._stack.append([name, time.perf_counter(), 0.0, recorded, scale])
+
+    def end(self):
+        name, start, child_time, recorded, scale = self._stack.pop()
+        now = time.perf_counter()
+        duration = now - start
+        if self._stack:
+            self._stack[-1][2] += duration
+        if not recorded:
+            return
+        self.events.append({
+            "name": name,
+            "ph": "X",
+            "ts": (start - self._origin) * 1e6,
+            "dur": duration * 1e6,
+            "pid": os.getpid(),
+            "tid": 1,
+        })
+        path = ';'.join([frame[0] for frame in self._stack] + [name])
+        self_us = (duration - child_time) * 1e6 * scale
+        self.folded[path] = self.folded.get(path, 0.0) + self_us
+
+    def span(self, name):
+        return _Span(self, name)
+
+    def write_chrome_trace(self, path):
+        with open(path, "w") as f:
+            json.dump({"traceEvents": self.events,
+                       "displayTimeUnit": "ms"}, f)
+
+    def write_collapsed(self, path):
+        with open(path, "w") as f:
+            for stack, weight in sorted(self.folded.items()):
+                f.write("{} {}\n".format(stack, int(round(weight))))
+
+    def write(self, prefix):
+        """
+        Write prefix.trace.json and prefix.folded, return the two paths
+        """
+        trace_path = prefix + ".trace.json"
+        folded_path = prefix + ".folded"
+        self.write_chrome_trace(trace_path)
+        self.write_collapsed(folded_path)
+        return trace_path, folded_path
+
+class _Span(object):
+
+    def __init__(self, tracer, name):
+        self.tracer = tracer
+        self.name = name
+
+    def __enter__(self):
+        self.tracer.begin(self.name)
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.end()
+        return False
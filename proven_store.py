@@ -0,0 +1,171 @@
+"""
+proven_store.py
+On-disk cache of proven game results shared between engine runs.
+
+Results are keyed by board size, canonical Zobrist hash and color to
+move, and store win/loss/draw for the player to move together with
+the best move in the canonical orientation. The SQLite database is
+opened lazily on first use and runs in WAL mode, so several engine
+processes can read it while one writes. Writes go through a queue to
+a background thread and never block the GTP response. If the database
+cannot be opened or written, e.g. because its directory cannot be
+created, the store switches itself off: lookups miss and writes are
+dropped, and the game goes on without it.
+"""
+import os
+import queue
+import threading
+from lazy_import import lazy_module
+sqlite3 = lazy_module("sqlite3")
+
+WIN = "win"
+LOSS = "loss"
+DRAW = "draw"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS proven (
+    size INTEGER NOT NULL,
+    hash INTEGER NOT NULL,
+    to_move INTEGER NOT NULL,
+    result TEXT NOT NULL,
+    move INTEGER,
+    PRIMARY KEY (size, hash, to_move)
+)
+"""
+
+def default_path():
+    """
+    Database location: $GOMOKU_PROVEN_DB, or a file in ~/.cache/gomoku
+    """
+    path = os.environ.get("GOMOKU_PROVEN_DB")
+    if path:
+        return path
+    return os.path.join(os.path.expanduser("~"), ".cache", "gomoku",
+                        "proven.sqlite")
+
+class ProvenResultStore(object):
+
+    def __init__(self, path=None, timeout=0.05):
+        """
+        Arguments
+        ---------
+        path: str
+            database file, default_path() if None.
+        timeout: float
+            seconds a lookup waits for a locked database before it is
+            treated as a miss.
+        """
+        self.path = path or default_path()
+        self.timeout = timeout
+        self._reader = None
+        self._queue = None
+        self._writer = None
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        # message of the error that switched the store off, None while
+        # it works
+        self.error = None
+
+    def _fail(self, error):
+        """ Switch the store off after an error """
+        if self.error is None:
+            self.error = "{}: {}".format(type(error).__name__, error)
+
+    def _connect(self, timeout):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=timeout)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(_SCHEMA)
+        connection.commit()
+        return connection
+
+    def get(self, size, hash_value, to_move):
+        """
+        Return (result, canonical move) or None if nothing is stored.
+        """
+        row = None
+        if self.error is None:
+            try:
+                if self._reader is None:
+                    self._reader = self._connect(self.timeout)
+                row = self._reader.execute(
+                    "SELECT result, move FROM proven "
+                    "WHERE size = ? AND hash = ? AND to_move = ?",
+                    (size, hash_value, to_move)).fetchone()
+            except sqlite3.OperationalError as e:
+                # a locked database is a miss, anything else switches
+                # the store off
+                if "locked" not in str(e):
+                    self._fail(e)
+            except (sqlite3.Error, OSError) as e:
+                self._fail(e)
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0], row[1]
+
+    def put(self, size, hash_value, to_move, result, move):
+        """
+        Queue a proven result for writing. Returns immediately.
+        """
+        if self.error is not None:
+            return
+        if self._writer is None:
+            self._queue = queue.Queue()
+            self._writer = threading.Thread(target=self._write_loop,
+                                            daemon=True)
+            self._writer.start()
+        self._queue.put((size, hash_value, to_move, result, move))
+
+    def _write_loop(self):
+        connection = None
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                break
+            items = [item]
+            # write everything that is already queued in one transaction
+            while not self._queue.empty():
+                next_item = self._queue.get()
+                if next_item is None:
+                    self._queue.put(None)
+                    self._queue.task_done()
+                    break
+                items.append(next_item)
+            if self.error is None:
+                try:
+                    if connection is None:
+                        connection = self._connect(5.0)
+                    connection.executemany(
+                        "INSERT OR REPLACE INTO proven VALUES "
+                        "(?, ?, ?, ?, ?)", items)
+                    connection.commit()
+                    self.writes += len(items)
+                except sqlite3.OperationalError as e:
+                    if "locked" not in str(e):
+                        self._fail(e)
+                except (sqlite3.Error, OSError) as e:
+                    self._fail(e)
+            for _ in items:
+                self._queue.task_done()
+        if connection is not None:
+            connection.close()
+
+    def flush(self):
+        """ Wait until all queued results are written """
+        if self._queue is not None:
+            self._queue.join()
+
+    def close(self):
+        if self._writer is not None:
+            self._queue.put(None)
+            self._writer.join()
+            self._writer = None
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
@@ -0,0 +1,318 @@
+"""
+selfplay_data.py
+Self-play training data in memory-mapped shards.
+
+Games of the engine against itself run in a process pool. Every
+searched position is stored as one fixed-size record: the stones
+packed 2 bits per point, the side to move, the move played, the root
+visit distribution of the search and the result of the game. Records
+are streamed into shards of shard_positions records each, plain
+arrays of the record dtype that np.memmap opens without reading them,
+and index.json lists the shards.
+
+Usage:
+    python selfplay_data.py generate --output DIR --games 1000 \\
+        --parallel 4 --size 7 --playouts 300
+    python selfplay_data.py info DIR
+"""
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+
+from board_util import EMPTY, BLACK, WHITE
+
+FORMAT_VERSION = 1
+INDEX_FILE = "index.json"
+
+def record_dtype(size):
+    """ dtype of one position record on a size x size board """
+    points = size * size
+    return np.dtype([
+        ("stones", np.uint8, ((points + 3) // 4,)),
+        ("to_play", np.uint8),
+        # EMPTY for a draw
+        ("winner", np.uint8),
+        # grid index row * size + col of the move played
+        ("move", np.uint16),
+        ("move_number", np.uint16),
+        ("game", np.uint32),
+        ("visits", np.float16, (points,)),
+    ])
+
+def pack_stones(grids):
+    """ Pack (N, size, size) stone grids to (N, bytes) with 2 bits a point """
+    grids = np.asarray(grids, dtype=np.uint8)
+    flat = grids.reshape(len(grids), -1)
+    padding = -flat.shape[1] % 4
+    flat = np.pad(flat, ((0, 0), (0, padding)))
+    quads = flat.reshape(len(grids), -1, 4)
+    return quads[..., 0] | quads[..., 1] << 2 | quads[..., 2] << 4 | \
+           quads[..., 3] << 6
+
+def unpack_stones(packed, size):
+    """ Inverse of pack_stones, returns (N, size, size) int8 grids """
+    packed = np.asarray(packed, dtype=np.uint8)
+    quads = np.stack([(packed >> shift) & 3 for shift in (0, 2, 4, 6)],
+                     axis=-1)
+    flat = quads.reshape(len(packed), -1)[:, :size * size]
+    return flat.reshape(len(packed), size, size).astype(np.int8)
+
+class ShardWriter(object):
+    """ Appends records to fixed-size shards in directory """
+
+    def __init__(self, directory, size, shard_positions=1 << 16):
+        self.directory = directory
+        self.size = size
+        self.dtype = record_dtype(size)
+        self.shard_positions = shard_positions
+        os.makedirs(directory, exist_ok=True)
+        self.shards = []
+        self.games = 0
+        self.file = None
+        self.filled = 0
+        if os.path.exists(os.path.join(directory, INDEX_FILE)):
+            raise ValueError("{} already holds a data set".format(directory))
+
+    def _open_shard(self):
+        name = "shard-{:05d}.bin".format(len(self.shards))
+        self.file = open(os.path.join(self.directory, name), "wb")
+        self.shards.append({"file": name, "positions": 0})
+        self.filled = 0
+
+    def append(self, records):
+        """ Write the records of one game """
+        records = np.asarray(records, dtype=self.dtype)
+        self.games += 1
+        start = 0
+        while start < len(records):
+            if self.file is None or self.filled == self.shard_positions:
+                self._close_shard()
+                self._open_shard()
+            count = min(len(records) - start, self.shard_positions - self.filled)
+            self.file.write(records[start:start + count].tobytes())
+            self.filled += count
+            self.shards[-1]["positions"] = self.filled
+            start += count
+
+    def _close_shard(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+            self.write_index()
+
+    def write_index(self):
+        index = {
+            "format": FORMAT_VERSION,
+            "size": self.size,
+            "record_bytes": self.dtype.itemsize,
+            "shard_positions": self.shard_positions,
+            "positions": sum(shard["positions"] for shard in self.shards),
+            "games": self.games,
+            "shards": self.shards,
+        }
+        path = os.path.join(self.directory, INDEX_FILE)
+        with open(path + ".tmp", "w") as f:
+            json.dump(index, f, indent=1)
+        os.replace(path + ".tmp", path)
+
+    def close(self):
+        self._close_shard()
+        self.write_index()
+
+class ShardDataset(object):
+    """
+    Read-only view of a data set. Shards are memory-mapped, so
+    opening is instant and only the records used are read.
+    """
+
+    def __init__(self, directory):
+        with open(os.path.join(directory, INDEX_FILE)) as f:
+            self.index = json.load(f)
+        if self.index["format"] != FORMAT_VERSION:
+            raise ValueError("unknown data format {}".format(
+                self.index["format"]))
+        self.size = self.index["size"]
+        self.dtype = record_dtype(self.size)
+        self.shards = [np.memmap(os.path.join(directory, shard["file"]),
+                                 dtype=self.dtype, mode="r",
+                                 shape=(shard["positions"],))
+                       for shard in self.index["shards"]
+                       if shard["positions"]]
+        self.offsets = np.cumsum([0] + [len(shard) for shard in self.shards])
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    def records(self, indices):
+        """ Records at the given global indices, as one array """
+        indices = np.asarray(indices)
+        shard_of = np.searchsorted(self.offsets, indices, side="right") - 1
+        result = np.empty(len(indices), dtype=self.dtype)
+        for shard in np.unique(shard_of):
+            mask = shard_of == shard
+            result[mask] = self.shards[shard][indices[mask] -
+                                              self.offsets[shard]]
+        return result
+
+    def stones(self, records):
+        """ (N, size, size) stone grids of records """
+        return unpack_stones(records["stones"], self.size)
+
+def _grid_index(point, size):
+    return (point // (size + 1) - 1) * size + point % (size + 1) - 1
+
+def _root_distribution(connection, point, size):
+    """ Root visit distribution of the last search, one-hot without one """
+    distribution = np.zeros(size * size, dtype=np.float32)
+    engine = connection.go_engine
+    if connection.stop_reason in ("budget", "deadline"):
+        visits = engine.tree.visits[engine.children]
+        for move, count in zip(engine.moves, visits):
+            distribution[_grid_index(move, size)] += count
+    if distribution.sum() == 0:
+        distribution[_grid_index(point, size)] = 1
+    return distribution / distribution.sum()
+
+def play_game(game_id, size, playouts, seed, random_moves):
+    """
+    Play one self-play game and return its searched positions as an
+    array of record_dtype(size). The first random_moves moves are
+    random points next to the stones, for variety, and not recorded.
+    """
+    from Gomoku4 import SimulationPlayer
+    from gtp_connection import GtpConnection
+    from simple_board import SimpleGoBoard
+    from playout_rng import PlayoutRNG
+
+    connection = GtpConnection(SimulationPlayer(), SimpleGoBoard(size),
+                               outfile=io.StringIO())
+    connection.proven_cache_cmd(["off"])
+    connection.decision_cache_cmd(["off"])
+    connection.timelimit = 3600
+    engine = connection.go_engine
+    engine.playout_limit = playouts
+    engine.rng = PlayoutRNG(seed)
+    rng = random.Random(seed)
+    board = connection.board
+    positions = []
+    winner = EMPTY
+    move_number = 0
+    while True:
+        game_end, game_winner = board.check_game_end_gomoku()
+        if game_end:
+            winner = game_winner
+            break
+        if board.is_dead_position() or len(board.get_empty_points()) == 0:
+            break
+        color = board.current_player
+        if move_number < random_moves:
+            near = board.points_near_stones(1)
+            point = board.center_point() if len(near) == 0 else \
+                    near[rng.randrange(len(near))]
+        else:
+            grid = board.stones_grid().copy()
+            point = connection.generate_move(color, time.time())
+            positions.append((grid, color, _grid_index(point, size),
+                              move_number,
+                              _root_distribution(connection, point, size)))
+        board.play_move_gomoku(point, color)
+        engine.advance(point)
+        move_number += 1
+
+    records = np.zeros(len(positions), dtype=record_dtype(size))
+    if positions:
+        grids, colors, moves, numbers, visits = zip(*positions)
+        records["stones"] = pack_stones(np.stack(grids))
+        records["to_play"] = colors
+        records["move"] = moves
+        records["move_number"] = numbers
+        records["visits"] = np.stack(visits)
+    records["winner"] = winner
+    records["game"] = game_id
+    return records
+
+def generate(output, games, parallel, size, playouts, seed=0,
+             random_moves=2, shard_positions=1 << 16, log=sys.stderr):
+    """ Play games in a process pool, streaming positions into output """
+    writer = ShardWriter(output, size, shard_positions)
+    start = time.time()
+    results = {BLACK: 0, WHITE: 0, EMPTY: 0}
+    try:
+        with ProcessPoolExecutor(max_workers=parallel) as executor:
+            next_game = 0
+            pending = set()
+            while next_game < games or pending:
+                while next_game < games and len(pending) < 2 * parallel:
+                    pending.add(executor.submit(
+                        play_game, next_game, size, playouts,
+                        seed * 1000003 + next_game, random_moves))
+                    next_game += 1
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    records = future.result()
+                    writer.append(records)
+                    if len(records):
+                        results[int(records["winner"][0])] += 1
+                log.write("{} games, {} positions, {:.1f}s\n".format(
+                    writer.games, sum(s["positions"] for s in writer.shards),
+                    time.time() - start))
+                log.flush()
+    finally:
+        writer.close()
+    return results
+
+def info(directory):
+    start = time.time()
+    dataset = ShardDataset(directory)
+    opened = time.time() - start
+    records = dataset.records(np.arange(len(dataset)))
+    loaded = time.time() - start - opened
+    print("{} positions from {} games in {} shards, {}x{} board, {} bytes "
+          "per position".format(len(dataset), dataset.index["games"],
+                                len(dataset.shards), dataset.size,
+                                dataset.size, dataset.dtype.itemsize))
+    if len(records):
+        winners = np.bincount(records["winner"], minlength=3)
+        print("positions by result: black {} white {} draw {}".format(
+            winners[BLACK], winners[WHITE], winners[EMPTY]))
+    print("open {:.3f}s, read all records {:.3f}s".format(opened, loaded))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="self-play training data")
+    commands = parser.add_subparsers(dest="command")
+    gen = commands.add_parser("generate", help="play games and write shards")
+    gen.add_argument("--output", required=True)
+    gen.add_argument("--games", type=int, default=100)
+    gen.add_argument("--parallel", type=int, default=os.cpu_count())
+    gen.add_argument("--size", type=int, default=7)
+    gen.add_argument("--playouts", type=int, default=300,
+                     help="simulations per searched move")
+    gen.add_argument("--random-moves", type=int, default=2,
+                     help="random opening moves, not recorded")
+    gen.add_argument("--shard-positions", type=int, default=1 << 16)
+    gen.add_argument("--seed", type=int, default=0)
+    show = commands.add_parser("info", help="summarize a data set")
+    show.add_argument("directory")
+    args = parser.parse_args(argv)
+    if args.command == "generate":
+        results = generate(args.output, args.games, args.parallel, args.size,
+                           args.playouts, args.seed, args.random_moves,
+                           args.shard_positions)
+        print("black {} white {} draw {}".format(
+            results[BLACK], results[WHITE], results[EMPTY]))
+    elif args.command == "info":
+        info(args.directory)
+    else:
+        parser.print_help()
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""
+session_log.py
+Recording of GTP sessions for later replay with gtp_replay.py.
+
+A session log is a JSON lines file. The first line is a header with
+the engine name and start time, every following line is one command:
+    {"t": seconds since start, "cmd": command line,
+     "response": everything written while it ran, "latency": seconds}
+"""
+import json
+import time
+
+class SessionRecorder(object):
+
+    def __init__(self, path, header=None):
+        self.path = path
+        self.file = open(path, "w")
+        self.start = time.time()
+        self._origin = time.perf_counter()
+        self.output = None
+        self._command = None
+        self._begin = 0.0
+        info = {"type": "header", "start": self.start}
+        info.update(header or {})
+        self._write(info)
+
+    def begin(self, command):
+        """ A command starts; capture output until end() """
+        self._command = command.strip()
+        self.output = []
+        self._begin = time.perf_counter()
+
+    def end(self):
+        if self._command is None:
+            return
+        latency = time.perf_counter() - self._begin
+        self._write({
+            "t": round(self._begin - self._origin, 6),
+            "cmd": self._command,
+            "response": "".join(self.output),
+            "latency": round(latency, 6),
+        })
+        self._command = None
+        self.output = None
+
+    def _write(self, entry):
+        self.file.write(json.dumps(entry) + "\n")
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        """ Write a pending command and close the log """
+        if self.file is None:
+            return
+        self.end()
+        self.file.close()
+        self.file = None
+
+def read_log(path):
+    """ Return (header, entries) of a session log """
+    header = {}
+    entries = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            if entry.get("type") == "header":
+                header = entry
+            else:
+                entries.append(entry)
+    return header, entries
@@ -0,0 +1,274 @@
+"""
+shared_search.py
+Root parallel search with worker processes on this machine, sharing
+position and statistics through multiprocessing.shared_memory.
+
+One shared block holds a header (search id, deadline, size, side to
+move, candidates count, cutoff and seed), the padded board array of
+the position, the candidate points and, for every worker, a row of
+visits and value sums per candidate. Workers attach to the block once
+when they start. For a genmove the engine writes the position into
+the block and wakes the workers through a Condition; nothing is
+pickled. Each worker searches the candidates until the deadline and
+every PUBLISH_INTERVAL seconds overwrites its own row with its running
+totals. A row is guarded by a sequence number that is odd while the
+row is written, so the engine never reads a half written row, and
+since only one process writes a row no lock is taken. The engine adds
+the growth of every row to its root children while its own search
+runs.
+
+The time the engine spends writing positions, waking workers and
+reading rows, and the time workers spend publishing, is kept per
+genmove and reported by engine_stats.
+"""
+import multiprocessing
+import time
+from multiprocessing import shared_memory
+
+from lazy_import import lazy_module
+np = lazy_module("numpy")
+
+from board_util import BLACK, WHITE, MAXSIZE
+
+# header fields, float64
+SEARCH_ID, DEADLINE, SIZE, TO_PLAY, NUM_CANDIDATES, CUTOFF, SEED, \
+    SHUTDOWN = range(8)
+HEADER_FIELDS = 8
+
+MAX_POINTS = MAXSIZE * MAXSIZE + 3 * (MAXSIZE + 1)
+MAX_CANDIDATES = MAXSIZE * MAXSIZE
+
+# seconds between two publications of a worker
+PUBLISH_INTERVAL = 0.02
+# seconds before the deadline at which workers stop
+MARGIN = 0.02
+
+def _layout(buf, workers):
+    """ numpy views of the parts of the shared block """
+    views = {}
+    offset = 0
+    for name, dtype, shape in (
+            ("header", np.float64, (HEADER_FIELDS,)),
+            ("position", np.int32, (MAX_POINTS,)),
+            ("candidates", np.int32, (MAX_CANDIDATES,)),
+            ("visits", np.int64, (workers, MAX_CANDIDATES)),
+            ("value_sum", np.float64, (workers, MAX_CANDIDATES)),
+            # sequence number, search id of the row and publications
+            ("row_meta", np.int64, (workers, 3)),
+            # seconds spent publishing in the current search
+            ("publish_time", np.float64, (workers,))):
+        size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        if buf is not None:
+            views[name] = np.ndarray(shape, dtype=dtype, buffer=buf,
+                                     offset=offset)
+        offset += (size + 63) // 64 * 64
+    return views, offset
+
+SEQ, ROW_SEARCH, PUBLISHES = range(3)
+
+class SharedSearch(object):
+    """
+    Engine side: starts the workers, hands them each search and
+    collects their statistics. Same interface as
+    playout_cluster.PlayoutCluster, see SimulationPlayer.cluster.
+    """
+
+    def __init__(self, workers):
+        self.num_workers = workers
+        _, size = _layout(None, workers)
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+        self.views, _ = _layout(self.shm.buf, workers)
+        self.views["header"][:] = 0
+        self.views["row_meta"][:] = 0
+        context = multiprocessing.get_context("spawn")
+        self.condition = context.Condition()
+        self.processes = [context.Process(target=_worker_main,
+                                          args=(self.shm.name, workers, i,
+                                                self.condition),
+                                          daemon=True)
+                          for i in range(workers)]
+        for process in self.processes:
+            process.start()
+        self.search = 0
+        self.num_candidates = 0
+        # rows and their sequence numbers as last read, per worker
+        self.seen = None
+        self.seen_seq = None
+        # counters for engine_stats
+        self.sync_time = 0.0
+        self.last_sync_time = 0.0
+        self.last_publish_time = 0.0
+        self.last_publishes = 0
+        self.torn_reads = 0
+        self.remote_simulations = 0
+
+    def start_search(self, board, color, candidates, cutoff, deadline, seed):
+        """ Push the position to the workers and wake them """
+        start = time.perf_counter()
+        views = self.views
+        header = views["header"]
+        n = len(candidates)
+        views["position"][:board.maxpoint] = board.board
+        views["candidates"][:n] = candidates
+        self.num_candidates = n
+        self.seen = np.zeros((self.num_workers, 2, n))
+        self.seen_seq = [-1] * self.num_workers
+        self.search += 1
+        with self.condition:
+            header[DEADLINE] = deadline
+            header[SIZE] = board.size
+            header[TO_PLAY] = color
+            header[NUM_CANDIDATES] = n
+            header[CUTOFF] = cutoff
+            header[SEED] = seed
+            header[SEARCH_ID] = self.search
+            self.condition.notify_all()
+        self.last_sync_time = time.perf_counter() - start
+
+    def _read_row(self, worker):
+        """
+        (visits, value_sum) of a worker's row, None if it is unchanged
+        since the last read or belongs to an earlier search
+        """
+        views = self.views
+        meta = views["row_meta"][worker]
+        n = self.num_candidates
+        for _ in range(8):
+            seq = int(meta[SEQ])
+            if seq == self.seen_seq[worker]:
+                return None
+            if seq & 1:
+                self.torn_reads += 1
+                continue
+            visits = views["visits"][worker, :n].copy()
+            value_sum = views["value_sum"][worker, :n].copy()
+            row_search = meta[ROW_SEARCH]
+            if meta[SEQ] == seq:
+                self.seen_seq[worker] = seq
+                if row_search != self.search:
+                    return None
+                return visits, value_sum
+            self.torn_reads += 1
+        return None
+
+    def poll(self):
+        """ Growth of the worker rows since the last call """
+        start = time.perf_counter()
+        results = []
+        for worker in range(self.num_workers):
+            row = self._read_row(worker)
+            if row is None:
+                continue
+            visits, value_sum = row
+            seen = self.seen[worker]
+            added = visits - seen[0]
+            if added.sum() > 0:
+                results.append((added.astype(np.int64), value_sum - seen[1]))
+                seen[0] = visits
+                seen[1] = value_sum
+                self.remote_simulations += int(added.sum())
+        self.last_sync_time += time.perf_counter() - start
+        return results
+
+    def finish(self):
+        """ Read the last rows of the search and book its overhead """
+        results = self.poll()
+        self.sync_time += self.last_sync_time
+        meta = self.views["row_meta"]
+        current = meta[:, ROW_SEARCH] == self.search
+        self.last_publish_time = float(
+            self.views["publish_time"][current].sum())
+        self.last_publishes = int(meta[current, PUBLISHES].sum())
+        return results
+
+    def stats(self):
+        """ Counters for engine_stats """
+        return {
+            "shared_workers": sum(process.is_alive()
+                                  for process in self.processes),
+            "shared_simulations": self.remote_simulations,
+            "shared_sync_ms": round(1000 * self.last_sync_time, 3),
+            "shared_publish_ms": round(1000 * self.last_publish_time, 3),
+            "shared_publishes": self.last_publishes,
+            "shared_torn_reads": self.torn_reads,
+            "shared_sync_total": round(self.sync_time, 4),
+        }
+
+    def close(self):
+        with self.condition:
+            self.views["header"][SHUTDOWN] = 1
+            self.condition.notify_all()
+        for process in self.processes:
+            process.join(timeout=2)
+            if process.is_alive():
+                process.terminate()
+        self.views = None
+        self.shm.close()
+        self.shm.unlink()
+
+def _worker_main(name, workers, index, condition):
+    """ Search loop of one worker process """
+    from Gomoku4 import SimulationPlayer
+    from simple_board import SimpleGoBoard
+    shm = shared_memory.SharedMemory(name=name)
+    views, _ = _layout(shm.buf, workers)
+    header = views["header"]
+    meta = views["row_meta"][index]
+    visits_row = views["visits"][index]
+    value_row = views["value_sum"][index]
+    engine = SimulationPlayer()
+    engine.report_interval = PUBLISH_INTERVAL
+    boards = {}
+    last = 0
+    try:
+        while True:
+            with condition:
+                condition.wait_for(lambda: header[SEARCH_ID] != last or
+                                   header[SHUTDOWN], timeout=1.0)
+            if header[SHUTDOWN]:
+                break
+            search = int(header[SEARCH_ID])
+            if search == last:
+                continue
+            last = search
+            size = int(header[SIZE])
+            if size not in boards:
+                boards[size] = SimpleGoBoard(size)
+            board = boards[size]
+            board.reset(size)
+            stones = views["position"][:board.maxpoint]
+            for point in np.flatnonzero((stones == BLACK) |
+                                        (stones == WHITE)):
+                board.play_move_gomoku(int(point), int(stones[point]))
+            color = int(header[TO_PLAY])
+            board.current_player = color
+            n = int(header[NUM_CANDIDATES])
+            if n < 2:
+                continue
+            candidates = [int(p) for p in views["candidates"][:n]]
+            views["publish_time"][index] = 0.0
+            meta[PUBLISHES] = 0
+
+            def publish(info=None):
+                start = time.perf_counter()
+                meta[SEQ] += 1
+                visits_row[:n] = engine.tree.visits[engine.children]
+                value_row[:n] = engine.tree.value_sum[engine.children]
+                meta[ROW_SEARCH] = search
+                meta[SEQ] += 1
+                meta[PUBLISHES] += 1
+                views["publish_time"][index] += time.perf_counter() - start
+
+            engine.reset_tree()
+            engine.set_seed(int(header[SEED]) + index)
+            engine.playout_cutoff = int(header[CUTOFF])
+            engine.playout_limit = 0
+            engine.progress = publish
+            engine.genmove(candidates, board, color,
+                           deadline=header[DEADLINE] - MARGIN)
+            publish()
+    finally:
+        # the views must be gone before the block can be closed
+        engine.progress = None
+        views = header = meta = visits_row = value_row = stones = None
+        shm.close()
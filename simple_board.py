@@ -9,16 +9,46 @@ Implements a basic Go board with functions to:
 
 The board uses a 1-dimensional representation with padding
 """
-import random
-import numpy as np
+import math
+from lazy_import import lazy_module
+np = lazy_module("numpy")
 from board_util import GoBoardUtil, BLACK, WHITE, EMPTY, BORDER, \
                        PASS, is_black_white, coord_to_point, where1d, \
                        MAXSIZE, NULLPOINT
 
 from gtp_connection import point_to_coord,format_point
+from playout_rng import default_rng
+import size_tables
+
+"""
+Weights of a five-point window holding k stones of one color and none of
+the other, indexed by k. Open shapes lie in more live windows than closed
+ones, so open twos, threes and fours automatically outscore closed ones.
+"""
+PATTERN_WEIGHTS = [0, 1, 10, 100, 1000, 100000]
+
+"""
+Scale of the sigmoid that maps a static evaluation to a win probability.
+"""
+EVAL_SCALE = 200.0
+
+def window_tables(size):
+    """
+    Return (windows, point_windows) for a board of given size.
+    windows is a list of the five-point lines on the board,
+    point_windows[point] the indices of the windows containing point.
+    The tables only depend on the size and are shared between boards.
+    """
+    table = size_tables.tables(size)
+    return table["windows"], table["point_windows"]
 
 class SimpleGoBoard(object):
 
+    # process wide counters, reported by the engine_stats GTP command
+    num_copies = 0
+    num_playouts = 0
+    num_playout_moves = 0
+
     def get_color(self, point):
         try:
             return self.board[point]
@@ -69,11 +99,49 @@ class SimpleGoBoard(object):
         """
         return where1d(self.board == EMPTY)
 
+    def center_point(self):
+        """ The center point, for even sizes the one up and left of it """
+        center = (self.size + 1) // 2
+        return self.pt(center, center)
+
+    def stones_grid(self):
+        """ size x size view of the board, row 0 is board row 1 """
+        NS = self.NS
+        return self.board[NS:NS * (self.size + 1)].reshape(self.size, NS)[:, 1:]
+
+    def grid_points(self):
+        """ Board points in the order of stones_grid().ravel() """
+        rows = self.NS * np.arange(1, self.size + 1)
+        return np.add.outer(rows, np.arange(1, self.size + 1)).ravel()
+
+    def points_near_stones(self, distance):
+        """
+        Empty points within distance (in both row and column) of a
+        stone, in increasing order. Empty if the board is empty.
+        """
+        occupied = self.stones_grid() != EMPTY
+        size = self.size
+        # the square neighbourhood is a row dilation followed by a
+        # column dilation
+        padded = np.pad(occupied, ((0, 0), (distance, distance)))
+        near_rows = padded[:, 0:size].copy()
+        for dcol in range(1, 2 * distance + 1):
+            near_rows |= padded[:, dcol:dcol + size]
+        padded = np.pad(near_rows, ((distance, distance), (0, 0)))
+        near = padded[0:size].copy()
+        for drow in range(1, 2 * distance + 1):
+            near |= padded[drow:drow + size]
+        rows, cols = np.nonzero(near & ~occupied)
+        return self.NS * (rows + 1) + cols + 1
+
     def __init__(self, size):
         """
         Creates a Go board of given size
         """
         assert 2 <= size <= MAXSIZE
+        # counts every change of the position, reset() included, so a
+        # (board, version) pair never names two different positions
+        self.version = 0
         self.reset(size)
         self.moves=[]
         self.last_move = None
@@ -84,6 +152,7 @@ class SimpleGoBoard(object):
         The board is stored as a one-dimensional array
         See GoBoardUtil.coord_to_point for explanations of the array encoding
         """
+        self.version += 1
         self.size = size
         self.NS = size + 1
         self.WE = 1
@@ -94,19 +163,72 @@ class SimpleGoBoard(object):
         self.liberty_of = np.full(self.maxpoint, NULLPOINT, dtype = np.int32)
         self._initialize_empty_points(self.board)
         self._initialize_neighbors()
+        self._initialize_windows()
         self.moves=[]
         self.last_move = None
+        self.patterns = None
+        self.line_updates = None
+        self.line_codes = None
+        self.urgent = None
 
     def copy(self):
-        b = SimpleGoBoard(self.size)
-        assert b.NS == self.NS
-        assert b.WE == self.WE
+        """
+        Return a copy of the board that can be played on independently.
+        Size dependent tables are shared instead of being rebuilt.
+        """
+        SimpleGoBoard.num_copies += 1
+        b = SimpleGoBoard.__new__(SimpleGoBoard)
+        b.version = self.version
+        b.size = self.size
+        b.NS = self.NS
+        b.WE = self.WE
         b.ko_recapture = self.ko_recapture
         b.current_player = self.current_player
-        assert b.maxpoint == self.maxpoint
+        b.maxpoint = self.maxpoint
         b.board = np.copy(self.board)
+        b.liberty_of = np.copy(self.liberty_of)
+        b.neighbors = self.neighbors
+        b.windows = self.windows
+        b.point_windows = self.point_windows
+        b.window_stones = [None, self.window_stones[BLACK][:],
+                           self.window_stones[WHITE][:]]
+        b.pattern_counts = [None, self.pattern_counts[BLACK][:],
+                            self.pattern_counts[WHITE][:]]
+        b.live_windows = self.live_windows[:]
+        b.eval_score = self.eval_score
+        b.moves = self.moves[:]
+        b.last_move = self.last_move
+        b.patterns = self.patterns
+        b.line_updates = self.line_updates
+        if self.line_codes is None:
+            b.line_codes = None
+            b.urgent = None
+        else:
+            b.line_codes = self.line_codes[:]
+            b.urgent = set(self.urgent)
         return b
 
+    def __getstate__(self):
+        """
+        Size dependent tables are not pickled, they are rebuilt
+        or taken from the per-size caches when unpickling.
+        Line patterns are not tracked by the copy.
+        """
+        state = self.__dict__.copy()
+        for name in ("neighbors", "windows", "point_windows", "patterns",
+                     "line_updates", "line_codes", "urgent"):
+            state.pop(name, None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._initialize_neighbors()
+        self.windows, self.point_windows = window_tables(self.size)
+        self.patterns = None
+        self.line_updates = None
+        self.line_codes = None
+        self.urgent = None
+
     def row_start(self, row):
         assert row >= 1
         assert row <= self.size
@@ -133,15 +255,167 @@ class SimpleGoBoard(object):
     def _initialize_neighbors(self):
         """
         precompute neighbor array.
-        For each point on the board, store its list of on-the-board neighbors
+        For each point on the board, store its list of on-the-board neighbors.
+        The array is shared by all boards of the same size.
         """
-        self.neighbors = []
-        for point in range(self.maxpoint):
-            if self.board[point] == BORDER:
-                self.neighbors.append([])
-            else:
-                self.neighbors.append(self._on_board_neighbors(point))
+        self.neighbors = size_tables.tables(self.size)["neighbors"]
         
+    def _initialize_windows(self):
+        """
+        Set up the incremental pattern counts of the static evaluator.
+        window_stones[color][w] is the number of stones of color in window w.
+        pattern_counts[color][k] is the number of windows holding exactly
+        k stones of color and no opponent stone.
+        live_windows[color] is the number of windows without opponent stones,
+        i.e. the windows in which color can still make five.
+        eval_score is the weighted pattern score from Black's point of view.
+        """
+        self.windows, self.point_windows = window_tables(self.size)
+        n = len(self.windows)
+        self.window_stones = [None, [0] * n, [0] * n]
+        self.pattern_counts = [None, [n, 0, 0, 0, 0, 0], [n, 0, 0, 0, 0, 0]]
+        self.live_windows = [None, n, n]
+        self.eval_score = 0
+
+    def _add_to_windows(self, point, color):
+        """
+        Update the pattern counts for a stone of color placed on point.
+        """
+        opp_color = GoBoardUtil.opponent(color)
+        own_stones = self.window_stones[color]
+        opp_stones = self.window_stones[opp_color]
+        own_counts = self.pattern_counts[color]
+        opp_counts = self.pattern_counts[opp_color]
+        delta = 0
+        for w in self.point_windows[point]:
+            own = own_stones[w]
+            opp = opp_stones[w]
+            own_stones[w] = own + 1
+            if opp == 0:
+                own_counts[own] -= 1
+                own_counts[own + 1] += 1
+                delta += PATTERN_WEIGHTS[own + 1] - PATTERN_WEIGHTS[own]
+                if own == 0:
+                    opp_counts[0] -= 1
+                    self.live_windows[opp_color] -= 1
+            elif own == 0:
+                # window is no longer winnable for the opponent
+                opp_counts[opp] -= 1
+                self.live_windows[opp_color] -= 1
+                delta += PATTERN_WEIGHTS[opp]
+        if color == BLACK:
+            self.eval_score += delta
+        else:
+            self.eval_score -= delta
+
+    def _remove_from_windows(self, point, color):
+        """
+        Update the pattern counts for a stone of color removed from point.
+        """
+        opp_color = GoBoardUtil.opponent(color)
+        own_stones = self.window_stones[color]
+        opp_stones = self.window_stones[opp_color]
+        own_counts = self.pattern_counts[color]
+        opp_counts = self.pattern_counts[opp_color]
+        delta = 0
+        for w in self.point_windows[point]:
+            own = own_stones[w] - 1
+            opp = opp_stones[w]
+            own_stones[w] = own
+            if opp == 0:
+                own_counts[own + 1] -= 1
+                own_counts[own] += 1
+                delta += PATTERN_WEIGHTS[own + 1] - PATTERN_WEIGHTS[own]
+                if own == 0:
+                    opp_counts[0] += 1
+                    self.live_windows[opp_color] += 1
+            elif own == 0:
+                opp_counts[opp] += 1
+                self.live_windows[opp_color] += 1
+                delta += PATTERN_WEIGHTS[opp]
+        if color == BLACK:
+            self.eval_score -= delta
+        else:
+            self.eval_score += delta
+
+    def track_patterns(self, patterns):
+        """
+        Keep the line pattern codes of a pattern_policy.PatternPolicy
+        up to date from now on. line_codes[d * maxpoint + point] is the
+        code of the cells around point in direction d, urgent holds the
+        points with a code that is urgent for either color, and maybe
+        points that no longer have one; calling this again drops those.
+        """
+        if self.patterns is patterns:
+            self._prune_urgent()
+            return
+        table = size_tables.tables(self.size)
+        self.patterns = patterns
+        self.line_updates = table["line_updates"]
+        self.line_codes = table["line_codes"][:]
+        self.urgent = set()
+        for point in where1d((self.board == BLACK) |
+                             (self.board == WHITE)).tolist():
+            self._update_line_codes(point, int(self.board[point]))
+        self.urgent.update(self.get_empty_points().tolist())
+        self._prune_urgent()
+
+    def untrack_patterns(self):
+        """ Stop keeping the line pattern codes, see track_patterns """
+        self.patterns = None
+        self.line_updates = None
+        self.line_codes = None
+        self.urgent = None
+
+    def _prune_urgent(self):
+        """ Drop the points without an urgent code from urgent """
+        urgent_codes = self.patterns.urgent_codes
+        codes = self.line_codes
+        maxpoint = self.maxpoint
+        self.urgent = set(point for point in self.urgent
+                          if any(urgent_codes[codes[d * maxpoint + point]]
+                                 for d in range(4)))
+
+    def _update_line_codes(self, point, change):
+        """
+        A stone of color change was placed on point, or removed from
+        it if change is minus the color.
+        """
+        codes = self.line_codes
+        urgent_codes = self.patterns.urgent_codes
+        urgent = self.urgent
+        for index, unit, other in self.line_updates[point]:
+            code = codes[index] + unit * change
+            codes[index] = code
+            if urgent_codes[code]:
+                urgent.add(other)
+
+    def is_dead_position(self):
+        """
+        True if every five-point window contains stones of both colors.
+        Neither player can make five any more, so the game is a draw.
+        """
+        return self.live_windows[BLACK] == 0 and self.live_windows[WHITE] == 0
+
+    def evaluate(self, color):
+        """
+        Static evaluation of the position from the point of view of color.
+        """
+        if color == BLACK:
+            return self.eval_score
+        return -self.eval_score
+
+    def win_probability(self, color):
+        """
+        Map the static evaluation to an estimated win probability for color.
+        """
+        x = self.evaluate(color) / EVAL_SCALE
+        if x < -50:
+            return 0.0
+        if x > 50:
+            return 1.0
+        return 1.0 / (1.0 + math.exp(-x))
+
     def is_eye(self, point, color):
         """
         Check if point is a simple eye for color
@@ -266,6 +540,7 @@ class SimpleGoBoard(object):
         assert is_black_white(color)
         # Special cases
         if point == PASS:
+            self.version += 1
             self.ko_recapture = None
             self.current_player = GoBoardUtil.opponent(color)
             return True
@@ -295,6 +570,7 @@ class SimpleGoBoard(object):
         if in_enemy_eye and len(single_captures) == 1:
             self.ko_recapture = single_captures[0]
         self.current_player = GoBoardUtil.opponent(color)
+        self.version += 1
         return True
 
     def neighbors_of_color(self, point, color):
@@ -357,9 +633,13 @@ class SimpleGoBoard(object):
         if self.board[point] != EMPTY:
             return False
         self.board[point] = color
+        self._add_to_windows(point, color)
+        if self.line_codes is not None:
+            self._update_line_codes(point, color)
         self.moves.append(point)
         self.last_move = point
         self.current_player = GoBoardUtil.opponent(color)
+        self.version += 1
         return True
         
     def _point_direction_check_connect_gomoko(self, point, shift):
@@ -417,18 +697,13 @@ class SimpleGoBoard(object):
     def check_game_end_gomoku(self):
         """
             Check if the game ends for the game of Gomoku.
+            A completed five shows up as a window holding five stones,
+            so this is a constant time lookup in the pattern counts.
             """
-        white_points = where1d(self.board == WHITE)
-        black_points = where1d(self.board == BLACK)
-        
-        for point in white_points:
-            if self.point_check_game_end_gomoku(point):
-                return True, WHITE
-    
-        for point in black_points:
-            if self.point_check_game_end_gomoku(point):
-                return True, BLACK
-
+        if self.pattern_counts[WHITE][5]:
+            return True, WHITE
+        if self.pattern_counts[BLACK][5]:
+            return True, BLACK
         return False, None
 
 
@@ -458,31 +733,40 @@ class SimpleGoBoard(object):
     def undoMove(self):
         location = self.moves.pop()
         self.last_move = location
+        color = int(self.board[location])
+        self._remove_from_windows(location, color)
+        if self.line_codes is not None:
+            self._update_line_codes(location, -color)
         self.board[location] = EMPTY
         self.current_player = GoBoardUtil.opponent(self.current_player)
+        self.version += 1
 
-    def simulate(self):
+    def simulate(self, rng=None):
         i = 0
         if not self.endOfGame():
-            allMoves = self.legalMoves()
-            random.shuffle(allMoves)
-            while not self.endOfGame() and i < len(allMoves):
+            allMoves = (rng or default_rng()).shuffled(self.get_empty_points())
+            while not self.endOfGame() and not self.is_dead_position() \
+                  and i < len(allMoves):
                 self.play_move_gomoku(allMoves[i],self.current_player)
                 i += 1
+        SimpleGoBoard.num_playouts += 1
+        SimpleGoBoard.num_playout_moves += i
         win,winner = self.check_game_end_gomoku()
         if win:
             return winner,i
         return EMPTY, i
 
 
-    def mysimulate(self,color):
+    def mysimulate(self,color,rng=None):
         i = 0
         if not self.endOfGame():
-            allMoves = self.legalMoves()
-            random.shuffle(allMoves)
-            while not self.endOfGame() and i < len(allMoves):
+            allMoves = (rng or default_rng()).shuffled(self.get_empty_points())
+            while not self.endOfGame() and not self.is_dead_position() \
+                  and i < len(allMoves):
                 self.play_move_gomoku(allMoves[i],self.current_player)
                 i += 1
+        SimpleGoBoard.num_playouts += 1
+        SimpleGoBoard.num_playout_moves += i
         win,winner = self.check_game_end_gomoku()
         if win:
             if winner == color:
@@ -491,6 +775,37 @@ class SimpleGoBoard(object):
                 return -1
         return 0
 
+    def cutoff_simulate(self, color, cutoff, rng=None):
+        """
+        Random playout truncated after cutoff moves.
+        Returns 1 or -1 if the game was decided for or against color,
+        otherwise the static evaluation mapped to [-1, 1].
+        """
+        win, winner = self.check_game_end_gomoku()
+        dead = self.is_dead_position()
+        i = 0
+        if not win and not dead:
+            allMoves = (rng or default_rng()).shuffled(self.get_empty_points())
+            counts = self.pattern_counts
+            limit = min(cutoff, len(allMoves))
+            while i < limit:
+                player = self.current_player
+                self.play_move_gomoku(allMoves[i], player)
+                i += 1
+                if counts[player][5]:
+                    win, winner = True, player
+                    break
+                if self.is_dead_position():
+                    dead = True
+                    break
+        SimpleGoBoard.num_playouts += 1
+        SimpleGoBoard.num_playout_moves += i
+        if dead:
+            return 0
+        if win:
+            return 1 if winner == color else -1
+        return 2.0 * self.win_probability(color) - 1.0
+
     def count(self,point,otherpoint,step):
 
         if self.get_color(point) != self.get_color(otherpoint):
@@ -0,0 +1,160 @@
+"""
+size_tables.py
+Tables of a board size, built once per process.
+
+Boards and GTP connections need the on-board neighbors of every point,
+the five-point windows of the static evaluator, the GTP names of the
+points and the cells of the line patterns of the playout policy. They
+only depend on the size. They are built the first time a size is
+used and shared by all boards of that size. Building them takes 5 to
+20 milliseconds; if $GOMOKU_CACHE_DIR is set, the tables are also
+stored there with marshal and later processes load them from there.
+Nothing is written to disk otherwise.
+"""
+import marshal
+import os
+import sys
+
+# increase when the content of the tables changes
+TABLES_VERSION = 2
+
+"""
+Offsets along a line of the cells of a line pattern, see pattern_policy.
+Cell i of a pattern is digit i of its base 4 code.
+"""
+LINE_OFFSETS = (-4, -3, -2, -1, 1, 2, 3, 4)
+OCCUPIED = 4 ** len(LINE_OFFSETS)
+
+_tables = {}
+
+def cache_dir():
+    """ Table cache: $GOMOKU_CACHE_DIR, None if it is not set """
+    return os.environ.get("GOMOKU_CACHE_DIR") or None
+
+def cache_path(size):
+    return os.path.join(cache_dir(), "tables-{}-v{}.{}.marshal".format(
+        size, TABLES_VERSION, sys.implementation.cache_tag))
+
+def tables(size):
+    """
+    Return the tables of a board of given size as a dict:
+    neighbors[point] the list of on-board neighbors of point,
+    windows the five-point lines on the board,
+    point_windows[point] the indices of the windows containing point,
+    point_to_move and move_to_point the GTP names of the points,
+    see gtp_connection.point_tables,
+    line_codes the line pattern codes of the empty board, with index
+    d * maxpoint + point for direction d,
+    line_updates[point] the (index, unit, other point) triples of the
+    line pattern codes that contain point, unit being its digit value,
+    and of the codes of point itself with unit OCCUPIED, so that the
+    codes of occupied points are at least OCCUPIED.
+    """
+    if size in _tables:
+        return _tables[size]
+    if cache_dir() is None:
+        result = build_tables(size)
+    else:
+        path = cache_path(size)
+        result = _load(path, size)
+        if result is None:
+            result = build_tables(size)
+            _store(path, result)
+    _tables[size] = result
+    return result
+
+def _load(path, size):
+    try:
+        with open(path, "rb") as f:
+            result = marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if not isinstance(result, dict) or result.get("size") != size:
+        return None
+    return result
+
+def _store(path, result):
+    """ Write the tables, ignoring a cache that cannot be written """
+    temp = "{}.{}.tmp".format(path, os.getpid())
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(temp, "wb") as f:
+            marshal.dump(result, f)
+        os.replace(temp, path)
+    except OSError:
+        try:
+            os.remove(temp)
+        except OSError:
+            pass
+
+def build_tables(size):
+    """ Compute the tables of a board size, see tables() """
+    from gtp_connection import format_point
+    from board_util import BORDER
+    NS = size + 1
+    maxpoint = size * size + 3 * (size + 1)
+
+    def on_board(point):
+        row, col = divmod(point, NS)
+        return 1 <= row <= size and 1 <= col <= size
+
+    neighbors = []
+    for point in range(maxpoint):
+        if on_board(point):
+            neighbors.append([nb for nb in (point - 1, point + 1,
+                                            point - NS, point + NS)
+                              if on_board(nb)])
+        else:
+            neighbors.append([])
+
+    windows = []
+    for row in range(1, size + 1):
+        for col in range(1, size + 1):
+            for drow, dcol in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                end_row = row + 4 * drow
+                end_col = col + 4 * dcol
+                if end_row > size or not 1 <= end_col <= size:
+                    continue
+                windows.append(tuple(NS * (row + i * drow) + col + i * dcol
+                                     for i in range(5)))
+    point_windows = [[] for _ in range(maxpoint)]
+    for index, window in enumerate(windows):
+        for point in window:
+            point_windows[point].append(index)
+    point_windows = [tuple(w) for w in point_windows]
+
+    point_to_move = {}
+    for row in range(1, size + 1):
+        for col in range(1, size + 1):
+            point_to_move[NS * row + col] = format_point((row, col))
+    move_to_point = dict((name.lower(), point)
+                         for point, name in point_to_move.items())
+
+    # directions in the order of threats.DIRECTIONS
+    line_codes = [0] * (4 * maxpoint)
+    line_updates = [[] for _ in range(maxpoint)]
+    for d, (drow, dcol) in enumerate(((0, 1), (1, 0), (1, -1), (1, 1))):
+        for point in range(maxpoint):
+            if not on_board(point):
+                continue
+            row, col = divmod(point, NS)
+            index = d * maxpoint + point
+            line_updates[point].append((index, OCCUPIED, point))
+            for digit, k in enumerate(LINE_OFFSETS):
+                unit = 4 ** digit
+                other = NS * (row + k * drow) + col + k * dcol
+                if 1 <= row + k * drow <= size and \
+                   1 <= col + k * dcol <= size:
+                    line_updates[other].append((index, unit, point))
+                else:
+                    line_codes[index] += BORDER * unit
+    return {
+        "size": size,
+        "neighbors": neighbors,
+        "windows": windows,
+        "point_windows": point_windows,
+        "point_to_move": point_to_move,
+        "move_to_point": move_to_point,
+        "line_codes": line_codes,
+        "line_updates": line_updates,
+    }
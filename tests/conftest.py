@@ -0,0 +1,19 @@
+"""
+The modules of the engine live at the top of the repository and import
+each other by name, so the tests run with it on the path. Caches that
+the engine can keep on disk are pointed at a temporary directory, so
+that the tests never write under $HOME.
+"""
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_cache = tempfile.mkdtemp(prefix="gomoku-tests-")
+os.environ["GOMOKU_CACHE_DIR"] = os.path.join(_cache, "tables")
+os.environ["GOMOKU_PROVEN_DB"] = os.path.join(_cache, "proven.sqlite")
+
+def pytest_unconfigure(config):
+    shutil.rmtree(_cache, ignore_errors=True)
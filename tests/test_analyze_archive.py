@@ -0,0 +1,32 @@
+import json
+
+import pytest
+
+from analyze_archive import analyze_archive, iter_items, parse_game
+
+def test_parse_game():
+    size, moves = parse_game("(;GM[4]SZ[9];B[ee];W[dd];B[])")
+    assert size == 9
+    assert moves == [(1, (5, 5)), (2, (6, 4))]
+
+@pytest.mark.parametrize("text", ["(;SZ[30];B[aa])", "(;SZ[5];B[aa])",
+                                  "(;SZ[x];B[aa])", "(;SZ[9];B[zz])",
+                                  "(;SZ[9]AB[aa];W[bb])"])
+def test_malformed_games_raise_value_error(text):
+    with pytest.raises(ValueError) as error:
+        parse_game(text)
+    assert str(error.value)
+
+def test_bad_size_is_an_error_item(tmp_path):
+    archive = tmp_path / "games.sgf"
+    archive.write_text("(;GM[4]SZ[30];B[aa];W[bb])\n"
+                       "(;GM[4]SZ[9];B[ee];W[dd];B[ef])\n")
+    items = list(iter_items([str(archive)]))
+    assert "not in 7.." in items[0]["error"]
+    assert [item["move"] for item in items[1:]] == [0, 1, 2]
+    output = tmp_path / "out.jsonl"
+    analyze_archive([str(archive)], str(output), playouts=10, parallel=1)
+    results = [json.loads(line) for line in output.read_text().splitlines()]
+    assert len(results) == 4
+    assert "error" in results[0]
+    assert all("error" not in result for result in results[1:])
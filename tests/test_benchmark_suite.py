@@ -0,0 +1,27 @@
+import json
+
+from benchmarks import suite
+
+def metric(value, better, spread=0.0):
+    return {"value": value, "unit": "ms", "better": better, "spread": spread}
+
+def test_compare_uses_tolerance():
+    baseline = {"a": metric(10.0, "lower"), "b": metric(100.0, "higher")}
+    metrics = {"a": metric(12.0, "lower"), "b": metric(70.0, "higher")}
+    assert [r[0] for r in suite.compare(metrics, baseline, 0.25)] == ["b"]
+
+def test_compare_allows_noise_of_both_runs():
+    baseline = {"a": metric(10.0, "lower", spread=0.3)}
+    metrics = {"a": metric(15.0, "lower", spread=0.3)}
+    assert suite.compare(metrics, baseline, 0.25) == []
+    metrics = {"a": metric(17.0, "lower", spread=0.3)}
+    assert len(suite.compare(metrics, baseline, 0.25)) == 1
+
+def test_quick_mismatch_is_refused(tmp_path, capsys, monkeypatch):
+    path = tmp_path / "baseline.json"
+    path.write_text(json.dumps({"quick": False, "metrics": {}}))
+    def fail(*args):
+        raise AssertionError("suite ran against a mismatched baseline")
+    monkeypatch.setattr(suite, "run_suite", fail)
+    assert suite.main(["--quick", "--baseline", str(path)]) == 2
+    assert "without --quick" in capsys.readouterr().out
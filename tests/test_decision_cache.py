@@ -0,0 +1,94 @@
+import io
+
+import pytest
+
+from decision_cache import DecisionCache, Decision
+
+def decision(move, simulations):
+    return Decision(move, simulations, simulations // 2, 0.6)
+
+def test_lookup_needs_threshold():
+    cache = DecisionCache(4, min_simulations=100)
+    cache.put(7, 1, 1, decision(10, 99))
+    assert cache.get(7, 1, 1) is None
+    cache.put(7, 1, 1, decision(11, 100))
+    assert cache.get(7, 1, 1).move == 11
+    assert cache.get(7, 1, 2) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+def test_longer_search_is_kept():
+    cache = DecisionCache(4, min_simulations=0)
+    cache.put(7, 1, 1, decision(10, 500))
+    cache.put(7, 1, 1, decision(11, 200))
+    assert cache.get(7, 1, 1).move == 10
+
+def test_least_recently_used_is_evicted():
+    cache = DecisionCache(2, min_simulations=0)
+    cache.put(7, 1, 1, decision(1, 10))
+    cache.put(7, 2, 1, decision(2, 10))
+    cache.get(7, 1, 1)
+    cache.put(7, 3, 1, decision(3, 10))
+    assert len(cache) == 2
+    assert cache.evictions == 1
+    assert cache.get(7, 2, 1) is None
+    assert cache.get(7, 1, 1).move == 1
+
+def test_zero_capacity_stores_nothing():
+    cache = DecisionCache(0, min_simulations=0)
+    cache.put(7, 1, 1, decision(1, 10))
+    assert len(cache) == 0
+
+def test_negative_capacity_is_rejected():
+    with pytest.raises(ValueError):
+        DecisionCache(-1)
+
+def make_connection():
+    from Gomoku4 import SimulationPlayer
+    from gtp_connection import GtpConnection
+    from simple_board import SimpleGoBoard
+    connection = GtpConnection(SimulationPlayer(), SimpleGoBoard(7),
+                               outfile=io.StringIO())
+    connection.playout_limit_cmd(["30"])
+    connection.decision_cache_threshold_cmd(["10"])
+    return connection
+
+def search_and_repeat(connection):
+    """ genmove on a position, undo it and ask again; the stop reasons """
+    connection.clear_board_cmd([])
+    connection.play_cmd(["b", "d4"])
+    connection.genmove_cmd(["w"])
+    first = connection.stop_reason
+    connection.board.undoMove()
+    connection.genmove_cmd(["w"])
+    return first, connection.stop_reason
+
+def test_repeated_position_is_answered_from_cache():
+    connection = make_connection()
+    assert search_and_repeat(connection) == ("budget", "cached")
+    assert connection.go_engine.last_info is None
+    stats = connection.engine_stats()
+    assert stats["decision_hits"] == 1
+
+def test_bad_capacity_is_an_error():
+    connection = make_connection()
+    for value in ("-1", "x"):
+        connection.get_cmd("decision_cache {}\n".format(value))
+    assert connection.outfile.getvalue().count("? capacity") == 2
+    assert search_and_repeat(connection) == ("budget", "cached")
+
+def test_threshold_survives_cache_off():
+    connection = make_connection()
+    connection.decision_cache_cmd(["off"])
+    connection.decision_cache_threshold_cmd(["100000"])
+    connection.decision_cache_cmd(["16"])
+    assert connection.decisions.min_simulations == 100000
+    assert search_and_repeat(connection) == ("budget", "budget")
+
+@pytest.mark.parametrize("command", ["playout_cutoff 5", "playout_limit 40",
+                                     "playout_patterns off"])
+def test_search_settings_clear_cache(command):
+    connection = make_connection()
+    search_and_repeat(connection)
+    assert len(connection.decisions) == 1
+    connection.get_cmd(command + "\n")
+    assert len(connection.decisions) == 0
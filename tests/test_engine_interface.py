@@ -0,0 +1,75 @@
+import io
+import time
+
+import pytest
+
+from board_util import BLACK, WHITE, EMPTY, MAXSIZE
+from Gomoku4 import SimulationPlayer
+from gtp_connection import GtpConnection, point_tables, format_point, \
+    move_to_coord, point_to_coord
+from simple_board import SimpleGoBoard
+
+@pytest.mark.parametrize("size", [5, 7, 15, MAXSIZE])
+def test_point_tables_match_coordinates(size):
+    point_to_move, move_to_point = point_tables(size)
+    board = SimpleGoBoard(size)
+    points = [int(point) for point in board.grid_points()]
+    assert sorted(point_to_move) == points
+    assert len(move_to_point) == size * size
+    for point in points:
+        name = point_to_move[point]
+        assert name == format_point(point_to_coord(point, size))
+        assert move_to_point[name.lower()] == point
+        assert board.pt(*move_to_coord(name, size)) == point
+
+def make_connection():
+    connection = GtpConnection(SimulationPlayer(), SimpleGoBoard(7),
+                               outfile=io.StringIO())
+    connection.decision_cache_cmd(["off"])
+    connection.playout_limit_cmd(["20"])
+    return connection
+
+def test_play_converts_names_to_points():
+    connection = make_connection()
+    connection.play_cmd(["b", "C5"])
+    assert connection.board.get_color(connection.board.pt(5, 3)) == BLACK
+    assert connection.board.moves == [connection.board.pt(5, 3)]
+
+def test_engine_gets_and_returns_board_points(monkeypatch):
+    connection = make_connection()
+    connection.play_cmd(["b", "d4"])
+    connection.play_cmd(["w", "c3"])
+    engine = connection.go_engine
+    calls = []
+    search = engine.genmove
+    def spy(moves, state, color, deadline=None):
+        calls.append((list(moves), color))
+        return search(moves, state, color, deadline)
+    monkeypatch.setattr(engine, "genmove", spy)
+    connection.outfile.seek(0)
+    connection.outfile.truncate()
+    connection.genmove_cmd(["b"])
+    (moves, color), = calls
+    assert color == BLACK
+    board = connection.board
+    played = board.moves[-1]
+    assert played in moves
+    for point in moves:
+        assert isinstance(point, int) or hasattr(point, "__index__")
+        assert point in connection.point_to_move
+    # all candidates were empty when the search started
+    assert all(board.get_color(point) == EMPTY
+               for point in moves if point != played)
+    name = connection.outfile.getvalue().split()[1]
+    assert connection.move_to_point[name.lower()] == played
+
+def test_listing_commands_use_names():
+    connection = make_connection()
+    connection.play_cmd(["b", "a1"])
+    connection.outfile.seek(0)
+    connection.outfile.truncate()
+    connection.get_cmd("gogui-rules_legal_moves\n")
+    names = connection.outfile.getvalue()[2:].split()
+    assert len(names) == 48
+    assert "A1" not in names
+    assert names == sorted(names)
@@ -0,0 +1,66 @@
+import io
+import json
+
+import gtp_connection as gtp
+
+from Gomoku4 import SimulationPlayer
+from gtp_connection import GtpConnection
+from simple_board import SimpleGoBoard
+
+def make_connection():
+    connection = GtpConnection(SimulationPlayer(), SimpleGoBoard(7),
+                               outfile=io.StringIO())
+    for command in ("decision_cache off", "playout_limit 30",
+                    "play b d4", "play w c3"):
+        connection.get_cmd(command + "\n")
+    return connection
+
+def test_counters_follow_genmoves():
+    connection = make_connection()
+    before = connection.engine_stats()
+    assert before["commands"] == 4
+    assert before["genmoves"] == 0
+    connection.get_cmd("genmove b\n")
+    after = connection.engine_stats()
+    assert after["commands"] == 5
+    assert after["genmoves"] == 1
+    assert after["stop_reason"] == "budget"
+    assert after["last_simulations"] == 30
+    assert after["simulations"] - before["simulations"] == 30
+    assert after["playouts"] - before["playouts"] >= 30
+    assert after["policy_moves_calls"] == 1
+    assert after["genmove_time"] > 0
+    connection.get_cmd("genmove w\n")
+    again = connection.engine_stats()
+    assert again["genmoves"] == 2
+    assert again["simulations"] - after["simulations"] == 30
+
+def test_engine_stats_command_lists_the_counters():
+    connection = make_connection()
+    connection.get_cmd("genmove b\n")
+    stats = connection.engine_stats()
+    connection.outfile.seek(0)
+    connection.outfile.truncate()
+    connection.get_cmd("engine_stats\n")
+    response = connection.outfile.getvalue()
+    assert response.startswith("= ")
+    pairs = dict(line.split("=", 1)
+                 for line in response[2:].strip().splitlines())
+    assert list(pairs) == list(stats)
+    assert int(pairs["last_simulations"]) == 30
+
+def test_stats_json_after_each_genmove(monkeypatch):
+    err = io.StringIO()
+    monkeypatch.setattr(gtp, "stderr", err)
+    connection = make_connection()
+    connection.get_cmd("engine_stats_json on\n")
+    connection.get_cmd("genmove b\n")
+    lines = err.getvalue().strip().splitlines()
+    stats = json.loads(lines[-1])
+    assert stats["genmoves"] == 1
+    assert stats["last_simulations"] == 30
+    connection.get_cmd("engine_stats_json off\n")
+    err.seek(0)
+    err.truncate()
+    connection.get_cmd("genmove w\n")
+    assert "genmoves" not in err.getvalue()
@@ -0,0 +1,38 @@
+import io
+
+from Gomoku4 import SimulationPlayer
+from gtp_connection import GtpConnection
+from simple_board import SimpleGoBoard
+
+def make_connection():
+    connection = GtpConnection(SimulationPlayer(), SimpleGoBoard(7),
+                               outfile=io.StringIO())
+    connection.decision_cache_cmd(["off"])
+    connection.playout_limit_cmd(["20"])
+    connection.play_cmd(["b", "d4"])
+    connection.outfile.seek(0)
+    connection.outfile.truncate()
+    return connection
+
+def test_failed_search_plays_a_legal_move(monkeypatch):
+    connection = make_connection()
+    def broken(*args, **kwargs):
+        raise RuntimeError("search broke")
+    monkeypatch.setattr(connection.go_engine, "genmove", broken)
+    connection.get_cmd("genmove w\n")
+    response = connection.outfile.getvalue()
+    assert response.startswith("= ")
+    assert connection.board.moveNumber() == 2
+    assert connection.stop_reason == "error"
+
+def test_failed_search_keeps_connection_usable(monkeypatch):
+    connection = make_connection()
+    monkeypatch.setattr(connection, "policy_moves",
+                        lambda: 1 / 0)
+    connection.get_cmd("genmove w\n")
+    monkeypatch.undo()
+    connection.get_cmd("genmove b\n")
+    lines = [line for line in connection.outfile.getvalue().splitlines()
+             if line]
+    assert all(line.startswith("= ") for line in lines)
+    assert connection.board.moveNumber() == 3
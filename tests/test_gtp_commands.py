@@ -0,0 +1,56 @@
+import io
+
+import pytest
+
+from Gomoku4 import SimulationPlayer
+from gtp_connection import GtpConnection
+from simple_board import SimpleGoBoard
+
+def make_connection():
+    return GtpConnection(SimulationPlayer(), SimpleGoBoard(7),
+                         outfile=io.StringIO())
+
+def ask(connection, command):
+    connection.outfile.seek(0)
+    connection.outfile.truncate()
+    connection.get_cmd(command + "\n")
+    return connection.outfile.getvalue()
+
+@pytest.mark.parametrize("command", [
+    "playout_cutoff abc", "playout_cutoff -1",
+    "random_seed x", "random_seed -3",
+    "analyze_interval x", "analyze_interval 0", "analyze_interval -1",
+    "analyze_interval nan", "analyze_interval inf",
+    "playout_limit x", "playout_limit -5",
+    "timelimit x", "timelimit 0",
+])
+def test_bad_argument_is_a_gtp_error(command):
+    connection = make_connection()
+    assert ask(connection, command).startswith("? ")
+    assert ask(connection, "name").startswith("= ")
+
+def test_playout_cutoff_values():
+    connection = make_connection()
+    assert ask(connection, "playout_cutoff 0") == "= \n\n"
+    assert connection.go_engine.playout_cutoff == 0
+    assert ask(connection, "playout_cutoff 12") == "= \n\n"
+    assert connection.go_engine.playout_cutoff == 12
+    assert ask(connection, "playout_cutoff auto") == "= \n\n"
+    assert connection.go_engine.playout_cutoff is None
+
+def test_random_seed_repeats_search():
+    moves = []
+    for _ in range(2):
+        connection = make_connection()
+        ask(connection, "playout_limit 30")
+        ask(connection, "decision_cache off")
+        assert ask(connection, "random_seed 7") == "= \n\n"
+        ask(connection, "play b d4")
+        ask(connection, "play w c3")
+        moves.append(ask(connection, "genmove b"))
+    assert moves[0] == moves[1]
+
+def test_analyze_interval_is_set():
+    connection = make_connection()
+    assert ask(connection, "analyze_interval 0.25").startswith("= ")
+    assert connection.go_engine.report_interval == 0.25
@@ -0,0 +1,95 @@
+import io
+import os
+import threading
+
+import pytest
+
+import gtp_connection
+from Gomoku4 import SimulationPlayer
+from gtp_connection import GtpConnection
+from simple_board import SimpleGoBoard
+
+class RecordingOutput(io.StringIO):
+    """ Output stream remembering what was written at every flush """
+
+    def __init__(self):
+        io.StringIO.__init__(self)
+        self.flushed = []
+        self.flush_event = threading.Event()
+
+    def flush(self):
+        self.flushed.append(self.getvalue())
+        self.flush_event.set()
+
+class PipeInput(object):
+    """ stdin reading from the read end of a pipe """
+
+    def __init__(self, fd):
+        self.fd = fd
+
+    def fileno(self):
+        return self.fd
+
+@pytest.fixture
+def session(monkeypatch):
+    """ (connection, write, close) with the reader running in a thread """
+    read_fd, write_fd = os.pipe()
+    monkeypatch.setattr(gtp_connection, "stdin", PipeInput(read_fd))
+    output = RecordingOutput()
+    connection = GtpConnection(SimulationPlayer(), SimpleGoBoard(7),
+                               outfile=output)
+    thread = threading.Thread(target=connection.start_connection)
+    thread.start()
+    def write(data):
+        os.write(write_fd, data)
+    def close():
+        os.close(write_fd)
+        thread.join(10)
+        assert not thread.is_alive()
+    yield connection, write, close
+    if thread.is_alive():
+        close()
+    os.close(read_fd)
+
+def responses(text):
+    return [block for block in text.split("\n\n") if block]
+
+def wait_for_flush(output):
+    assert output.flush_event.wait(10)
+    output.flush_event.clear()
+
+def test_commands_split_across_reads(session):
+    connection, write, close = session
+    write(b"name\nvers")
+    wait_for_flush(connection.outfile)
+    write(b"ion\nboardsize 9\nplay b e5\n")
+    close()
+    assert responses(connection.outfile.getvalue()) == [
+        "= " + SimulationPlayer.name, "= " + str(SimulationPlayer.version),
+        "= ", "= "]
+    assert connection.board.size == 9
+
+def test_partial_last_line_at_eof(session):
+    connection, write, close = session
+    write(b"boardsize 9\nname")
+    close()
+    assert responses(connection.outfile.getvalue()) == [
+        "= ", "= " + SimulationPlayer.name]
+
+def test_output_flushed_before_blocking_read(session):
+    connection, write, close = session
+    write(b"name\n")
+    # the reader is now blocked on the pipe, the response must be out
+    wait_for_flush(connection.outfile)
+    assert connection.outfile.flushed[-1] == \
+        "= {}\n\n".format(SimulationPlayer.name)
+    close()
+
+def test_output_flushed_before_long_running_command(session):
+    connection, write, close = session
+    write(b"name\ngenmove b\n")
+    close()
+    name = "= {}\n\n".format(SimulationPlayer.name)
+    # name is answered before genmove starts, not after it
+    assert name in connection.outfile.flushed
+    assert len(responses(connection.outfile.getvalue())) == 2
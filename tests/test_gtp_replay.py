@@ -0,0 +1,63 @@
+import io
+
+import pytest
+
+from Gomoku4 import SimulationPlayer
+from gtp_connection import GtpConnection
+from gtp_replay import latency_table, normalize, replay
+from session_log import read_log
+from simple_board import SimpleGoBoard
+
+SESSION = ["proven_cache off", "decision_cache off", "random_seed 5",
+           "playout_limit 20", "play b d4", "play w c3", "genmove b",
+           "genmove w", "playout_limit x", "showboard", "quit"]
+
+def record_session(path):
+    connection = GtpConnection(SimulationPlayer(), SimpleGoBoard(7),
+                               outfile=io.StringIO())
+    connection.start_recording(str(path))
+    for command in SESSION[:-1]:
+        connection.get_cmd(command + "\n")
+    # quit closes the log before exiting
+    with pytest.raises(SystemExit):
+        connection.get_cmd(SESSION[-1] + "\n")
+
+def test_recorded_session_log(tmp_path):
+    path = tmp_path / "session.log"
+    record_session(path)
+    header, entries = read_log(str(path))
+    assert header["size"] == 7
+    assert header["engine"] == SimulationPlayer().name
+    assert [entry["cmd"] for entry in entries] == SESSION
+    times = [entry["t"] for entry in entries]
+    assert times == sorted(times)
+    assert all(entry["latency"] >= 0 for entry in entries)
+    success, move = normalize(entries[SESSION.index("genmove b")]["response"])
+    assert success and move
+    assert not normalize(entries[SESSION.index("playout_limit x")]["response"])[0]
+
+def test_replay_reproduces_recorded_responses(tmp_path):
+    path = tmp_path / "session.log"
+    record_session(path)
+    header, entries = read_log(str(path))
+    tables, differences = replay(entries, ["inproc"], header["size"])
+    assert differences == []
+    assert tables[0]["genmove"]["count"] == 2
+    assert "quit" not in tables[0]
+
+def test_replay_reports_changed_responses(tmp_path):
+    path = tmp_path / "session.log"
+    record_session(path)
+    header, entries = read_log(str(path))
+    index = SESSION.index("genmove b")
+    entries[index]["response"] = "= a1\n\n"
+    tables, differences = replay(entries, ["inproc"], header["size"])
+    assert [diff["index"] for diff in differences] == [index]
+    assert differences[0]["responses"][0] == (True, "a1")
+
+def test_latency_table_percentiles():
+    table = latency_table({"genmove": [0.004, 0.001, 0.002, 0.003]})
+    row = table["genmove"]
+    assert row["count"] == 4
+    assert row["p50"] == 2.0
+    assert row["p95"] == row["p99"] == row["max"] == 4.0
@@ -0,0 +1,103 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+import gtp_server
+from Gomoku4 import SimulationPlayer
+from gtp_server import GtpSession
+from pattern_policy import PatternPolicy, NUM_CODES
+from simple_board import SimpleGoBoard
+
+class NoEngine(SimulationPlayer):
+    """ Engine class whose engines must not be created """
+
+    def __init__(self):
+        raise AssertionError("a session created an engine")
+
+def board_factory():
+    return SimpleGoBoard(7)
+
+@pytest.fixture
+def pool():
+    """ A pool that runs the searches in a thread of this process """
+    executor = ThreadPoolExecutor(1, initializer=gtp_server._worker_init,
+                                  initargs=(SimulationPlayer, board_factory,
+                                            None))
+    yield executor
+    executor.shutdown()
+
+def run(session, *commands):
+    """ Responses of the commands, one per command """
+    async def send():
+        responses = []
+        for command in commands:
+            await session.run_cmd(command + "\n")
+            responses.append(session.take_output())
+        return responses
+    return asyncio.run(send())
+
+def test_session_has_no_engine():
+    session = GtpSession(NoEngine, board_factory(), None)
+    responses = run(session, "name", "version", "boardsize 9", "play b e5",
+                    "playout_cutoff 5", "playout_limit 30", "random_seed 3",
+                    "analyze_interval 1", "playout_patterns off",
+                    "showboard", "clear_board", "komi 0")
+    assert all(response.startswith("= ") for response in responses)
+    assert responses[0] == "= {}\n\n".format(SimulationPlayer.name)
+
+@pytest.mark.parametrize("command", list(GtpSession.local_engine_commands))
+def test_local_engine_commands_are_errors(command):
+    session = GtpSession(NoEngine, board_factory(), None)
+    argument = {"node_budget": " 100", "playout_workers": " unix:/tmp/x",
+                "shared_workers": " 2", "live_analysis": " text",
+                "profile_start": " x.json"}.get(command, "")
+    response, name = run(session, command + argument, "name")
+    assert response.startswith("? ")
+    assert name.startswith("= ")
+
+def test_bad_seed_is_an_error():
+    session = GtpSession(NoEngine, board_factory(), None)
+    assert run(session, "random_seed x")[0].startswith("? ")
+
+def test_settings_reach_the_pool(pool):
+    session = GtpSession(NoEngine, board_factory(), pool)
+    run(session, "playout_limit 25", "playout_cutoff 4", "decision_cache off",
+        "play b d4", "play w c3")
+    assert run(session, "genmove b")[0].startswith("= ")
+    engine = gtp_server._worker_connection.go_engine
+    assert engine.playout_limit == 25
+    assert engine.playout_cutoff == 4
+    assert engine.last_simulations == 25
+    # a session without settings gets the defaults back
+    other = GtpSession(NoEngine, board_factory(), pool)
+    run(other, "play b d4", "play w c3", "playout_limit 10")
+    run(other, "genmove b")
+    assert engine.playout_cutoff is None
+    assert engine.playout_limit == 10
+
+def test_seed_repeats_search(pool):
+    moves = []
+    for seed in ("5", "5"):
+        session = GtpSession(NoEngine, board_factory(), pool)
+        run(session, "playout_limit 40", "random_seed " + seed,
+            "play b d4", "play w c3")
+        moves.append(run(session, "genmove b")[0])
+        info = gtp_server._worker_connection.go_engine.last_info
+        moves.append([(point, visits) for point, visits, _ in info["moves"]])
+    assert moves[:2] == moves[2:]
+
+def test_patterns_reach_the_pool(pool, tmp_path):
+    factors = np.ones(NUM_CODES)
+    path = str(tmp_path / "patterns.npz")
+    PatternPolicy(factors, threshold=4.0).save(path)
+    session = GtpSession(NoEngine, board_factory(), pool)
+    assert run(session, "playout_patterns " + path)[0] == "= \n\n"
+    assert run(session, "playout_patterns /no/such/file")[0].startswith("? ")
+    run(session, "playout_limit 10", "play b d4")
+    run(session, "genmove w")
+    engine = gtp_server._worker_connection.go_engine
+    assert isinstance(engine.patterns, PatternPolicy)
+    run(session, "playout_patterns off", "genmove b")
+    assert engine.patterns is None
@@ -0,0 +1,14 @@
+import sys
+
+from match_runner import SubprocessEngine
+
+def test_subprocess_engine_runs_without_caches(tmp_path):
+    engine = SubprocessEngine("{} Gomoku4.py --proven-cache {}".format(
+        sys.executable, tmp_path / "proven.sqlite"))
+    try:
+        ok, stats = engine.send("engine_stats")
+        assert ok
+        assert "proven_hits" not in stats
+        assert "decision_hits" not in stats
+    finally:
+        engine.close()
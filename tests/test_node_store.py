@@ -0,0 +1,69 @@
+import io
+
+import numpy as np
+
+from node_store import NodeStore, NO_NODE
+
+def test_advance_keeps_subtree_and_recycles_rest():
+    store = NodeStore(16)
+    a = store.child(store.root, 10)
+    b = store.child(store.root, 11)
+    grandchild = store.child(a, 20)
+    store.update(grandchild, 1.0)
+    store.advance(10)
+    assert store.root == a
+    assert store.parent[a] == NO_NODE
+    assert store.children(a) == [grandchild]
+    assert not store.in_use[b]
+    assert store.num_nodes() == 2
+
+def test_full_store_evicts_least_visited_leaves():
+    store = NodeStore(8, evict_fraction=4)
+    child = store.child(store.root, 1)
+    leaves = [store.child(child, move) for move in range(2, 8)]
+    for visits, leaf in enumerate(leaves):
+        for _ in range(visits):
+            store.update(leaf, 1.0)
+    store.child(child, 99)
+    assert store.evictions == 2
+    moves = sorted(store.move[node] for node in store.children(child))
+    assert moves == [4, 5, 6, 7, 99]
+    assert store.capacity == 8
+
+def test_root_expansion_beyond_budget_grows_store():
+    store = NodeStore(3)
+    children = [store.child(store.root, move) for move in range(10)]
+    assert len(set(children)) == 10
+    assert store.capacity >= 11
+    assert store.growths > 0
+    store.add_stats(np.array(children), np.ones(10, dtype=np.int64),
+                    np.zeros(10))
+    assert store.visits[children].sum() == 10
+
+def make_connection():
+    from Gomoku4 import SimulationPlayer
+    from gtp_connection import GtpConnection
+    from simple_board import SimpleGoBoard
+    return GtpConnection(SimulationPlayer(), SimpleGoBoard(7),
+                         outfile=io.StringIO())
+
+def test_node_budget_command_rejects_too_small_budgets():
+    connection = make_connection()
+    capacity = connection.go_engine.tree.capacity
+    for value in ("1", "3", "-5", "x"):
+        connection.get_cmd("node_budget {}\n".format(value))
+    output = connection.outfile.getvalue()
+    assert output.count("? node budget") == 4
+    assert connection.go_engine.tree.capacity == capacity
+    connection.get_cmd("node_budget 50\n")
+    assert connection.go_engine.tree.capacity == 50
+
+def test_genmove_with_smallest_budget():
+    connection = make_connection()
+    connection.decision_cache_cmd(["off"])
+    connection.playout_limit_cmd(["50"])
+    connection.get_cmd("node_budget 50\n")
+    for move in ("play b d4", "genmove w", "genmove b", "genmove w"):
+        connection.get_cmd(move + "\n")
+    assert "?" not in connection.outfile.getvalue()
+    assert connection.board.moveNumber() == 4
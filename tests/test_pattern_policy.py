@@ -0,0 +1,78 @@
+import io
+import random
+
+import numpy as np
+
+from board_util import BLACK, WHITE
+from pattern_policy import PatternPolicy, NUM_CODES, line_pattern_codes
+from playout_rng import PlayoutRNG
+from simple_board import SimpleGoBoard
+
+def make_policy(seed=0):
+    factors = np.random.default_rng(seed).lognormal(0.0, 1.0, NUM_CODES)
+    factors[0] = 1.0
+    return PatternPolicy(factors, threshold=4.0)
+
+def random_board(size, stones, seed):
+    board = SimpleGoBoard(size)
+    rng = random.Random(seed)
+    points = [int(p) for p in board.get_empty_points()]
+    for i, point in enumerate(rng.sample(points, stones)):
+        board.play_move_gomoku(point, BLACK if i % 2 == 0 else WHITE)
+    return board
+
+def test_incremental_codes_match_recomputed_codes():
+    policy = make_policy()
+    board = random_board(9, 10, 1)
+    board.track_patterns(policy)
+    rng = random.Random(2)
+    for _ in range(20):
+        empty = [int(p) for p in board.get_empty_points()]
+        board.play_move_gomoku(rng.choice(empty), board.current_player)
+    for _ in range(5):
+        board.undoMove()
+    expected = line_pattern_codes(board.stones_grid()[None], BLACK)[0]
+    for point in board.get_empty_points().tolist():
+        row, col = divmod(point, board.NS)
+        codes = [board.line_codes[d * board.maxpoint + point]
+                 for d in range(4)]
+        assert codes == expected[row - 1, col - 1].tolist()
+
+def test_choose_returns_empty_points():
+    policy = make_policy()
+    board = random_board(9, 12, 3)
+    board.track_patterns(policy)
+    rng = PlayoutRNG(1)
+    empties = board.get_empty_points().tolist()
+    for _ in range(200):
+        point = policy.choose(board, board.current_player, empties, rng)
+        assert board.get_color(point) == 0
+
+def test_save_and_load(tmp_path):
+    policy = make_policy()
+    path = str(tmp_path / "patterns.npz")
+    policy.save(path)
+    loaded = PatternPolicy.load(path)
+    assert loaded.threshold == policy.threshold
+    assert np.allclose(loaded.factors, policy.factors, rtol=1e-6)
+
+def test_switching_patterns_off_stops_tracking(tmp_path):
+    from Gomoku4 import SimulationPlayer
+    from gtp_connection import GtpConnection
+    path = str(tmp_path / "patterns.npz")
+    make_policy().save(path)
+    connection = GtpConnection(SimulationPlayer(), SimpleGoBoard(7),
+                               outfile=io.StringIO())
+    connection.decision_cache_cmd(["off"])
+    connection.playout_limit_cmd(["20"])
+    connection.playout_patterns_cmd([path])
+    connection.play_cmd(["b", "d4"])
+    connection.genmove_cmd(["w"])
+    assert connection.board.line_codes is not None
+    connection.playout_patterns_cmd(["off"])
+    assert connection.board.line_codes is None
+    # a board tracked by an earlier search is untracked by genmove
+    connection.board.track_patterns(make_policy())
+    connection.genmove_cmd(["b"])
+    assert connection.board.line_codes is None
+    assert "?" not in connection.outfile.getvalue()
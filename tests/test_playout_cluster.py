@@ -0,0 +1,150 @@
+import json
+import multiprocessing
+import socket
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from Gomoku4 import SimulationPlayer
+from playout_cluster import PlayoutCluster, check_result, run_worker
+from simple_board import SimpleGoBoard
+
+def test_check_result():
+    good = {"visits": [3, 0], "value_sum": [-2.5, 0.0]}
+    assert check_result(good, 2) == ([3, 0], [-2.5, 0.0])
+    assert check_result(good, None) == ([3, 0], [-2.5, 0.0])
+    for visits, value_sum, count in (
+            ([2], [0.0], 2),
+            ([1, 1], [0.0], None),
+            ([-1, 1], [0.0, 0.0], 2),
+            ([1.5, 1], [0.0, 0.0], 2),
+            ([1, 1], [float("nan"), 0.0], 2),
+            ([1, 1], [2.0, 0.0], 2),
+            ("12", [0.0, 0.0], 2)):
+        with pytest.raises(ValueError):
+            check_result({"visits": visits, "value_sum": value_sum}, count)
+
+def test_public_address_needs_token(monkeypatch):
+    monkeypatch.delenv("GOMOKU_CLUSTER_TOKEN", raising=False)
+    with pytest.raises(ValueError):
+        PlayoutCluster("tcp:0.0.0.0:0")
+
+def position():
+    board = SimpleGoBoard(7)
+    for point, color in ((board.pt(4, 4), 1), (board.pt(3, 3), 2)):
+        board.play_move_gomoku(point, color)
+    candidates = [int(p) for p in board.get_empty_points()]
+    return board, candidates
+
+def fake_worker(address, token=None, visits=None):
+    """ Registers, then answers the first batch with the given visits """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(address[len("unix:"):])
+    stream = sock.makefile("rb")
+    register = {"op": "register", "name": "fake", "protocol": 1}
+    if token:
+        register["token"] = token
+    sock.sendall((json.dumps(register) + "\n").encode())
+    for line in stream:
+        message = json.loads(line)
+        if message["op"] == "batch":
+            sock.sendall((json.dumps({
+                "op": "result", "id": message["id"],
+                "search": message["search"], "visits": visits,
+                "value_sum": [0.0] * len(visits)}) + "\n").encode())
+        elif message["op"] == "reject":
+            break
+    sock.close()
+
+def wait_for_workers(cluster, count, timeout=30.0):
+    end = time.time() + timeout
+    while time.time() < end:
+        cluster.poll()
+        if cluster.stats()["cluster_workers"] >= count:
+            return
+        time.sleep(0.05)
+    raise AssertionError("workers did not register")
+
+def test_malformed_result_drops_worker(tmp_path):
+    address = "unix:{}".format(tmp_path / "cluster.sock")
+    cluster = PlayoutCluster(address)
+    thread = threading.Thread(target=fake_worker, args=(address, None, [2]),
+                              daemon=True)
+    thread.start()
+    try:
+        wait_for_workers(cluster, 1)
+        engine = SimulationPlayer()
+        engine.cluster = cluster
+        board, candidates = position()
+        move = engine.genmove(candidates, board, 1,
+                              deadline=time.time() + 0.5)
+        assert move in candidates
+        assert cluster.dropped == 1
+        assert cluster.remote_simulations == 0
+    finally:
+        cluster.close()
+
+def test_wrong_token_is_rejected(tmp_path):
+    address = "unix:{}".format(tmp_path / "cluster.sock")
+    cluster = PlayoutCluster(address, token="secret")
+    thread = threading.Thread(target=fake_worker,
+                              args=(address, "guess", [1]), daemon=True)
+    thread.start()
+    try:
+        end = time.time() + 5
+        while cluster.dropped == 0 and time.time() < end:
+            cluster.poll()
+            time.sleep(0.01)
+        assert cluster.dropped == 1
+        assert cluster.stats()["cluster_workers"] == 0
+    finally:
+        cluster.close()
+
+def test_genmove_meets_deadline_with_slow_and_killed_workers(tmp_path):
+    address = "unix:{}".format(tmp_path / "cluster.sock")
+    cluster = PlayoutCluster(address)
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=run_worker,
+                                 kwargs={"address": address, "name": name,
+                                         "delay": delay, "once": True},
+                                 daemon=True)
+                 for name, delay in (("normal", 0.0), ("slow", 3.0),
+                                     ("killed", 0.0))]
+    for process in processes:
+        process.start()
+    try:
+        wait_for_workers(cluster, 3)
+        engine = SimulationPlayer()
+        engine.cluster = cluster
+        board, candidates = position()
+        killer = threading.Timer(0.3, processes[2].kill)
+        killer.start()
+        start = time.time()
+        move = engine.genmove(candidates, board, 1, deadline=start + 1.5)
+        elapsed = time.time() - start
+        killer.join()
+        assert move in candidates
+        assert elapsed < 1.5 + 0.3
+        assert cluster.remote_simulations > 0
+        assert cluster.dropped >= 1
+    finally:
+        cluster.close()
+        for process in processes:
+            process.kill()
+            process.join()
+
+def test_merge_counts_duplicate_candidates_once():
+    board, candidates = position()
+    engine = SimulationPlayer()
+    engine.reset_tree()
+    tree = engine.tree
+    moves = [candidates[0], candidates[1], candidates[1]]
+    engine.children = np.array([tree.child(tree.root, point)
+                                for point in moves])
+    before = int(tree.visits[engine.children].sum())
+    added = engine._merge_remote([([2, 3, 3], [1.0, -1.0, -1.0])])
+    assert added == 5
+    nodes = np.unique(engine.children)
+    assert int(tree.visits[nodes].sum()) - before == added
@@ -0,0 +1,27 @@
+import numpy as np
+
+from playout_rng import PlayoutRNG, MAX_POOLS, worker_rng
+
+def test_permutations_are_permutations():
+    rng = PlayoutRNG(1)
+    for _ in range(600):
+        assert sorted(rng.permutation(30).tolist()) == list(range(30))
+
+def test_pools_stay_bounded_over_a_game():
+    rng = PlayoutRNG(1)
+    for n in range(361, 0, -1):
+        for _ in range(3):
+            assert sorted(rng.permutation(n).tolist()) == list(range(n))
+        assert len(rng._permutations) <= MAX_POOLS
+
+def test_streams_are_reproducible():
+    a, b = PlayoutRNG(7), PlayoutRNG(7)
+    assert [a.random() for _ in range(600)] == [b.random() for _ in range(600)]
+    assert np.array_equal(a.permutation(50), b.permutation(50))
+    assert worker_rng(3, 1).random() == worker_rng(3, 1).random()
+    assert worker_rng(3, 1).random() != worker_rng(3, 2).random()
+
+def test_randrange_bounds():
+    rng = PlayoutRNG(2)
+    values = [rng.randrange(5) for _ in range(1000)]
+    assert set(values) == set(range(5))
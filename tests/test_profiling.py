@@ -0,0 +1,61 @@
+import io
+import json
+
+from Gomoku4 import SimulationPlayer
+from gtp_connection import GtpConnection
+from simple_board import SimpleGoBoard
+
+def make_connection():
+    connection = GtpConnection(SimulationPlayer(), SimpleGoBoard(7),
+                               outfile=io.StringIO())
+    for command in ("decision_cache off", "playout_limit 20",
+                    "play b d4", "play w c3"):
+        connection.get_cmd(command + "\n")
+    return connection
+
+def ask(connection, command):
+    connection.outfile.seek(0)
+    connection.outfile.truncate()
+    connection.get_cmd(command + "\n")
+    return connection.outfile.getvalue()
+
+def test_move_profile_written_after_genmove(tmp_path):
+    connection = make_connection()
+    prefix = str(tmp_path / "move")
+    assert ask(connection, "profile_start move " + prefix).startswith("=")
+    assert ask(connection, "genmove b").startswith("=")
+    assert connection.tracer is None
+    with open(prefix + ".trace.json") as f:
+        trace = json.load(f)
+    names = {event["name"] for event in trace["traceEvents"]}
+    assert {"genmove", "policy_moves", "selection", "playout"} <= names
+    assert all(event["ph"] == "X" and event["dur"] >= 0
+               for event in trace["traceEvents"])
+    with open(prefix + ".folded") as f:
+        stacks = dict(line.rsplit(" ", 1) for line in f.read().splitlines())
+    assert all(stack.startswith("genmove") for stack in stacks)
+    assert any(stack.endswith(";playout") for stack in stacks)
+    assert all(int(weight) >= 0 for weight in stacks.values())
+
+def test_game_profile_spans_moves_until_stop(tmp_path):
+    connection = make_connection()
+    prefix = str(tmp_path / "game")
+    ask(connection, "profile_start game " + prefix)
+    ask(connection, "genmove b")
+    ask(connection, "genmove w")
+    assert connection.tracer is not None
+    response = ask(connection, "profile_stop")
+    assert response.split() == ["=", prefix + ".trace.json",
+                                prefix + ".folded"]
+    with open(prefix + ".trace.json") as f:
+        trace = json.load(f)
+    genmoves = [event for event in trace["traceEvents"]
+                if event["name"] == "genmove"]
+    assert len(genmoves) == 2
+    assert ask(connection, "profile_stop").strip() == "="
+
+def test_profile_start_rejects_unknown_scope(tmp_path):
+    connection = make_connection()
+    response = ask(connection, "profile_start turn " + str(tmp_path / "x"))
+    assert response.startswith("?")
+    assert connection.tracer is None
@@ -0,0 +1,110 @@
+import io
+import time
+
+from proven_store import ProvenResultStore, WIN, LOSS
+
+def test_round_trip(tmp_path):
+    store = ProvenResultStore(str(tmp_path / "proven.sqlite"))
+    assert store.get(7, 12345, 1) is None
+    store.put(7, 12345, 1, WIN, 17)
+    store.put(7, -5, 2, LOSS, None)
+    store.flush()
+    assert store.get(7, 12345, 1) == (WIN, 17)
+    assert store.get(7, -5, 2) == (LOSS, None)
+    assert store.get(9, 12345, 1) is None
+    assert (store.hits, store.misses, store.writes) == (2, 2, 2)
+    assert store.error is None
+    store.close()
+
+def test_unusable_path_switches_store_off():
+    store = ProvenResultStore("/proc/no-such-dir/proven.sqlite")
+    assert store.get(7, 1, 1) is None
+    assert store.error is not None
+    # later lookups and writes are dropped without touching the disk
+    store.put(7, 1, 1, WIN, 3)
+    store.flush()
+    assert store.get(7, 1, 1) is None
+    assert store.misses == 2
+    store.close()
+
+def test_write_failure_switches_store_off(tmp_path):
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    store = ProvenResultStore(str(blocker / "proven.sqlite"))
+    store.put(7, 1, 1, WIN, 3)
+    store.flush()
+    assert store.error is not None
+    assert store.writes == 0
+    store.close()
+
+def open_four_connection(tmp_path=None):
+    """ Black to move with c5 d5 e5, b5 and f5 make open fours """
+    from Gomoku4 import SimulationPlayer
+    from gtp_connection import GtpConnection
+    from simple_board import SimpleGoBoard
+    connection = GtpConnection(SimulationPlayer(), SimpleGoBoard(9),
+                               outfile=io.StringIO())
+    connection.decision_cache_cmd(["off"])
+    connection.playout_limit_cmd(["20"])
+    if tmp_path is not None:
+        connection.proven_cache_cmd([str(tmp_path / "proven.sqlite")])
+    for move in ("b c5", "w h8", "b d5", "w h1", "b e5", "w a9"):
+        connection.play_cmd(move.split())
+    return connection
+
+def test_open_four_is_proven_without_search(monkeypatch):
+    connection = open_four_connection()
+    assert connection.policy_moves()[0] == "OpenFour "
+    def no_search(*args):
+        raise AssertionError("a proven position was searched")
+    monkeypatch.setattr(connection.go_engine, "genmove", no_search)
+    point = connection.generate_move(1, time.time())
+    assert connection.stop_reason == "proven"
+    assert connection.point_to_move[point] in ("B5", "F5")
+
+def test_prove_win_needs_two_points():
+    connection = open_four_connection()
+    board = connection.board
+    assert connection.prove_win(1, [board.pt(5, 2)]) == board.pt(5, 2)
+    # with f5 taken, b5 and a5 make fours with one winning point each
+    board.play_move_gomoku(board.pt(5, 6), 2)
+    assert connection.prove_win(1, [board.pt(5, 2), board.pt(5, 1)]) is None
+
+def test_prove_win_needs_opponent_without_five():
+    connection = open_four_connection()
+    board = connection.board
+    for col in (1, 2, 3, 4):
+        board.board[board.pt(1, col)] = 2
+    # white completes five before black can
+    assert connection.prove_win(1, [board.pt(5, 2)]) is None
+
+def test_proven_win_is_stored_and_reused(tmp_path, monkeypatch):
+    connection = open_four_connection(tmp_path)
+    point = connection.generate_move(1, time.time())
+    connection.proven.flush()
+    assert connection.proven.writes == 1
+    monkeypatch.setattr(connection, "prove_win", lambda *args: None)
+    assert connection.generate_move(1, time.time()) == point
+    assert connection.stop_reason == "proven"
+    assert connection.proven.hits == 1
+    connection.proven.close()
+
+def test_quiet_positions_do_not_look_up(tmp_path, monkeypatch):
+    connection = open_four_connection(tmp_path)
+    connection.board.undoMove()
+    connection.board.undoMove()
+    assert connection.policy_moves()[0] != "OpenFour "
+    connection.generate_move(connection.board.current_player, time.time())
+    assert connection.proven.hits + connection.proven.misses == 0
+    connection.proven.close()
+
+def test_genmove_survives_unusable_store():
+    connection = open_four_connection()
+    connection.proven_cache_cmd(["/proc/no-such-dir/proven.sqlite"])
+    connection.outfile.seek(0)
+    connection.outfile.truncate()
+    connection.genmove_cmd(["b"])
+    assert "?" not in connection.outfile.getvalue()
+    assert connection.board.moveNumber() == 7
+    assert connection.stop_reason == "proven"
+    assert "proven_error" in connection.engine_stats()
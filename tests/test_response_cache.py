@@ -0,0 +1,87 @@
+import io
+
+import pytest
+
+from Gomoku4 import SimulationPlayer
+from gtp_connection import GtpConnection
+from simple_board import SimpleGoBoard
+
+QUERIES = ["showboard", "gogui-rules_board", "gogui-rules_legal_moves",
+           "gogui-rules_final_result"]
+
+def make_connection():
+    connection = GtpConnection(SimulationPlayer(), SimpleGoBoard(7),
+                               outfile=io.StringIO())
+    connection.decision_cache_cmd(["off"])
+    connection.playout_limit_cmd(["20"])
+    connection.timelimit_cmd(["1"])
+    return connection
+
+def ask(connection, command):
+    connection.outfile.seek(0)
+    connection.outfile.truncate()
+    connection.get_cmd(command + "\n")
+    return connection.outfile.getvalue()
+
+def check_fresh(connection):
+    """ Every query answers the same as when built from scratch """
+    for query in QUERIES:
+        cached = ask(connection, query)
+        connection.response_cache.clear()
+        assert cached == ask(connection, query), query
+
+def test_repeated_query_is_cached():
+    connection = make_connection()
+    first = ask(connection, "gogui-rules_board")
+    assert ask(connection, "gogui-rules_board") == first
+    assert connection.response_cache_hits == 1
+
+@pytest.mark.parametrize("command", ["play b d4", "genmove b",
+                                     "clear_board", "boardsize 9"])
+def test_commands_invalidate(command):
+    connection = make_connection()
+    ask(connection, "play w a1")
+    before = {query: ask(connection, query) for query in QUERIES}
+    ask(connection, command)
+    after = {query: ask(connection, query) for query in QUERIES}
+    assert after["gogui-rules_board"] != before["gogui-rules_board"]
+    assert after["showboard"] != before["showboard"]
+    check_fresh(connection)
+
+def test_undo_invalidates():
+    connection = make_connection()
+    empty = ask(connection, "gogui-rules_board")
+    ask(connection, "play b d4")
+    assert ask(connection, "gogui-rules_board") != empty
+    connection.board.undoMove()
+    assert ask(connection, "gogui-rules_board") == empty
+    check_fresh(connection)
+
+def test_final_result_follows_game_end():
+    connection = make_connection()
+    for col in "abcd":
+        ask(connection, "play b {}1".format(col))
+        ask(connection, "play w {}3".format(col))
+    assert "unknown" in ask(connection, "gogui-rules_final_result")
+    ask(connection, "play b e1")
+    assert "black" in ask(connection, "gogui-rules_final_result")
+
+def test_version_grows_across_reset():
+    connection = make_connection()
+    board = connection.board
+    versions = [board.version]
+    ask(connection, "play b d4")
+    versions.append(board.version)
+    first = ask(connection, "gogui-rules_board")
+    ask(connection, "clear_board")
+    versions.append(board.version)
+    ask(connection, "boardsize 7")
+    versions.append(board.version)
+    ask(connection, "play b d4")
+    versions.append(board.version)
+    assert versions == sorted(set(versions))
+    # the same position after a reset is built again, not served
+    # from before the reset
+    hits = connection.response_cache_hits
+    assert ask(connection, "gogui-rules_board") == first
+    assert connection.response_cache_hits == hits
@@ -0,0 +1,60 @@
+import io
+import time
+
+import pytest
+
+from Gomoku4 import SimulationPlayer
+from gtp_connection import GtpConnection
+from simple_board import SimpleGoBoard
+
+def searched_connection():
+    """ A connection whose engine has the analysis of one search """
+    connection = GtpConnection(SimulationPlayer(), SimpleGoBoard(7),
+                               outfile=io.StringIO())
+    connection.decision_cache_cmd(["16"])
+    connection.decision_cache_threshold_cmd(["0"])
+    connection.playout_limit_cmd(["20"])
+    connection.play_cmd(["b", "d4"])
+    connection.play_cmd(["w", "c3"])
+    connection.generate_move(connection.board.current_player,
+                             time.perf_counter())
+    assert connection.go_engine.last_info is not None
+    return connection
+
+def analysis(connection):
+    connection.outfile.seek(0)
+    connection.outfile.truncate()
+    connection.search_analysis_text_cmd([])
+    return connection.outfile.getvalue().strip()
+
+def test_analysis_after_search():
+    assert analysis(searched_connection()) != "="
+
+@pytest.mark.parametrize("short_cut", ["single", "proven", "win"])
+def test_short_cut_clears_analysis(short_cut, monkeypatch):
+    connection = searched_connection()
+    point = connection.board.pt(1, 1)
+    if short_cut == "single":
+        monkeypatch.setattr(connection, "policy_moves",
+                            lambda: ("Random ", [point]))
+    elif short_cut == "proven":
+        monkeypatch.setattr(connection, "policy_moves",
+                            lambda: ("OpenFour ", [point, point + 1]))
+        monkeypatch.setattr(connection, "prove_win",
+                            lambda color, moves: point)
+    else:
+        monkeypatch.setattr(connection, "policy_moves",
+                            lambda: ("Win ", [point]))
+    connection.decision_cache_cmd(["off"])
+    assert connection.generate_move(connection.board.current_player,
+                                    time.perf_counter()) == point
+    assert connection.go_engine.last_info is None
+    assert analysis(connection) == "="
+
+def test_cached_decision_clears_analysis():
+    connection = searched_connection()
+    color = connection.board.current_player
+    first = connection.go_engine.last_info["best"]
+    assert connection.generate_move(color, time.perf_counter()) == first
+    assert connection.stop_reason == "cached"
+    assert analysis(connection) == "="
@@ -0,0 +1,84 @@
+import io
+import time
+
+import numpy as np
+import pytest
+
+import selfplay_data
+from board_util import BLACK, WHITE, EMPTY
+from Gomoku4 import SimulationPlayer
+from gtp_connection import GtpConnection
+from simple_board import SimpleGoBoard
+
+@pytest.mark.parametrize("size", [5, 7, 9, 15])
+def test_pack_stones_round_trip(size):
+    rng = np.random.RandomState(size)
+    grids = rng.choice([EMPTY, BLACK, WHITE], (6, size, size))
+    packed = selfplay_data.pack_stones(grids)
+    assert packed.shape == (6, (size * size + 3) // 4)
+    assert (selfplay_data.unpack_stones(packed, size) == grids).all()
+
+def test_record_format():
+    dtype = selfplay_data.record_dtype(7)
+    assert dtype.names == ("stones", "to_play", "winner", "move",
+                           "move_number", "game", "visits")
+    assert dtype["stones"].shape == (13,)
+    assert dtype["visits"].shape == (49,)
+    # fixed size, so shards can be memory-mapped
+    assert dtype.itemsize == 13 + 1 + 1 + 2 + 2 + 4 + 2 * 49
+
+def records(size, count, game):
+    result = np.zeros(count, dtype=selfplay_data.record_dtype(size))
+    result["game"] = game
+    result["move_number"] = np.arange(count)
+    result["move"] = np.arange(count) % (size * size)
+    return result
+
+def test_dataset_reads_across_shards(tmp_path):
+    writer = selfplay_data.ShardWriter(str(tmp_path), 7, shard_positions=4)
+    for game, count in enumerate([3, 6, 0, 2]):
+        writer.append(records(7, count, game))
+    writer.close()
+    dataset = selfplay_data.ShardDataset(str(tmp_path))
+    assert len(dataset) == 11
+    assert dataset.index["games"] == 4
+    assert [len(shard) for shard in dataset.shards] == [4, 4, 3]
+    read = dataset.records([10, 0, 4, 3])
+    assert list(read["game"]) == [3, 0, 1, 1]
+    assert list(read["move_number"]) == [1, 0, 1, 0]
+    with pytest.raises(ValueError):
+        selfplay_data.ShardWriter(str(tmp_path), 7)
+
+def test_play_game_records():
+    result = selfplay_data.play_game(3, 7, 30, 5, 2)
+    assert len(result)
+    assert (result["game"] == 3).all()
+    assert (np.diff(result["move_number"].astype(int)) == 1).all()
+    assert result["move_number"][0] == 2
+    assert np.allclose(result["visits"].astype(np.float32).sum(axis=1), 1,
+                       atol=1e-2)
+    grids = selfplay_data.unpack_stones(result["stones"], 7)
+    for grid, move in zip(grids, result["move"]):
+        # the move played was an empty point of the position
+        assert grid.ravel()[move] == EMPTY
+
+def test_duplicate_candidates_are_searched_once(monkeypatch):
+    connection = GtpConnection(SimulationPlayer(), SimpleGoBoard(7),
+                               outfile=io.StringIO())
+    connection.decision_cache_cmd(["off"])
+    connection.playout_limit_cmd(["40"])
+    connection.play_cmd(["b", "d4"])
+    board = connection.board
+    a, b, c = board.pt(1, 1), board.pt(2, 2), board.pt(3, 3)
+    monkeypatch.setattr(connection, "policy_moves",
+                        lambda: ("OpenFour ", [a, b, b, c]))
+    point = connection.generate_move(WHITE, time.time())
+    engine = connection.go_engine
+    assert sorted(engine.moves) == [a, b, c]
+    assert len(engine.last_info["moves"]) == 3
+    distribution = selfplay_data._root_distribution(connection, point, 7)
+    visits = engine.tree.visits[engine.children]
+    assert distribution.sum() == pytest.approx(1)
+    index = selfplay_data._grid_index(b, 7)
+    assert distribution[index] == pytest.approx(
+        visits[list(engine.moves).index(b)] / visits.sum())
@@ -0,0 +1,45 @@
+import io
+import time
+
+import pytest
+
+import Gomoku4
+from Gomoku4 import SimulationPlayer
+from gtp_connection import GtpConnection
+from simple_board import SimpleGoBoard
+
+def make_connection():
+    connection = GtpConnection(SimulationPlayer(), SimpleGoBoard(7),
+                               outfile=io.StringIO())
+    connection.decision_cache_cmd(["off"])
+    return connection
+
+def test_bad_worker_counts_are_errors():
+    connection = make_connection()
+    for value in ("-1", "x"):
+        connection.get_cmd("shared_workers {}\n".format(value))
+    assert connection.outfile.getvalue().count("? worker count") == 2
+    assert connection.go_engine.cluster is None
+
+@pytest.mark.parametrize("argv", [["--shared-workers", "-1"],
+                                  ["--shared-workers", "2",
+                                   "--playout-workers", "unix:/tmp/nowhere"]])
+def test_bad_command_lines_are_rejected(argv):
+    with pytest.raises(SystemExit):
+        Gomoku4.run(argv)
+
+def test_genmove_with_shared_workers():
+    connection = make_connection()
+    connection.shared_workers_cmd(["1"])
+    try:
+        # give the worker time to start before the clock runs
+        time.sleep(2.0)
+        connection.timelimit = 1
+        connection.play_cmd(["b", "d4"])
+        start = time.time()
+        connection.genmove_cmd(["w"])
+        assert time.time() - start < 1.3
+        assert "?" not in connection.outfile.getvalue()
+        assert connection.engine_stats()["shared_simulations"] > 0
+    finally:
+        connection.stop_playout_workers()
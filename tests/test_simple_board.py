@@ -0,0 +1,137 @@
+import io
+
+import numpy as np
+import pytest
+
+from board_util import BLACK, WHITE, EMPTY
+from Gomoku4 import SimulationPlayer
+from gtp_connection import GtpConnection
+from playout_rng import PlayoutRNG
+from simple_board import SimpleGoBoard, PATTERN_WEIGHTS
+
+def recount(board):
+    """
+    window_stones, pattern_counts, live_windows and eval_score of board,
+    counted from scratch over all windows
+    """
+    stones = {BLACK: [], WHITE: []}
+    counts = {BLACK: [0] * 6, WHITE: [0] * 6}
+    live = {BLACK: 0, WHITE: 0}
+    score = 0
+    for window in board.windows:
+        colors = [board.board[point] for point in window]
+        black, white = colors.count(BLACK), colors.count(WHITE)
+        stones[BLACK].append(black)
+        stones[WHITE].append(white)
+        if white == 0:
+            counts[BLACK][black] += 1
+            live[BLACK] += 1
+            score += PATTERN_WEIGHTS[black]
+        if black == 0:
+            counts[WHITE][white] += 1
+            live[WHITE] += 1
+            score -= PATTERN_WEIGHTS[white]
+    return stones, counts, live, score
+
+def check_counts(board):
+    stones, counts, live, score = recount(board)
+    for color in (BLACK, WHITE):
+        assert board.window_stones[color] == stones[color]
+        assert board.pattern_counts[color] == counts[color]
+        assert board.live_windows[color] == live[color]
+    assert board.is_dead_position() == (live[BLACK] == live[WHITE] == 0)
+    assert board.eval_score == score
+    assert board.evaluate(BLACK) == score
+    assert board.evaluate(WHITE) == -score
+
+def has_five(board):
+    """ The scalar game end check over every stone on the board """
+    return any(board.point_check_game_end_gomoku(point)
+               for point in board.grid_points()
+               if board.board[point] != EMPTY)
+
+@pytest.mark.parametrize("size", [7, 9, 15])
+def test_counts_follow_play_and_undo(size):
+    rng = np.random.RandomState(size)
+    for _ in range(3):
+        board = SimpleGoBoard(size)
+        for _ in range(2 * size * size):
+            empty = board.get_empty_points()
+            if len(board.moves) and (not len(empty) or rng.rand() < 0.3):
+                board.undoMove()
+            else:
+                board.play_move_gomoku(int(rng.choice(empty)),
+                                       board.current_player)
+            check_counts(board)
+            assert board.check_game_end_gomoku()[0] == has_five(board)
+        while board.moves:
+            board.undoMove()
+        check_counts(board)
+        assert board.eval_score == 0
+
+def test_copy_keeps_counts():
+    board = SimpleGoBoard(9)
+    for point in (board.pt(5, 5), board.pt(5, 6), board.pt(4, 4)):
+        board.play_move_gomoku(point, board.current_player)
+    copy = board.copy()
+    copy.play_move_gomoku(board.pt(1, 1), copy.current_player)
+    check_counts(board)
+    check_counts(copy)
+
+@pytest.mark.parametrize("cutoff", [1, 3, 8])
+def test_cutoff_simulate_stops_after_cutoff(cutoff):
+    rng = PlayoutRNG(cutoff)
+    for _ in range(10):
+        board = SimpleGoBoard(15)
+        board.play_move_gomoku(board.pt(8, 8), BLACK)
+        before = SimpleGoBoard.num_playout_moves
+        result = board.cutoff_simulate(WHITE, cutoff, rng)
+        # no five can be made in so few moves
+        assert board.moveNumber() == 1 + cutoff
+        assert SimpleGoBoard.num_playout_moves - before == cutoff
+        assert -1 < result < 1
+        check_counts(board)
+
+def test_cutoff_simulate_stops_at_a_win():
+    board = SimpleGoBoard(7)
+    for col in range(1, 5):
+        board.play_move_gomoku(board.pt(1, col), BLACK)
+        board.play_move_gomoku(board.pt(3, col), WHITE)
+    result = board.cutoff_simulate(BLACK, 100, PlayoutRNG(1))
+    assert result in (1, -1)
+    assert board.check_game_end_gomoku()[0]
+    assert has_five(board)
+    # nothing is played after the five
+    board.undoMove()
+    assert not board.check_game_end_gomoku()[0]
+
+def dead_board(empty):
+    """
+    A 7x7 board on which every window holds stones of both colors,
+    with the points in empty left open
+    """
+    board = SimpleGoBoard(7)
+    for row in range(1, 8):
+        for col in range(1, 8):
+            if (row, col) not in empty:
+                color = BLACK if (row // 2 + col) % 2 else WHITE
+                board.play_move_gomoku(board.pt(row, col), color)
+    return board
+
+def test_dead_position_follows_play_and_undo():
+    board = dead_board([(1, 1), (1, 2), (1, 3)])
+    assert board.is_dead_position()
+    assert len(board.get_empty_points()) == 3
+    check_counts(board)
+    for _ in range(10):
+        board.undoMove()
+        check_counts(board)
+    assert not board.is_dead_position()
+
+def test_dead_board_is_a_draw_before_it_is_full():
+    board = dead_board([(1, 1), (1, 2), (1, 3)])
+    connection = GtpConnection(SimulationPlayer(), board,
+                               outfile=io.StringIO())
+    connection.get_cmd("gogui-rules_final_result\n")
+    assert connection.outfile.getvalue() == "= draw\n\n"
+    assert board.simulate(PlayoutRNG(0)) == (EMPTY, 0)
@@ -0,0 +1,21 @@
+import os
+
+import size_tables
+
+def test_no_disk_cache_by_default(monkeypatch, tmp_path):
+    monkeypatch.delenv("GOMOKU_CACHE_DIR", raising=False)
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setattr(size_tables, "_tables", {})
+    tables = size_tables.tables(7)
+    assert tables["size"] == 7
+    assert size_tables.tables(7) is tables
+    assert list(tmp_path.iterdir()) == []
+
+def test_disk_cache_when_asked(monkeypatch, tmp_path):
+    monkeypatch.setenv("GOMOKU_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(size_tables, "_tables", {})
+    built = size_tables.tables(7)
+    assert os.path.exists(size_tables.cache_path(7))
+    monkeypatch.setattr(size_tables, "_tables", {})
+    monkeypatch.setattr(size_tables, "build_tables", None)
+    assert size_tables.tables(7) == built
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+import threats
+from board_util import BLACK, WHITE, EMPTY
+from simple_board import SimpleGoBoard
+
+def random_board(size, stones, seed):
+    rng = np.random.RandomState(seed)
+    board = SimpleGoBoard(size)
+    for index in rng.choice(size * size, stones, replace=False):
+        row, col = divmod(int(index), size)
+        board.board[board.pt(row + 1, col + 1)] = rng.choice([BLACK, WHITE])
+    return board
+
+def scalar_flags(board, color, point, step):
+    """ The scalar checks of SimpleGoBoard, in the order of threats """
+    return [bool(board.five_in_row(point, color, step)),
+            bool(board.OpenFour(point, color, step)),
+            bool(board.BlockOpenFour(point, color, step)),
+            bool(board.OpenThree(point, color, step)),
+            bool(board.DeadFour(point, color, step))]
+
+@pytest.mark.parametrize("size", [7, 9, 15])
+def test_flags_match_scalar_checks(size):
+    for seed in range(20):
+        board = random_board(size, (seed + 1) * size * size // 30, seed)
+        flags = threats.threat_flags(board.stones_grid())[0]
+        steps = [1, board.NS, board.NS - 1, board.NS + 1]
+        for row in range(size):
+            for col in range(size):
+                point = board.pt(row + 1, col + 1)
+                if board.board[point] != EMPTY:
+                    assert not flags[:, :, row, col].any()
+                    continue
+                for d, step in enumerate(steps):
+                    for c, color in enumerate([BLACK, WHITE]):
+                        expected = scalar_flags(board, color, point, step)
+                        assert list(flags[c, :, row, col, d]) == expected, \
+                            (seed, row, col, d, color)
+
+def test_categories_follow_priority():
+    board = SimpleGoBoard(7)
+    for col in range(1, 5):
+        board.board[board.pt(1, col)] = BLACK
+        board.board[board.pt(3, col)] = WHITE
+    categories = threats.move_categories(board.stones_grid(), BLACK)[0]
+    # row 1, column 5 completes five for black
+    assert categories[0, 4, 0] == threats.WIN
+    # row 3, column 5 blocks five of white
+    assert categories[2, 4, 0] == threats.BLOCK_WIN
+    white = threats.move_categories(board.stones_grid(), WHITE)[0]
+    assert white[2, 4, 0] == threats.WIN
+    assert white[0, 4, 0] == threats.BLOCK_WIN
@@ -0,0 +1,110 @@
+import io
+
+import pytest
+
+import gtp_connection
+from board_util import BLACK, WHITE
+from Gomoku4 import SimulationPlayer
+from gtp_connection import GtpConnection
+from simple_board import SimpleGoBoard
+from time_manager import TimeManager, MIN_BUDGET, MAX_MOVES_LEFT, MAX_SHARE
+
+class FakeClock(object):
+    """ time.time that only moves when told to """
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+def test_no_clock_scales_timelimit_by_volatility():
+    manager = TimeManager(margin=0.05)
+    assert manager.allocate(BLACK, 100) is None
+    assert manager.budget(BLACK, 100, "Random ", 10) == pytest.approx(9.95)
+    assert manager.budget(BLACK, 100, "Opening ", 10) == pytest.approx(4.95)
+    assert manager.budget(BLACK, 100, "OpenFour ", 10) == \
+        pytest.approx(2.45)
+    # more volatile positions still get at most the limit
+    assert manager.budget(BLACK, 100, "OpenThree ", 10) == \
+        pytest.approx(9.95)
+    assert manager.budget(BLACK, 100, "unknown", 10) == pytest.approx(9.95)
+
+def test_margin_and_minimum_budget():
+    manager = TimeManager(margin=0.5)
+    assert manager.budget(BLACK, 100, "Random ", 2) == pytest.approx(1.5)
+    assert manager.budget(BLACK, 100, "Random ", 0.2) == MIN_BUDGET
+    assert manager.budget(BLACK, 100, "First Move, ", 1) == MIN_BUDGET
+
+def test_main_time_is_spread_over_moves_left():
+    manager = TimeManager(margin=0.0)
+    manager.set_time_settings(400, 0, 0)
+    planned, maximum = manager.allocate(BLACK, 200)
+    assert planned == pytest.approx(400 / MAX_MOVES_LEFT)
+    assert maximum == pytest.approx(400 * MAX_SHARE)
+    assert manager.budget(BLACK, 200, "Random ", 60) == pytest.approx(10)
+    # the per-move limit still caps the budget
+    assert manager.budget(BLACK, 200, "Random ", 3) == pytest.approx(3)
+    manager.consume(BLACK, 100)
+    assert manager.clock(BLACK) == [300, 0]
+    assert manager.clock(WHITE) == [400, 0]
+    manager.set_time_left(BLACK, 40, 0)
+    assert manager.budget(BLACK, 200, "Random ", 60) == pytest.approx(1)
+
+def test_main_time_then_byo_yomi():
+    manager = TimeManager(margin=0.0)
+    manager.set_time_settings(10, 30, 5)
+    planned, _ = manager.allocate(BLACK, 100)
+    # main time need not last the game, a byo-yomi period follows
+    assert planned == pytest.approx(10 / 40 + 30 / 5)
+    manager.consume(BLACK, 12)
+    assert manager.clock(BLACK) == [30, 5]
+    assert manager.allocate(BLACK, 100) == (6, 6)
+    for _ in range(4):
+        manager.consume(BLACK, 5)
+    assert manager.clock(BLACK) == [10, 1]
+    assert manager.allocate(BLACK, 100) == (10, 10)
+    # the last stone of the period in time starts a new period
+    manager.consume(BLACK, 5)
+    assert manager.clock(BLACK) == [30, 5]
+
+def test_byo_yomi_only():
+    manager = TimeManager()
+    manager.set_time_settings(0, 20, 4)
+    assert manager.clock(WHITE) == [20, 4]
+    # byo-yomi time without stones means no time limit
+    manager.set_time_settings(0, 20, 0)
+    assert not manager.has_clock()
+
+def make_connection(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(gtp_connection.time, "time", clock.time)
+    connection = GtpConnection(SimulationPlayer(), SimpleGoBoard(7),
+                               outfile=io.StringIO())
+    connection.decision_cache_cmd(["off"])
+    return connection, clock
+
+def test_genmove_charges_the_clock(monkeypatch):
+    connection, clock = make_connection(monkeypatch)
+    connection.get_cmd("time_settings 100 0 0\n")
+    def search(color, start):
+        assert start == clock.now
+        clock.now += 3
+        return connection.board.pt(4, 4)
+    monkeypatch.setattr(connection, "generate_move", search)
+    connection.get_cmd("genmove b\n")
+    assert connection.time_manager.clock(BLACK) == [97, 0]
+    assert connection.time_manager.clock(WHITE) == [100, 0]
+
+@pytest.mark.parametrize("category", ["Win ", "BlockWin "])
+def test_instant_categories_do_not_search(monkeypatch, category):
+    connection, clock = make_connection(monkeypatch)
+    point = connection.board.pt(2, 2)
+    monkeypatch.setattr(connection, "policy_moves",
+                        lambda: (category, [point]))
+    def no_budget(*args):
+        raise AssertionError("instant move asked for a budget")
+    monkeypatch.setattr(connection.time_manager, "budget", no_budget)
+    monkeypatch.setattr(connection.go_engine, "genmove", no_budget)
+    assert connection.generate_move(BLACK, clock.now) == point
+    assert connection.stop_reason in ("win", "forced")
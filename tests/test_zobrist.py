@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+import zobrist
+from board_util import BLACK, WHITE, EMPTY
+from simple_board import SimpleGoBoard
+
+def random_board(size, stones, seed):
+    rng = np.random.RandomState(seed)
+    board = SimpleGoBoard(size)
+    for index in rng.choice(size * size, stones, replace=False):
+        row, col = divmod(int(index), size)
+        board.board[board.pt(row + 1, col + 1)] = rng.choice([BLACK, WHITE])
+    return board
+
+def transformed(board, sym):
+    """ board with every stone moved by symmetry sym """
+    maps = zobrist.tables(board.size)[1]
+    image = SimpleGoBoard(board.size)
+    for point in board.grid_points():
+        color = board.board[point]
+        if color != EMPTY:
+            image.board[maps[sym, point]] = color
+    return image
+
+@pytest.mark.parametrize("size", [7, 9, 15])
+def test_hash_is_invariant_under_symmetries(size):
+    for seed in range(5):
+        board = random_board(size, 2 * size, seed)
+        hash_value = zobrist.canonical_hash(board)[0]
+        for sym in range(8):
+            image = transformed(board, sym)
+            assert zobrist.canonical_hash(image)[0] == hash_value
+
+@pytest.mark.parametrize("size", [7, 15])
+def test_points_round_trip(size):
+    board = SimpleGoBoard(size)
+    for sym in range(8):
+        images = set()
+        for point in board.grid_points():
+            canonical = zobrist.to_canonical(int(point), sym, size)
+            assert zobrist.from_canonical(canonical, sym, size) == point
+            images.add(canonical)
+        assert images == set(int(p) for p in board.grid_points())
+
+def test_canonical_move_maps_between_symmetric_boards():
+    board = random_board(9, 12, 1)
+    move = next(int(p) for p in board.grid_points()
+                if board.board[p] == EMPTY)
+    hash_value, sym = zobrist.canonical_hash(board)
+    canonical = zobrist.to_canonical(move, sym, 9)
+    maps = zobrist.tables(9)[1]
+    for other in range(8):
+        image = transformed(board, other)
+        image_hash, image_sym = zobrist.canonical_hash(image)
+        assert image_hash == hash_value
+        point = zobrist.from_canonical(canonical, image_sym, 9)
+        # the same move, seen on the transformed board
+        assert point == maps[other, move]
+
+def test_different_positions_hash_differently():
+    board = SimpleGoBoard(7)
+    empty = zobrist.canonical_hash(board)[0]
+    board.board[board.pt(4, 4)] = BLACK
+    black = zobrist.canonical_hash(board)[0]
+    board.board[board.pt(4, 4)] = WHITE
+    white = zobrist.canonical_hash(board)[0]
+    assert len({empty, black, white}) == 3
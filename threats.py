@@ -0,0 +1,163 @@
+"""
+threats.py
+Vectorized threat classification for stacks of Gomoku boards.
+
+Boards are given as an integer array of shape (B, size, size) holding
+EMPTY, BLACK and WHITE. For every point the line through it is read
+in the four directions of the policy (horizontal, vertical and both
+diagonals) as a window of 13 cells, 6 on each side, with points off
+the board read as BORDER. The windows are strided views of one padded
+copy of the boards, so all boards, points, directions and both colors
+are classified together in a few array operations.
+
+The threats mirror the scalar checks of SimpleGoBoard: five_in_row,
+OpenFour, BlockOpenFour, OpenThree and DeadFour, for a stone of the
+given color on an empty point.
+"""
+from lazy_import import lazy_module
+np = lazy_module("numpy")
+
+from board_util import EMPTY, BLACK, WHITE, BORDER
+
+"""
+(row, column) steps of the four directions, in the order of the
+policy steps 1, NS, NS - 1, NS + 1 of the 1-dimensional board.
+"""
+DIRECTIONS = ((0, 1), (1, 0), (1, -1), (1, 1))
+
+RADIUS = 6
+WINDOW = 2 * RADIUS + 1
+
+"""
+Threat indices of threat_flags.
+BLOCK_OPEN_FOUR is set for color c on the points where the opponent
+of c blocks an open four of c.
+"""
+FIVE, OPEN_FOUR, BLOCK_OPEN_FOUR, OPEN_THREE, DEAD_FOUR = range(5)
+NUM_THREATS = 5
+
+"""
+Move categories of move_categories, in the priority order of the
+policy: for each point and direction the first one that applies,
+from the view of the player to move.
+"""
+NONE, WIN, BLOCK_WIN, MAKE_OPEN_FOUR, BLOCK_OPEN_FOUR_MOVE, MAKE_OPEN_THREE, \
+    BLOCK_OPEN_THREE, MAKE_DEAD_FOUR, BLOCK_DEAD_FOUR = range(9)
+
+def line_windows(boards):
+    """
+    Return the line windows of all points as a read-only array of
+    shape (B, size, size, 4, WINDOW). Cell RADIUS + k of a window is
+    the point k steps away in that direction.
+    """
+    boards = np.asarray(boards, dtype=np.int8)
+    if boards.ndim == 2:
+        boards = boards[None]
+    count, size = boards.shape[0], boards.shape[1]
+    padded = np.pad(boards, ((0, 0), (RADIUS, RADIUS), (RADIUS, RADIUS)),
+                    constant_values=BORDER)
+    s_board, s_row, s_col = padded.strides
+    windows = []
+    for drow, dcol in DIRECTIONS:
+        # the window of (row, col) starts RADIUS steps back
+        start = padded[:, RADIUS - RADIUS * drow:, RADIUS - RADIUS * dcol:]
+        windows.append(np.lib.stride_tricks.as_strided(
+            start, shape=(count, size, size, WINDOW),
+            strides=(s_board, s_row, s_col, drow * s_row + dcol * s_col),
+            writeable=False))
+    return np.stack(windows, axis=3)
+
+def _cell(lines, k):
+    """ The cells k steps from the points """
+    return lines[..., RADIUS + k]
+
+def _run(is_color, ahead):
+    """ Length of the run of color starting next to the points """
+    if ahead:
+        side = is_color[..., RADIUS + 1:]
+    else:
+        side = is_color[..., RADIUS - 1::-1]
+    return np.cumprod(side, axis=-1, dtype=np.int8).sum(axis=-1)
+
+def _after_run(lines, run, ahead):
+    """ The first cell past a run of length run """
+    if ahead:
+        side = lines[..., RADIUS + 1:]
+    else:
+        side = lines[..., RADIUS - 1::-1]
+    index = np.minimum(run, RADIUS - 1)[..., None]
+    return np.take_along_axis(side, index, axis=-1)[..., 0]
+
+def _color_flags(lines, color):
+    """ Threat flags of color, shape (NUM_THREATS, B, size, size, 4) """
+    is_color = lines == color
+    is_empty = lines == EMPTY
+    c = lambda k: is_color[..., RADIUS + k]
+    e = lambda k: is_empty[..., RADIUS + k]
+
+    run_ahead = _run(is_color, True)
+    run_back = _run(is_color, False)
+    total = run_ahead + run_back
+    end_ahead = _after_run(lines, run_ahead, True) == EMPTY
+    end_back = _after_run(lines, run_back, False) == EMPTY
+    four = total == 3
+
+    five = total >= 4
+    open_four_line = four & end_ahead & end_back
+    split_fours = (
+        (c(1) & c(2) & e(3) & c(4) & e(5)) |
+        (c(-1) & c(-2) & e(-3) & c(-4) & e(-5)) |
+        (c(-1) & e(-2) & c(-3) & c(-4) & e(-5)) |
+        (c(1) & e(2) & c(3) & c(4) & e(5)))
+    open_four = open_four_line | split_fours
+    block_open_four = open_four | (
+        (e(1) & c(2) & c(3) & c(4) & e(5) & ~e(6)) |
+        (e(-1) & c(-2) & c(-3) & c(-4) & e(-5) & ~e(-6)) |
+        (~e(-1) & c(1) & c(2) & c(3) & e(4) & e(5)) |
+        (~e(1) & c(-1) & c(-2) & c(-3) & e(-4) & e(-5)))
+    open_three = (
+        (e(-1) & e(3) & c(1) & c(2)) |
+        (e(1) & e(-3) & c(-1) & c(-2)) |
+        (e(-2) & e(2) & c(-1) & c(1)))
+    dead_four = four & (end_ahead ^ end_back)
+    return np.stack([five, open_four, block_open_four, open_three, dead_four])
+
+def threat_flags(boards):
+    """
+    Classify every empty point of every board.
+    Returns a boolean array of shape (B, 2, NUM_THREATS, size, size, 4):
+    board, color (0 for BLACK, 1 for WHITE), threat, row, column and
+    direction. Occupied points have no threats.
+    """
+    lines = line_windows(boards)
+    empty = _cell(lines, 0) == EMPTY
+    flags = np.stack([_color_flags(lines, BLACK), _color_flags(lines, WHITE)])
+    flags = np.moveaxis(flags, 2, 0)
+    flags &= empty[:, None, None]
+    return flags
+
+def move_categories(boards, to_play):
+    """
+    Policy category of every point and direction for the player to
+    move on each board (a color, or one color per board).
+    Returns an int8 array of shape (B, size, size, 4).
+    """
+    flags = threat_flags(boards)
+    to_play = np.broadcast_to(np.asarray(to_play), (flags.shape[0],))
+    me = np.where(to_play == BLACK, 0, 1)
+    index = np.arange(flags.shape[0])
+    mine = flags[index, me]
+    theirs = flags[index, 1 - me]
+    # lowest priority first, so higher priorities overwrite
+    order = [(BLOCK_DEAD_FOUR, theirs[:, DEAD_FOUR]),
+             (MAKE_DEAD_FOUR, mine[:, DEAD_FOUR]),
+             (BLOCK_OPEN_THREE, theirs[:, OPEN_THREE]),
+             (MAKE_OPEN_THREE, mine[:, OPEN_THREE]),
+             (BLOCK_OPEN_FOUR_MOVE, theirs[:, BLOCK_OPEN_FOUR]),
+             (MAKE_OPEN_FOUR, mine[:, OPEN_FOUR]),
+             (BLOCK_WIN, theirs[:, FIVE]),
+             (WIN, mine[:, FIVE])]
+    categories = np.zeros(flags.shape[:1] + flags.shape[3:], dtype=np.int8)
+    for category, flag in order:
+        categories[flag] = category
+    return categories
@@ -0,0 +1,133 @@
+"""
+time_manager.py
+Clock keeping and per-move time allocation for genmove.
+
+Without time_settings the budget of a move starts from the fixed
+per-move limit (timelimit). With a game clock, it is the remaining
+main time spread over the expected number of moves left, or the time
+left in the byo-yomi period spread over its stones. In both cases the
+budget is then scaled by how volatile the position is, judged from the
+category of the policy moves, and never exceeds timelimit, so without
+a clock forcing replies use a fraction of timelimit and other moves
+all of it. A safety margin for I/O is kept.
+"""
+
+# budget factor per policy move category. Forcing replies are
+# cheap, positions with open threes on the board are worth more time.
+VOLATILITY = {
+    "First Move, ": 0.1,
+    "Opening ": 0.5,
+    "OpenFour ": 0.25,
+    "DoubleDeadFour": 0.25,
+    "BlockOpenFour ": 0.25,
+    "BlockDoubleDeadFour ": 0.5,
+    "DeadFourOpenThree ": 0.5,
+    "DoubleOpenThree": 1.5,
+    "BlockDoubleThree": 1.5,
+    "OpenThree ": 1.5,
+    "Random ": 1.0,
+}
+
+# categories played at once, without search
+INSTANT = ("Win ", "BlockWin ")
+
+MIN_MOVES_LEFT = 8
+MAX_MOVES_LEFT = 40
+# never plan more than this share of the remaining main time on a move
+MAX_SHARE = 0.25
+MIN_BUDGET = 0.01
+
+class TimeManager(object):
+
+    def __init__(self, margin=0.05):
+        # seconds kept back from every budget for I/O and GTP overhead
+        self.margin = margin
+        # None while no game clock is set
+        self.main_time = None
+        self.byo_yomi_time = 0.0
+        self.byo_yomi_stones = 0
+        # color -> [seconds, stones]; stones > 0 means byo-yomi
+        self.time_left = {}
+
+    def has_clock(self):
+        return self.main_time is not None
+
+    def set_time_settings(self, main_time, byo_yomi_time, byo_yomi_stones):
+        """
+        GTP time_settings. Byo-yomi time with 0 stones means no limit.
+        Resets both clocks.
+        """
+        if byo_yomi_time > 0 and byo_yomi_stones == 0:
+            self.main_time = None
+            self.time_left = {}
+            return
+        self.main_time = main_time
+        self.byo_yomi_time = byo_yomi_time
+        self.byo_yomi_stones = byo_yomi_stones
+        self.time_left = {}
+
+    def set_time_left(self, color, seconds, stones):
+        """ GTP time_left: the controller's view of the clock of color """
+        self.time_left[color] = [seconds, stones]
+
+    def clock(self, color):
+        """ [seconds, stones] left for color """
+        if color not in self.time_left:
+            if self.main_time > 0 or not self.byo_yomi_stones:
+                self.time_left[color] = [self.main_time, 0]
+            else:
+                self.time_left[color] = [self.byo_yomi_time,
+                                         self.byo_yomi_stones]
+        return self.time_left[color]
+
+    def consume(self, color, seconds):
+        """
+        Charge a move that took seconds to the clock of color. Keeps
+        the clock running when the controller sends no time_left.
+        """
+        if not self.has_clock():
+            return
+        clock = self.clock(color)
+        clock[0] -= seconds
+        if clock[1] > 0:
+            clock[1] -= 1
+            if clock[1] == 0 and clock[0] > 0:
+                clock[:] = [self.byo_yomi_time, self.byo_yomi_stones]
+        elif clock[0] <= 0 and self.byo_yomi_stones:
+            clock[:] = [self.byo_yomi_time, self.byo_yomi_stones]
+
+    def allocate(self, color, num_empty):
+        """
+        (planned, maximum) seconds for the next move of color on a
+        board with num_empty empty points, or None without a clock.
+        """
+        if not self.has_clock():
+            return None
+        seconds, stones = self.clock(color)
+        seconds = max(seconds, 0.0)
+        if stones > 0:
+            planned = seconds / stones
+            return planned, planned
+        moves_left = min(max(num_empty // 2, MIN_MOVES_LEFT), MAX_MOVES_LEFT)
+        planned = seconds / moves_left
+        maximum = seconds * MAX_SHARE
+        if self.byo_yomi_stones:
+            # byo-yomi follows, so main time need not last the game
+            per_stone = self.byo_yomi_time / self.byo_yomi_stones
+            planned += per_stone
+            maximum += per_stone
+        return planned, maximum
+
+    def budget(self, color, num_empty, move_type, move_limit):
+        """
+        Seconds to spend on a move of color whose policy moves are of
+        category move_type. move_limit is the fixed per-move limit.
+        """
+        allocation = self.allocate(color, num_empty)
+        if allocation is None:
+            planned = maximum = move_limit
+        else:
+            planned, maximum = allocation
+            maximum = min(maximum, move_limit)
+        budget = min(planned * VOLATILITY.get(move_type, 1.0), maximum)
+        return max(budget - self.margin, MIN_BUDGET)
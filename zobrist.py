@@ -0,0 +1,76 @@
+"""
+zobrist.py
+Zobrist hashing of Gomoku positions up to the 8 board symmetries.
+
+canonical_hash returns the smallest hash over all rotations and
+reflections of the board together with the symmetry that produced it,
+so that moves can be mapped into and out of the canonical orientation.
+"""
+from lazy_import import lazy_module
+np = lazy_module("numpy")
+from board_util import BLACK, WHITE
+
+"""
+Fixed seed, so that hashes are stable across processes and runs
+"""
+ZOBRIST_SEED = 20190325
+
+_tables = {}
+
+def _build_tables(size):
+    NS = size + 1
+    maxpoint = size * size + 3 * (size + 1)
+    generator = np.random.default_rng(ZOBRIST_SEED + size)
+    keys = generator.integers(np.iinfo(np.int64).min, np.iinfo(np.int64).max,
+                              size=(3, maxpoint), dtype=np.int64)
+    maps = np.zeros((8, maxpoint), dtype=np.intp)
+    inverse = np.zeros((8, maxpoint), dtype=np.intp)
+    for sym in range(8):
+        swap, flip_row, flip_col = sym & 4, sym & 2, sym & 1
+        for row in range(1, size + 1):
+            for col in range(1, size + 1):
+                r, c = (col, row) if swap else (row, col)
+                if flip_row:
+                    r = size + 1 - r
+                if flip_col:
+                    c = size + 1 - c
+                maps[sym, NS * row + col] = NS * r + c
+                inverse[sym, NS * r + c] = NS * row + col
+    _tables[size] = (keys, maps, inverse)
+    return _tables[size]
+
+def tables(size):
+    """
+    Return (keys, maps, inverse) for a board of given size.
+    keys[color, point] is the Zobrist key of a stone,
+    maps[sym, point] the image of point under symmetry sym
+    and inverse[sym] the inverse mapping.
+    """
+    if size in _tables:
+        return _tables[size]
+    return _build_tables(size)
+
+def canonical_hash(board):
+    """
+    Return (hash, sym): the smallest Zobrist hash of the stones on board
+    over the 8 symmetries, and the symmetry that maps board onto it.
+    """
+    keys, maps, _ = tables(board.size)
+    best_hash, best_sym = None, 0
+    black = np.flatnonzero(board.board == BLACK)
+    white = np.flatnonzero(board.board == WHITE)
+    for sym in range(8):
+        h = np.bitwise_xor.reduce(keys[BLACK, maps[sym, black]]) ^ \
+            np.bitwise_xor.reduce(keys[WHITE, maps[sym, white]])
+        h = int(h)
+        if best_hash is None or h < best_hash:
+            best_hash, best_sym = h, sym
+    return best_hash, best_sym
+
+def to_canonical(point, sym, size):
+    """ Map point on the board into the canonical orientation """
+    return int(tables(size)[1][sym, point])
+
+def from_canonical(point, sym, size):
+    """ Map point in the canonical orientation back onto the board """
+    return int(tables(size)[2][sym, point])